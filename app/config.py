@@ -0,0 +1,148 @@
+import os
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+# outbound fetching
+# max number of upstream requests running at the same time (thread pool size)
+FETCH_WORKERS = _env_int("KURYANA_FETCH_WORKERS", 16)
+# max number of upstream requests sent at the same time
+FETCH_MAX_IN_FLIGHT = _env_int("KURYANA_FETCH_MAX_IN_FLIGHT", FETCH_WORKERS)
+# max number of requests allowed to wait for their turn before we reject them
+FETCH_MAX_PENDING = _env_int("KURYANA_FETCH_MAX_PENDING", 64)
+# upstream requests per second (token bucket), 0 disables the rate limit
+FETCH_RATE = _env_float("KURYANA_FETCH_RATE", 0.0)
+# requests that can be sent at once after being idle, with a rate limit
+FETCH_BURST = _env_int("KURYANA_FETCH_BURST", 10)
+# seconds a request waits for its turn before failing with a 503 / 429
+FETCH_QUEUE_TIMEOUT = _env_float("KURYANA_FETCH_QUEUE_TIMEOUT", 10.0)
+# seconds before an upstream request is abandoned
+FETCH_TIMEOUT = _env_float("KURYANA_FETCH_TIMEOUT", 30.0)
+# retries of timeouts, challenges, 429s and 5xx, with jittered exponential backoff
+FETCH_RETRIES = _env_int("KURYANA_FETCH_RETRIES", 2)
+# seconds of the first backoff (doubled on every retry) and of the longest one
+FETCH_RETRY_DELAY = _env_float("KURYANA_FETCH_RETRY_DELAY", 0.5)
+FETCH_RETRY_MAX_DELAY = _env_float("KURYANA_FETCH_RETRY_MAX_DELAY", 8.0)
+
+# circuit breaker
+# failed upstream requests in a row before we stop sending them, 0 disables it
+BREAKER_THRESHOLD = _env_int("KURYANA_BREAKER_THRESHOLD", 5)
+# seconds requests fail fast before one is let through to check upstream again
+BREAKER_RESET_AFTER = _env_float("KURYANA_BREAKER_RESET_AFTER", 30.0)
+
+# upstream sessions
+# number of long-lived cloudscraper sessions, defaults to one per fetch worker
+SESSION_POOL_SIZE = _env_int("KURYANA_SESSION_POOL_SIZE", FETCH_WORKERS)
+# seconds before a session is recycled, even if its clearance cookie is still valid
+SESSION_MAX_AGE = _env_float("KURYANA_SESSION_MAX_AGE", 1800.0)
+
+# pages remembered with their validators (ETag / Last-Modified / content hash),
+# so unchanged pages are not downloaded in full or parsed again, 0 disables it
+UPSTREAM_KNOWN_PAGES = _env_int("KURYANA_UPSTREAM_KNOWN_PAGES", 1024)
+
+# response cache
+# max number of responses / total encoded bytes kept in memory
+CACHE_MAX_ENTRIES = _env_int("KURYANA_CACHE_MAX_ENTRIES", 2048)
+CACHE_MAX_BYTES = _env_int("KURYANA_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+# sqlite file for the persistent cache tier, disabled if empty
+CACHE_DB_PATH = os.environ.get("KURYANA_CACHE_DB_PATH", "")
+
+# seconds each fetch type is cached for, 0 disables caching for it
+# can be overridden with `KURYANA_CACHE_TTL_<TYPE>`, e.g. `KURYANA_CACHE_TTL_PERSON`
+CACHE_TTLS = {
+    t: _env_float(f"KURYANA_CACHE_TTL_{t.upper()}", ttl)
+    for t, ttl in {
+        "search": 600,
+        "drama": 3600,
+        "cast": 6 * 3600,
+        "episodes": 1800,
+        "reviews": 1800,
+        "person": 24 * 3600,
+        "lists": 3600,
+        "dramalist": 300,
+        "recommendations": 3600,
+        "episodedetails": 1800,
+        "newsfeeds": 600,
+        "topairing": 300,
+        "showsstartingthisweek": 900,
+        "trendingthisweek": 900,
+        "todaysbirthdays": 3600,
+        # the current and upcoming quarters, past quarters are cached for good
+        "seasonal": 3600,
+    }.items()
+}
+
+# seconds an expired response is still served while it is re-scraped in the background
+CACHE_STALE_WHILE_REVALIDATE = _env_float("KURYANA_CACHE_STALE_WHILE_REVALIDATE", 3600)
+# seconds an expired response is still served if MyDramaList fails or blocks us
+CACHE_STALE_IF_ERROR = _env_float("KURYANA_CACHE_STALE_IF_ERROR", 24 * 3600)
+# types served with stale-while-revalidate, the others wait for a fresh scrape
+CACHE_SWR_TYPES = {
+    "drama",
+    "cast",
+    "episodes",
+    "newsfeeds",
+    "topairing",
+    "showsstartingthisweek",
+    "trendingthisweek",
+    "todaysbirthdays",
+}
+
+# batch lookups
+# max number of slugs in one batch request
+BATCH_MAX_SLUGS = _env_int("KURYANA_BATCH_MAX_SLUGS", 100)
+# max number of scrapes a single batch runs at the same time
+BATCH_CONCURRENCY = _env_int("KURYANA_BATCH_CONCURRENCY", 8)
+
+# multi-page results (`pages=all` / `max_pages=K`)
+# max number of pages fetched for `pages=all`
+PAGES_MAX = _env_int("KURYANA_PAGES_MAX", 50)
+# max number of pages fetched at the same time for one request
+PAGES_CONCURRENCY = _env_int("KURYANA_PAGES_CONCURRENCY", 4)
+
+# prefetching, off by default since it scrapes MyDramaList without any client asking
+# seconds between refreshes of the top airing / trending dramas (and their cast and
+# episodes) in the cache, e.g. 900, 0 disables it
+PREFETCH_INTERVAL = _env_float("KURYANA_PREFETCH_INTERVAL", 0)
+# max number of prefetch scrapes at the same time, they also wait for every client request
+PREFETCH_CONCURRENCY = _env_int("KURYANA_PREFETCH_CONCURRENCY", 2)
+# max number of dramas kept warm
+PREFETCH_MAX_DRAMAS = _env_int("KURYANA_PREFETCH_MAX_DRAMAS", 50)
+
+# local search index
+# max number of dramas and people indexed from scraped responses, 0 disables it
+SEARCH_INDEX_MAX_ENTRIES = _env_int("KURYANA_SEARCH_INDEX_MAX_ENTRIES", 50000)
+
+# entity store
+# sqlite file the scraped dramas, people, credits and episodes are stored in,
+# kept in memory if empty (per process, lost on restart)
+ENTITY_DB_PATH = os.environ.get("KURYANA_ENTITY_DB_PATH", "")
+
+# profiling
+# token to send in `X-Profile-Token` with `?_profile=1` to profile a request, off if empty
+PROFILE_TOKEN = os.environ.get("KURYANA_PROFILE_TOKEN", "")
+# directory the `.prof` files of profiled requests are saved to, not saved if empty
+PROFILE_DIR = os.environ.get("KURYANA_PROFILE_DIR", "")
+
+# parsing
+# number of worker processes parsing pages, 0 parses on the event loop
+PARSE_WORKERS = _env_int("KURYANA_PARSE_WORKERS", 0)
+# fetch types parsed with the lxml / xpath backend instead of BeautifulSoup,
+# comma separated, e.g. `drama,cast,episodes,person`
+LXML_HANDLERS = {
+    t.strip()
+    for t in os.environ.get("KURYANA_LXML_HANDLERS", "").split(",")
+    if t.strip()
+}
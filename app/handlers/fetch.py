@@ -1,15 +1,28 @@
 import re
 import copy
-from typing import Any, Dict, List
+from typing import Dict, List, Union
 from urllib.parse import urljoin
 
 from bs4 import BeautifulSoup
 
 from app import MYDRAMALIST_WEBSITE
+from app.handlers.models import (
+    Cast,
+    Episode,
+    ListPerson,
+    ListShow,
+    PersonWork,
+    Review,
+    Reviewer,
+    Role,
+    WorkTitle,
+)
 from app.handlers.parser import BaseFetch
 
 
 class FetchDrama(BaseFetch):
+    regions = {"class_": ["app-body", "show-detailsxss", "list m-a-0 hidden-md-up"]}
+
     def __init__(self, soup: BeautifulSoup, query: str, code: int, ok: bool) -> None:
         super().__init__(soup, query, code, ok)
 
@@ -51,12 +64,12 @@ class FetchDrama(BaseFetch):
             __temp_cast = i.find("a", class_="text-primary text-ellipsis")
             __temp_cast_slug = __temp_cast["href"].strip()
             casts.append(
-                {
-                    "name": __temp_cast.find("b").text.strip(),
-                    "profile_image": self._get_poster(i),
-                    "slug": __temp_cast_slug,
-                    "link": urljoin(MYDRAMALIST_WEBSITE, __temp_cast_slug),
-                }
+                Cast(
+                    name=__temp_cast.find("b").text.strip(),
+                    profile_image=self._get_poster(i),
+                    slug=__temp_cast_slug,
+                    link=urljoin(MYDRAMALIST_WEBSITE, __temp_cast_slug),
+                )
             )
         self.info["casts"] = casts
 
@@ -93,6 +106,7 @@ class FetchDrama(BaseFetch):
 
 class FetchPerson(BaseFetch):
     non_actors = ["screenwriter", "director", "screenwriter & director"]
+    regions = {"class_": ["app-body", "list m-b-0"]}
 
     def __init__(self, soup: BeautifulSoup, query: str, code: int, ok: bool) -> None:
         super().__init__(soup, query, code, ok)
@@ -131,23 +145,23 @@ class FetchPerson(BaseFetch):
 
         for j, k in zip(_work_headers, _work_tables, strict=False):
             # theaders = ['episodes' if i.text.strip() == '#' else i.text.strip() for i in k.find("thead").find_all("th")]
-            bare_works: List[Dict[str, Any]] = []
+            bare_works: List[PersonWork] = []
 
             for i in k.find("tbody").find_all("tr"):
                 _raw_year = i.find("td", class_="year").text
                 _raw_title = i.find("td", class_="title").find("a")
 
-                r = {
-                    "_slug": i["class"][0],
-                    "year": _raw_year if _raw_year == "TBA" else int(_raw_year),
-                    "title": {
-                        "link": urljoin(MYDRAMALIST_WEBSITE, _raw_title["href"]),
-                        "name": _raw_title.text,
-                    },
-                    "rating": self._handle_rating(
+                r = PersonWork(
+                    slug=i["class"][0],
+                    year=_raw_year if _raw_year == "TBA" else int(_raw_year),
+                    title=WorkTitle(
+                        link=urljoin(MYDRAMALIST_WEBSITE, _raw_title["href"]),
+                        name=_raw_title.text,
+                    ),
+                    rating=self._handle_rating(
                         i.find("td", class_="text-center").find(class_="text-sm")
                     ),
-                }
+                )
 
                 _raw_role = i.find("td", class_="role")
 
@@ -160,19 +174,19 @@ class FetchPerson(BaseFetch):
                 # use `type` for non-dramas, etc while `role` otherwise
                 try:
                     if j in FetchPerson.non_actors:
-                        r["type"] = _raw_role.find(class_="roleid").text.strip()
+                        r.type = _raw_role.find(class_="roleid").text.strip()
                     else:
-                        r["role"] = {
-                            "name": _raw_role_name,
-                            "type": _raw_role.find("div", class_="roleid").text.strip(),
-                        }
+                        r.role = Role(
+                            name=_raw_role_name,
+                            type=_raw_role.find("div", class_="roleid").text.strip(),
+                        )
                 except Exception:
                     pass
 
                 # not applicable for movies
                 try:
                     episodes = i.find("td", class_="episodes").text
-                    r["episodes"] = int(episodes)
+                    r.episodes = int(episodes)
                 except Exception:
                     pass
 
@@ -215,20 +229,20 @@ class FetchCast(BaseFetch):
             for i in k.find_all("li"):
                 __temp_cast = i.find("a", class_="text-primary")
                 __temp_cast_slug = __temp_cast["href"].strip()
-                __temp_cast_data = {
-                    "name": __temp_cast.find("b").text.strip(),
-                    "profile_image": self._get_poster(i).replace(
+                __temp_cast_data = Cast(
+                    name=__temp_cast.find("b").text.strip(),
+                    profile_image=self._get_poster(i).replace(
                         "s.jpg", "m.jpg"
                     ),  # replaces the small images to a link with a bigger one
-                    "slug": __temp_cast_slug,
-                    "link": urljoin(MYDRAMALIST_WEBSITE, __temp_cast_slug),
-                }
+                    slug=__temp_cast_slug,
+                    link=urljoin(MYDRAMALIST_WEBSITE, __temp_cast_slug),
+                )
 
                 try:
-                    __temp_cast_data["role"] = {
-                        "name": i.find("small").text.strip(),
-                        "type": i.find("small", class_="text-muted").text.strip(),
-                    }
+                    __temp_cast_data.role = Role(
+                        name=i.find("small").text.strip(),
+                        type=i.find("small", class_="text-muted").text.strip(),
+                    )
                 except Exception:
                     pass
 
@@ -241,6 +255,8 @@ class FetchCast(BaseFetch):
 
 
 class FetchReviews(BaseFetch):
+    regions = {"class_": ["app-body", "pagination"]}
+
     def __init__(self, soup: BeautifulSoup, query: str, code: int, ok: bool) -> None:
         super().__init__(soup, query, code, ok)
 
@@ -261,18 +277,18 @@ class FetchReviews(BaseFetch):
         __temp_reviews = container.find_all("div", class_="review")
 
         for i in __temp_reviews:
-            __temp_review: Dict[str, Any] = {}
+            __temp_review = Review()
 
             try:
                 # reviewer / person
-                __temp_review["reviewer"] = {
-                    "name": i.find("a").text.strip(),
-                    "user_link": urljoin(MYDRAMALIST_WEBSITE, i.find("a")["href"]),
-                    "user_image": self._get_poster(i).replace(
+                __temp_review.reviewer = Reviewer(
+                    name=i.find("a").text.strip(),
+                    user_link=urljoin(MYDRAMALIST_WEBSITE, i.find("a")["href"]),
+                    user_image=self._get_poster(i).replace(
                         "1t", "1c"
                     ),  # replace 1t to 1c so that it will return a bigger image than the smaller one
-                    "info": i.find("div", class_="user-stats").text.strip(),
-                }
+                    info=i.find("div", class_="user-stats").text.strip(),
+                )
 
                 __temp_review_ratings = i.find(
                     "div", class_="box pull-right text-sm m-a-sm"
@@ -326,10 +342,10 @@ class FetchReviews(BaseFetch):
                     )
 
                 __temp_review_contents.append(__temp_review_content.strip())
-                __temp_review["review"] = __temp_review_contents
+                __temp_review.review = __temp_review_contents
                 # end parsing the review section
 
-                __temp_review["ratings"] = {
+                __temp_review.ratings = {
                     "overall": float(
                         __temp_review_ratings_overall.find("span").text.strip()
                     )
@@ -340,7 +356,7 @@ class FetchReviews(BaseFetch):
 
                 # other review ratings, it might be different in each box?
                 for k in __temp_review_ratings_others:
-                    __temp_review["ratings"][
+                    __temp_review.ratings[
                         k.text.replace(k.find("span").text.strip(), "").strip()
                     ] = float(k.find("span").text.strip())
 
@@ -352,11 +368,16 @@ class FetchReviews(BaseFetch):
             # append to list
             self.info["reviews"].append(__temp_review)
 
+        # PAGES
+        self.info["pages"] = self._get_pagination_info()
+
     def _get(self) -> None:
         self._get_main_container()
 
 
 class FetchDramaList(BaseFetch):
+    regions = {"class_": "mdl-style-list"}
+
     def __init__(self, soup: BeautifulSoup, query: str, code: int, ok: bool) -> None:
         super().__init__(soup, query, code, ok)
 
@@ -442,7 +463,7 @@ class FetchList(BaseFetch):
         # get list
         container_list = container.find("div", class_="collection-list")
         all_items = container_list.find_all("li")
-        list_items = []
+        list_items: List[Union[ListShow, ListPerson]] = []
         for i in all_items:
             i_url = i.find("a").get("href")
             if "/people/" in i_url:
@@ -453,7 +474,7 @@ class FetchList(BaseFetch):
 
         self.info["list"] = list_items
 
-    def _parse_person(self, item: BeautifulSoup) -> Dict[str, Any]:
+    def _parse_person(self, item: BeautifulSoup) -> ListPerson:
         # parse person image
         person_img_container = str(
             item.find("img", class_="img-responsive")["data-src"]
@@ -479,17 +500,17 @@ class FetchList(BaseFetch):
         if len(person_details_xx) > 1:
             person_details = person_details_xx[-1].get_text().strip()
 
-        return {
-            "name": person_name,
-            "type": "person",  # todo: change this
-            "image": person_img,
-            "slug": person_slug,
-            "url": person_url,
-            "nationality": person_nationality,
-            "details": person_details,
-        }
+        return ListPerson(
+            name=person_name,
+            type="person",  # todo: change this
+            image=person_img,
+            slug=person_slug,
+            url=person_url,
+            nationality=person_nationality,
+            details=person_details,
+        )
 
-    def _parse_show(self, item: BeautifulSoup) -> Dict[str, Any]:
+    def _parse_show(self, item: BeautifulSoup) -> ListShow:
         # parse list image
         list_img_container = str(
             item.find("img", class_="img-responsive")["data-src"]
@@ -534,17 +555,17 @@ class FetchList(BaseFetch):
                 .strip()
             )
 
-        return {
-            "title": list_title,
-            "image": list_img,
-            "rank": list_title_rank,
-            "url": list_url,
-            "slug": list_slug,
-            "type": list_details_type,
-            "year": list_details_year,
-            "episodes": list_details_episodes,
-            "short_summary": list_short_summary,
-        }
+        return ListShow(
+            title=list_title,
+            image=list_img,
+            rank=list_title_rank,
+            url=list_url,
+            slug=list_slug,
+            type=list_details_type,
+            year=list_details_year,
+            episodes=list_details_episodes,
+            short_summary=list_short_summary,
+        )
 
     def _get(self) -> None:
         self._get_main_container()
@@ -564,7 +585,7 @@ class FetchEpisodes(BaseFetch):
             "episodes": episodes,
         }
 
-    def _parse_episodes(self, item: BeautifulSoup) -> List[Dict[str, Any]]:
+    def _parse_episodes(self, item: BeautifulSoup) -> List[Episode]:
         episodes_container = item.find("div", class_="episodes")
         epi_list = episodes_container.find_all(
             "div", class_="col-xs-12 col-sm-6 col-md-4 p-a episode"
@@ -586,13 +607,13 @@ class FetchEpisodes(BaseFetch):
             air_date = epi.find("div", class_="air-date").get_text(strip=True)
 
             episodes.append(
-                {
-                    "title": title,
-                    "image": img,
-                    "link": link,
-                    "rating": rating,
-                    "air_date": air_date,
-                }
+                Episode(
+                    title=title,
+                    image=img,
+                    link=link,
+                    rating=rating,
+                    air_date=air_date,
+                )
             )
 
         return episodes
@@ -609,6 +630,8 @@ class FetchEpisodes(BaseFetch):
 
 class FetchNewsFeeds(BaseFetch):
     """Fetch news feeds from homepage"""
+
+    regions = {"id": ["articles-list-popular"]}
     
     def __init__(self, soup: BeautifulSoup, query: str, code: int, ok: bool) -> None:
         super().__init__(soup, query, code, ok)
@@ -678,23 +701,25 @@ class FetchNewsFeeds(BaseFetch):
 
 class FetchTopAiring(BaseFetch):
     """Fetch top airing shows by country"""
+
+    country_ids = [
+        "tpa-1",    # Japan
+        "tpa-2",    # China
+        "tpa-3",    # South Korea
+        "tpa-4",    # Hong Kong
+        "tpa-5",    # Taiwan
+        "tpa-6",    # Thailand
+        "tpa-140",  # Philippines
+    ]
+    regions = {"id": country_ids}
     
     def __init__(self, soup: BeautifulSoup, query: str, code: int, ok: bool) -> None:
         super().__init__(soup, query, code, ok)
 
     def _get_main_container(self) -> None:
         top_shows = []
-        country_ids = [
-            "tpa-1",    # Japan
-            "tpa-2",    # China
-            "tpa-3",    # South Korea
-            "tpa-4",    # Hong Kong
-            "tpa-5",    # Taiwan
-            "tpa-6",    # Thailand
-            "tpa-140",  # Philippines
-        ]
-
-        for country_id in country_ids:
+
+        for country_id in self.country_ids:
             country_container = self.soup.find("div", id=country_id)
             if not country_container:
                 continue
@@ -767,6 +792,8 @@ class FetchTopAiring(BaseFetch):
 class FetchRecommendations(BaseFetch):
     """Fetch drama recommendations with pagination"""
 
+    regions = {"class_": ["recs-box", "pagination"]}
+
     def __init__(self, soup: BeautifulSoup, query: str, code: int, ok: bool) -> None:
         super().__init__(soup, query, code, ok)
 
@@ -824,31 +851,9 @@ class FetchRecommendations(BaseFetch):
                 print(f"Error parsing recommendation: {e}")
 
         # Pagination
-        try:
-            pagination = self.soup.select_one("ul.pagination")
-            if pagination:
-                current = pagination.find("li", class_="active")
-                current_page = current.get_text(strip=True) if current else "1"
-
-                prev = pagination.find("li", class_="prev")
-                next_ = pagination.find("li", class_="next")
-                last = pagination.find("li", class_="last")
-
-                def extract_page_slug(elem):
-                    if elem and elem.find("a"):
-                        href = elem.find("a").get("href", "")
-                        match = re.search(r"page=(\d+)", href)
-                        return match.group(1) if match else ""
-                    return ""
-
-                pages.append({
-                    "currentPage": current_page,
-                    "prevPageSlug": extract_page_slug(prev) or False,
-                    "nextPageSlug": extract_page_slug(next_) or False,
-                    "totalPages": int(extract_page_slug(last) or current_page),
-                })
-        except Exception as e:
-            print(f"Error parsing pagination: {e}")
+        pages_info = self._get_pagination_info()
+        if pages_info:
+            pages.append(pages_info)
 
         self.info["recommendations"] = recommendations
         self.info["pages"] = pages
@@ -867,6 +872,8 @@ class FetchRecommendations(BaseFetch):
 
 class FetchEpisodeDetails(BaseFetch):
     """Fetch detailed episode information"""
+
+    regions = {"class_": "episode"}
     
     def __init__(self, soup: BeautifulSoup, query: str, code: int, ok: bool) -> None:
         super().__init__(soup, query, code, ok)
@@ -948,6 +955,8 @@ class FetchEpisodeDetails(BaseFetch):
 
 class FetchShowsStartingThisWeek(BaseFetch):
     """Fetch shows starting this week from homepage"""
+
+    regions = {"id": ["slide-started"]}
     
     def __init__(self, soup: BeautifulSoup, query: str, code: int, ok: bool) -> None:
         super().__init__(soup, query, code, ok)
@@ -1004,6 +1013,8 @@ class FetchShowsStartingThisWeek(BaseFetch):
 
 class FetchShowsTrendingThisWeek(BaseFetch):
     """Fetch shows trending this week from homepage"""
+
+    regions = {"id": ["slide-trending"]}
     
     def __init__(self, soup: BeautifulSoup, query: str, code: int, ok: bool) -> None:
         super().__init__(soup, query, code, ok)
@@ -1060,6 +1071,8 @@ class FetchShowsTrendingThisWeek(BaseFetch):
 
 class FetchTodaysBirthdays(BaseFetch):
     """Fetch today's birthdays from homepage"""
+
+    regions = {"id": ["slide-birthday"]}
     
     def __init__(self, soup: BeautifulSoup, query: str, code: int, ok: bool) -> None:
         super().__init__(soup, query, code, ok)
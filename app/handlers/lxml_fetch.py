@@ -0,0 +1,419 @@
+"""
+Alternative extraction backend working on `lxml.html` trees with precompiled
+XPath expressions instead of BeautifulSoup tree walking.
+
+Every handler here gives the same output as its BeautifulSoup counterpart in
+`app.handlers.fetch`, only faster.
+"""
+
+from typing import Any, Dict, Iterator, List, Optional, TypeAlias, Union
+from urllib.parse import urljoin
+
+import lxml.html  # type: ignore[import-untyped]
+from lxml import etree
+
+from app import MYDRAMALIST_WEBSITE
+from app.handlers.fetch import FetchPerson
+from app.handlers.models import Cast, Episode, PersonWork, Role, WorkTitle
+from app.handlers.parser import BaseFetch
+
+# lxml ships no type stubs, so this is `Any` to mypy
+Element: TypeAlias = lxml.html.HtmlElement
+
+# BeautifulSoup leaves the contents of these out of `get_text()`
+SKIPPED_TAGS = {"script", "style", "template"}
+
+
+def _path(tag: str, class_: Optional[str] = None) -> str:
+    """xpath for `find(tag, class_=class_)`, matching classes like BeautifulSoup"""
+    if class_ is None:
+        return f".//{tag}"
+
+    if " " in class_:
+        # a multi-valued `class_` has to match the whole attribute
+        return f'.//{tag}[normalize-space(@class)="{class_}"]'
+
+    return (
+        f'.//{tag}[contains(concat(" ", normalize-space(@class), " "), " {class_} ")]'
+    )
+
+
+class First:
+    """the first match in document order, like BeautifulSoup's `find`"""
+
+    def __init__(self, path: str) -> None:
+        self._xpath = etree.XPath(f"({path})[1]")
+
+    def __call__(self, el: Element) -> Optional[Element]:
+        found = self._xpath(el)
+        return found[0] if found else None
+
+
+class All:
+    """every match in document order, like BeautifulSoup's `find_all`"""
+
+    def __init__(self, path: str) -> None:
+        self._xpath = etree.XPath(path)
+
+    def __call__(self, el: Element) -> List[Element]:
+        found: List[Element] = self._xpath(el)
+        return found
+
+
+_has_skipped = etree.XPath("boolean(.//script|.//style|.//template)")
+
+
+def _collapse(s: str) -> str:
+    # BeautifulSoup squashes whitespace-only strings to a single character
+    if s.isspace():
+        return "\n" if "\n" in s else " "
+
+    return s
+
+
+def _strings(el: Element) -> Iterator[str]:
+    if el.tag in SKIPPED_TAGS:
+        return
+
+    if el.text:
+        yield _collapse(el.text)
+
+    for child in el:
+        # comments have a non-string tag, only their tail is text
+        if isinstance(child.tag, str):
+            yield from _strings(child)
+
+        if child.tail:
+            yield _collapse(child.tail)
+
+
+def text(el: Element) -> str:
+    """same as BeautifulSoup's `.text` / `get_text()`"""
+    if not _has_skipped(el):
+        return "".join(map(_collapse, el.itertext()))
+
+    return "".join(_strings(el))
+
+
+def stripped_text(el: Element) -> str:
+    """same as BeautifulSoup's `get_text(strip=True)`"""
+    return "".join(s.strip() for s in _strings(el) if s.strip())
+
+
+# precompiled expressions, shared by all the handlers
+APP_BODY = First(_path("div", "app-body"))
+BOX_BODY = First(_path("div", "box-body"))
+FILM_TITLE = First(_path("h1", "film-title"))
+H1 = First(_path("h1"))
+P = First(_path("p"))
+A = First(_path("a"))
+B = First(_path("b"))
+DIV = First(_path("div"))
+IMG = First(_path("img"))
+LI = All(_path("li"))
+
+
+class LxmlFetch(BaseFetch):
+    """BaseFetch for the lxml handlers, `self.soup` is an `lxml.html` tree"""
+
+    @classmethod
+    def _parse_document(cls, html: str, scoped: bool = False) -> Any:
+        # libxml2 builds the whole tree faster than a strained soup,
+        # so `regions` are not used here
+        return lxml.html.document_fromstring(html)
+
+    def res_get_err(self) -> Dict[str, Any]:
+        err: Dict[str, Any] = {}
+
+        try:
+            err["code"] = self.status_code
+            err["error"] = True
+
+            box = BOX_BODY(APP_BODY(self.soup))
+            err["description"] = {
+                "title": text(H1(box)).strip(),
+                "info": text(P(box)).strip(),
+            }
+
+        except Exception:
+            pass
+
+        return err
+
+    def _get_poster(self, container: Element) -> Union[str, Any]:
+        poster = IMG(container)
+
+        for i in self._img_attrs:
+            if poster.get(i) is not None:  # type: ignore[union-attr]
+                return poster.get(i)  # type: ignore[union-attr]
+
+        # blank if none
+        return ""
+
+    def _get_details(self, classname: str) -> None:
+        details = First(_path("ul", classname))(self.soup)
+
+        try:
+            self.info["details"] = {}
+
+            for i in LI(details):
+                _title = text(B(i)).strip()
+
+                self.info["details"][
+                    _title.replace(":", "").replace(" ", "_").lower()
+                ] = text(i).replace(_title + " ", "").strip()
+
+        except Exception:
+            pass
+
+    def _handle_rating(self, component: Element) -> Union[str, float, Any]:
+        try:
+            return float(text(component))
+        except Exception:
+            pass
+
+        return text(component)
+
+
+class LxmlFetchDrama(LxmlFetch):
+    RATING = First(_path("div", "col-film-rating"))
+    SYNOPSIS = First(_path("div", "show-synopsis"))
+    CASTS = All(_path("li", "list-item col-sm-4"))
+    CAST_LINK = First(_path("a", "text-primary text-ellipsis"))
+    OTHERS = First(_path("div", "show-detailsxss"))
+    OTHERS_LIST = First(_path("ul", "list m-a-0"))
+
+    def _get_main_container(self) -> None:
+        container = APP_BODY(self.soup)
+
+        film_title = FILM_TITLE(container)
+        self.info["title"] = text(film_title).strip()
+        self.info["complete_title"] = text(film_title).strip()
+
+        self.info["rating"] = self._handle_rating(DIV(self.RATING(container)))
+
+        self.info["poster"] = self._get_poster(container)
+
+        synopsis = P(self.SYNOPSIS(container))
+        self.info["synopsis"] = (
+            text(synopsis).replace("Edit Translation", "").strip()
+            if synopsis is not None
+            else ""
+        )
+
+        casts = []
+        for i in self.CASTS(container):
+            cast = self.CAST_LINK(i)
+            cast_slug = cast.get("href").strip()  # type: ignore[union-attr]
+            casts.append(
+                Cast(
+                    name=text(B(cast)).strip(),
+                    profile_image=self._get_poster(i),
+                    slug=cast_slug,
+                    link=urljoin(MYDRAMALIST_WEBSITE, cast_slug),
+                )
+            )
+        self.info["casts"] = casts
+
+    def _get_other_info(self) -> None:
+        others = self.OTHERS_LIST(self.OTHERS(self.soup))
+
+        try:
+            self.info["others"] = {}
+            for i in LI(others):
+                _title = text(B(i)).strip()
+                self.info["others"][
+                    _title.replace(":", "").replace(" ", "_").lower()
+                ] = [
+                    j.strip()
+                    for j in text(i).replace(_title + " ", "").strip().split(", ")
+                ]
+
+        except Exception:
+            pass
+
+    def _get(self) -> None:
+        self._get_main_container()
+        self._get_details(classname="list m-a-0 hidden-md-up")
+        self._get_other_info()
+
+
+class LxmlFetchPerson(LxmlFetch):
+    MAIN = First(_path("div", "col-lg-8 col-md-8"))
+    ABOUT = First(_path("div", "col-sm-8 col-lg-12 col-md-12"))
+    ABOUT_MOBILE = First(_path("div", "hidden-md-up"))
+    BOX_BODIES = All(_path("div", "box-body"))
+    HEADERS = All(_path("h5"))
+    TABLES = All(_path("table"))
+    ROWS = All(_path("tr"))
+    TBODY = First(_path("tbody"))
+    YEAR = First(_path("td", "year"))
+    TITLE = First(_path("td", "title"))
+    RATING_CELL = First(_path("td", "text-center"))
+    RATING = First(_path("*", "text-sm"))
+    ROLE = First(_path("td", "role"))
+    ROLE_NAME = First(_path("div", "name"))
+    ROLE_ID = First(_path("*", "roleid"))
+    ROLE_ID_DIV = First(_path("div", "roleid"))
+    EPISODES = First(_path("td", "episodes"))
+
+    def _get_main_container(self) -> None:
+        container = APP_BODY(self.soup)
+
+        self.info["name"] = text(FILM_TITLE(container))
+
+        about = self.ABOUT(self.MAIN(container))
+        self.info["about"] = (
+            text(about).replace(text(self.ABOUT_MOBILE(about)).strip(), "").strip()
+        )
+
+        self.info["profile"] = self._get_poster(container)
+
+        self.info["works"] = {}
+
+        works_container = self.BOX_BODIES(self.MAIN(container))[1]
+
+        work_headers = [text(i).strip() for i in self.HEADERS(works_container)]
+        work_tables = self.TABLES(works_container)
+
+        for j, k in zip(work_headers, work_tables, strict=False):
+            bare_works: List[PersonWork] = []
+
+            for i in self.ROWS(self.TBODY(k)):
+                raw_year = text(self.YEAR(i))
+                raw_title = A(self.TITLE(i))
+
+                r = PersonWork(
+                    slug=i.get("class").split()[0],
+                    year=raw_year if raw_year == "TBA" else int(raw_year),
+                    title=WorkTitle(
+                        link=urljoin(
+                            MYDRAMALIST_WEBSITE,
+                            raw_title.get("href"),  # type: ignore[union-attr]
+                        ),
+                        name=text(raw_title),
+                    ),
+                    rating=self._handle_rating(self.RATING(self.RATING_CELL(i))),
+                )
+
+                raw_role = self.ROLE(i)
+
+                try:
+                    raw_role_name: Optional[str] = text(
+                        self.ROLE_NAME(raw_role)
+                    ).strip()
+                except Exception:
+                    raw_role_name = None
+
+                try:
+                    if j in FetchPerson.non_actors:
+                        r.type = text(self.ROLE_ID(raw_role)).strip()
+                    else:
+                        r.role = Role(
+                            name=raw_role_name,
+                            type=text(self.ROLE_ID_DIV(raw_role)).strip(),
+                        )
+                except Exception:
+                    pass
+
+                try:
+                    r.episodes = int(text(self.EPISODES(i)))
+                except Exception:
+                    pass
+
+                bare_works.append(r)
+
+            self.info["works"][j] = bare_works
+
+    def _get(self) -> None:
+        self._get_main_container()
+        self._get_details(classname="list m-b-0")
+
+
+class LxmlFetchCast(LxmlFetch):
+    CREDITS = First(_path("div", "box cast-credits"))
+    HEADERS = All(_path("h3"))
+    LISTS = All(_path("ul"))
+    CAST_LINK = First(_path("a", "text-primary"))
+    SMALL = First(_path("small"))
+    SMALL_MUTED = First(_path("small", "text-muted"))
+
+    def _get_main_container(self) -> None:
+        container = APP_BODY(self.soup)
+
+        self.info["title"] = text(A(FILM_TITLE(container)))
+
+        self.info["poster"] = self._get_poster(container)
+
+        self.info["casts"] = {}
+        casts_container = BOX_BODY(self.CREDITS(container))
+
+        cast_headers = self.HEADERS(casts_container)
+        cast_lists = self.LISTS(casts_container)
+
+        for j, k in zip(cast_headers, cast_lists, strict=False):
+            casts = []
+            for i in LI(k):
+                cast = self.CAST_LINK(i)
+                cast_slug = cast.get("href").strip()  # type: ignore[union-attr]
+                cast_data = Cast(
+                    name=text(B(cast)).strip(),
+                    profile_image=self._get_poster(i).replace("s.jpg", "m.jpg"),
+                    slug=cast_slug,
+                    link=urljoin(MYDRAMALIST_WEBSITE, cast_slug),
+                )
+
+                try:
+                    cast_data.role = Role(
+                        name=text(self.SMALL(i)).strip(),
+                        type=text(self.SMALL_MUTED(i)).strip(),
+                    )
+                except Exception:
+                    pass
+
+                casts.append(cast_data)
+
+            self.info["casts"][text(j).strip()] = casts
+
+    def _get(self) -> None:
+        self._get_main_container()
+
+
+class LxmlFetchEpisodes(LxmlFetch):
+    EPISODES = First(_path("div", "episodes"))
+    EPISODE = All(_path("div", "col-xs-12 col-sm-6 col-md-4 p-a episode"))
+    TITLE = First(_path("h2", "title"))
+    COVER = First(_path("div", "cover"))
+    RATING = First(_path("div", "rating-panel m-b-0"))
+    AIR_DATE = First(_path("div", "air-date"))
+
+    def _get_main_container(self) -> None:
+        container = APP_BODY(self.soup)
+
+        self.info = {
+            "title": stripped_text(FILM_TITLE(container)),
+            "episodes": self._parse_episodes(container),
+        }
+
+    def _parse_episodes(self, item: Element) -> List[Episode]:
+        episodes = []
+        for epi in self.EPISODE(self.EPISODES(item)):
+            cover = self.COVER(epi)
+
+            episodes.append(
+                Episode(
+                    title=stripped_text(self.TITLE(epi)),
+                    image=IMG(cover).attrib["data-src"],  # type: ignore[union-attr]
+                    link=urljoin(
+                        MYDRAMALIST_WEBSITE,
+                        A(cover).attrib["href"],  # type: ignore[union-attr]
+                    ),
+                    rating=stripped_text(DIV(self.RATING(epi))),
+                    air_date=stripped_text(self.AIR_DATE(epi)),
+                )
+            )
+
+        return episodes
+
+    def _get(self) -> None:
+        self._get_main_container()
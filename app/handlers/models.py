@@ -0,0 +1,103 @@
+"""
+Typed items of the scraped responses.
+
+Handlers build these directly and `MsgSpecJSONResponse` encodes them as is,
+the JSON stays the same as the dicts they replace. Fields set to `UNSET`
+are left out of the output, just like a key that was never added.
+"""
+
+from typing import Dict, List, Optional, Union
+
+import msgspec
+from msgspec import UNSET, UnsetType
+
+
+class Role(msgspec.Struct, gc=False):
+    name: Optional[str]
+    type: str
+
+
+class Cast(msgspec.Struct, gc=False):
+    name: str
+    profile_image: str
+    slug: str
+    link: str
+    role: Union[Role, UnsetType] = UNSET
+
+
+class Episode(msgspec.Struct, gc=False):
+    title: str
+    image: str
+    link: str
+    rating: str
+    air_date: str
+
+
+class WorkTitle(msgspec.Struct, gc=False):
+    link: str
+    name: str
+
+
+class PersonWork(msgspec.Struct, gc=False):
+    slug: str = msgspec.field(name="_slug")
+    year: Union[int, str]
+    title: WorkTitle
+    rating: Union[float, str]
+    # `type` for non-actors (directors, screenwriters), `role` otherwise
+    type: Union[str, UnsetType] = UNSET
+    role: Union[Role, UnsetType] = UNSET
+    episodes: Union[int, UnsetType] = UNSET
+
+
+class Reviewer(msgspec.Struct, gc=False):
+    name: str
+    user_link: str
+    user_image: str
+    info: str
+
+
+class Review(msgspec.Struct, gc=False):
+    # filled in as the review is parsed, a broken review keeps what was parsed
+    reviewer: Union[Reviewer, UnsetType] = UNSET
+    review: Union[List[str], UnsetType] = UNSET
+    ratings: Union[Dict[str, float], UnsetType] = UNSET
+
+
+class ListShow(msgspec.Struct, gc=False):
+    title: str
+    image: str
+    rank: str
+    url: str
+    slug: str
+    type: str
+    year: str
+    episodes: Optional[int]
+    short_summary: str
+
+
+class ListPerson(msgspec.Struct, gc=False):
+    name: str
+    type: str
+    image: str
+    slug: str
+    url: str
+    nationality: str
+    details: str
+
+
+class SearchDrama(msgspec.Struct, gc=False):
+    slug: str
+    thumb: str
+    mdl_id: str
+    title: str
+    ranking: Optional[str]
+    type: Optional[str]
+    year: Optional[int]
+    series: Union[str, bool]
+
+
+class SearchPerson(msgspec.Struct, gc=False):
+    slug: str
+    thumb: str
+    name: str
+    nationality: str
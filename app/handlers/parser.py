@@ -1,13 +1,34 @@
+import re
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Type, TypeVar, Union
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    List,
+    NamedTuple,
+    Optional,
+    Type,
+    TypeVar,
+    Union,
+)
 from urllib.parse import urljoin
 
-# bypassing cloudflare anti-bot
-import cloudscraper
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 from bs4.element import NavigableString, Tag
 
 from app import MYDRAMALIST_WEBSITE
+from app.lib.fetcher import (
+    PARSE_FAILURE,
+    TIMEOUT,
+    FetcherBusy,
+    classify_exception,
+    get_fetcher,
+    upstream_errors,
+)
+from app.lib.known_pages import KnownPage, known_pages, page_digest
+from app.lib.metrics import html_bytes
+from app.lib.timing import timed
 
 T = TypeVar("T", bound="Parser")
 
@@ -18,9 +39,58 @@ ScrapeTypes = {
 }
 
 
+def scrape_url(query: str, t: str) -> str:
+    if t not in ScrapeTypes.keys():
+        raise Exception("Invalid type")
+
+    # parse url
+    if t == "search":
+        return ScrapeTypes[t] + query
+
+    return urljoin(ScrapeTypes[t], query)
+
+
+def _class_matcher(names: Union[str, List[str]]) -> Callable[[Optional[str]], bool]:
+    wanted = {names} if isinstance(names, str) else set(names)
+
+    # the strainer sees the raw attribute, e.g. `class="list m-a-0"`
+    def match(value: Optional[str]) -> bool:
+        if not value:
+            return False
+
+        return value in wanted or not wanted.isdisjoint(value.split())
+
+    return match
+
+
+def strainer(regions: Dict[str, Any]) -> SoupStrainer:
+    """`SoupStrainer` for `regions`, matching `class_` values like `find` does"""
+    if "class_" in regions:
+        regions = {**regions, "class_": _class_matcher(regions["class_"])}
+
+    return SoupStrainer(**regions)
+
+
+class Page(NamedTuple):
+    """a downloaded page, `html` is `None` if the request itself failed"""
+
+    code: int
+    html: Optional[str]
+    key: Hashable = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    digest: Optional[str] = None
+    # set if the page did not change since it was last parsed
+    known: Optional[KnownPage] = None
+
+
 class Parser:
     """Main Parser"""
 
+    # `SoupStrainer` arguments for the parts of the page the handler reads,
+    # everything else is skipped while parsing. `None` parses the whole page
+    regions: Optional[Dict[str, Any]] = None
+
     headers: Dict[str, str] = {
         "Referer": MYDRAMALIST_WEBSITE,
         "User-Agent": "Mozilla/5.0 (Linux; Android 6.0; Nexus 5 Build/MRA58N) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/85.0.4183.123 Mobile Safari/537.36",
@@ -31,42 +101,100 @@ class Parser:
         self.query = query
         self.status_code = code
         self.ok = ok
+        self.page: Optional[Page] = None
 
     @classmethod
     async def scrape(cls: Type[T], query: str, t: str) -> T:
-        if t not in ScrapeTypes.keys():
-            raise Exception("Invalid type")
+        page = await cls.download(query, t)
 
-        # parse url
-        url = urljoin(ScrapeTypes[t], query)
-        if t == "search":
-            url = ScrapeTypes[t] + query
+        if page.known is not None:
+            # nothing changed, there is nothing to parse
+            f = cls(None, query, 200, True)  # type: ignore[arg-type]
+        else:
+            f = cls.from_html(page.html, query, page.code)
 
-        ok = True
-        code = 500  # default to 500, internal server error
-        soup = None
+        f.page = page
+        return f
 
-        try:
-            # bypassing cloudflare anti-bot
-            scraper = cloudscraper.create_scraper()
-            resp = scraper.get(url, headers=Parser.headers)
+    # download the raw page, conditionally if it was parsed before
+    @classmethod
+    async def download(cls, query: str, t: str) -> Page:
+        url = scrape_url(query, t)
+        key = (cls.__name__, url)
 
-            # set the main soup var
-            soup = BeautifulSoup(resp.text, "lxml")
+        headers = Parser.headers
+        known = known_pages.get(key)
+        if known is not None:
+            headers = {**headers, **known.conditional_headers()}
+
+        try:
+            # runs on the fetcher's thread pool, the event loop is not blocked
+            with timed("fetch", cls.__name__):
+                resp = await get_fetcher().get(url, headers=headers)
+
+        except FetcherBusy as e:
+            # 503 if we are overloaded, 429 if we are held back by the rate limit
+            return Page(e.code, None)
+
+        except Exception as e:
+            # still failing after the retries, 504 if it timed out, 500 otherwise
+            return Page(504 if classify_exception(e) == TIMEOUT else 500, None)
+
+        if resp.status_code == 304 and known is not None:
+            known_pages.stats["not_modified"] += 1
+            return Page(
+                200, None, key, known.etag, known.last_modified, known.digest, known
+            )
+
+        if resp.status_code != 200:
+            return Page(resp.status_code, resp.text)
+
+        html_bytes.observe(len(resp.content), handler=cls.__name__)
+        digest = page_digest(resp.text)
+        page = Page(
+            200,
+            resp.text,
+            key,
+            resp.headers.get("ETag"),
+            resp.headers.get("Last-Modified"),
+            digest,
+        )
+
+        # no validators, or they changed for nothing we read
+        if known is not None and known.digest == digest:
+            known_pages.stats["unchanged"] += 1
+            return page._replace(known=known)
+
+        return page
+
+    # parse a downloaded page, this is CPU-bound and safe to run in another process
+    @classmethod
+    def from_html(cls: Type[T], html: Optional[str], query: str, code: int) -> T:
+        if html is None:
+            return cls(None, query, code, False)  # type: ignore[arg-type]
 
-            # set the status code
-            code = resp.status_code
-            ok = resp.status_code == 200
+        try:
+            # set the main soup var,
+            # error pages are read from outside of the handler's regions
+            with timed("parse", cls.__name__):
+                soup = cls._parse_document(html, scoped=code == 200)
 
         except Exception:
-            ok = False
+            upstream_errors[PARSE_FAILURE] += 1
+            return cls(None, query, 500, False)  # type: ignore[arg-type]
 
-        return cls(soup, query, code, ok)
+        return cls(soup, query, code, code == 200)
+
+    # build the document the handler works on, override for other backends
+    @classmethod
+    def _parse_document(cls, html: str, scoped: bool = False) -> Any:
+        if scoped and cls.regions is not None:
+            return BeautifulSoup(html, "lxml", parse_only=strainer(cls.regions))
+
+        return BeautifulSoup(html, "lxml")
 
     # get page err, if possible
     def res_get_err(self) -> Dict[str, Any]:
-        container = self.soup.find("div", class_="app-body")
-
         # if the page was not found,
         # or there was a problem with scraping,
         # try to get the error and return the err message
@@ -75,6 +203,9 @@ class Parser:
         try:
             err["code"] = self.status_code
             err["error"] = True
+
+            # there is no page if the request itself failed
+            container = self.soup.find("div", class_="app-body")
             err["description"] = {
                 "title": container.find("div", class_="box-body")
                 .find("h1")
@@ -91,6 +222,38 @@ class Parser:
 
         return err
 
+    # get the pagination of listings (search, reviews, recommendations)
+    def _get_pagination_info(self) -> Dict[str, Any]:
+        pages_info: Dict[str, Any] = {}
+
+        try:
+            pagination = self.soup.select_one("ul.pagination")
+            if pagination:
+                current = pagination.find("li", class_="active")
+                current_page = current.get_text(strip=True) if current else "1"
+
+                prev = pagination.find("li", class_="prev")
+                next_ = pagination.find("li", class_="next")
+                last = pagination.find("li", class_="last")
+
+                def extract_page_slug(elem: Any) -> str:
+                    if elem and elem.find("a"):
+                        href = elem.find("a").get("href", "")
+                        match = re.search(r"page=(\d+)", href)
+                        return match.group(1) if match else ""
+                    return ""
+
+                pages_info = {
+                    "currentPage": current_page,
+                    "prevPageSlug": extract_page_slug(prev) or False,
+                    "nextPageSlug": extract_page_slug(next_) or False,
+                    "totalPages": int(extract_page_slug(last) or current_page),
+                }
+        except Exception as e:
+            print(f"Error parsing pagination: {e}")
+
+        return pages_info
+
 
 class BaseSearch(Parser):
     def __init__(self, soup: BeautifulSoup, query: str, code: int, ok: bool) -> None:
@@ -107,6 +270,9 @@ class BaseSearch(Parser):
 
 
 class BaseFetch(Parser):
+    # nearly every page keeps its content in `div.app-body`
+    regions: Optional[Dict[str, Any]] = {"class_": "app-body"}
+
     def __init__(self, soup: BeautifulSoup, query: str, code: int, ok: bool) -> None:
         super().__init__(soup, query, code, ok)
 
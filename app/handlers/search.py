@@ -1,11 +1,11 @@
-from typing import Any, Optional, Tuple, Union
+from typing import Any, List, Optional, Tuple, Union
 from urllib.parse import urljoin
-import re
 
 from bs4 import BeautifulSoup
 from bs4.element import NavigableString, ResultSet, Tag
 
 from app import MYDRAMALIST_WEBSITE
+from app.handlers.models import SearchDrama, SearchPerson
 from app.handlers.parser import BaseSearch
 
 
@@ -66,20 +66,19 @@ class Search(BaseSearch):
     def _get_search_results(self) -> None:
         results = self._get_container()
 
-        _dramas = []
-        _people = []
+        _dramas: List[SearchDrama] = []
+        _people: List[SearchPerson] = []
 
         for result in results:
             title_elem = result.find("h6", class_="text-primary title")
             if title_elem is None:
                 continue
 
-            r = {}
             title = title_elem.text.strip()
 
             url_slug = title_elem.find("a").get("href")
             if url_slug is not None:
-                r["slug"] = url_slug.replace("/", "", 1)
+                slug = url_slug.replace("/", "", 1)
             else:
                 continue
 
@@ -87,55 +86,37 @@ class Search(BaseSearch):
                 "/1280/"
             )
             if len(_thumb) > 1:
-                r["thumb"] = _thumb[1]
+                thumb = _thumb[1]
             else:
-                r["thumb"] = _thumb[0]
+                thumb = _thumb[0]
 
             if result.has_attr("id"):
-                r["mdl_id"] = result["id"]
-                r["title"] = title.strip()
-                r["ranking"] = self._res_get_ranking(result)
-                r["type"], r["year"], r["series"] = self._res_get_year_info(result)
-                _dramas.append(r)
+                t, year, series = self._res_get_year_info(result)
+                _dramas.append(
+                    SearchDrama(
+                        slug=slug,
+                        thumb=thumb,
+                        mdl_id=result["id"],
+                        title=title.strip(),
+                        ranking=self._res_get_ranking(result),
+                        type=t,
+                        year=year,
+                        series=series,
+                    )
+                )
                 continue
 
-            r["name"] = title.strip()
-            r["nationality"] = result.find("div", class_="text-muted").text.strip()
-            _people.append(r)
+            _people.append(
+                SearchPerson(
+                    slug=slug,
+                    thumb=thumb,
+                    name=title.strip(),
+                    nationality=result.find("div", class_="text-muted").text.strip(),
+                )
+            )
 
         self.search_results["dramas"] = _dramas
         self.search_results["people"] = _people
 
         # Add pagination info
         self.search_results["pages"] = self._get_pagination_info()
-
-    def _get_pagination_info(self) -> dict:
-        pages_info = {}
-
-        try:
-            pagination = self.soup.select_one("ul.pagination")
-            if pagination:
-                current = pagination.find("li", class_="active")
-                current_page = current.get_text(strip=True) if current else "1"
-
-                prev = pagination.find("li", class_="prev")
-                next_ = pagination.find("li", class_="next")
-                last = pagination.find("li", class_="last")
-
-                def extract_page_slug(elem):
-                    if elem and elem.find("a"):
-                        href = elem.find("a").get("href", "")
-                        match = re.search(r"page=(\d+)", href)
-                        return match.group(1) if match else ""
-                    return ""
-
-                pages_info = {
-                    "currentPage": current_page,
-                    "prevPageSlug": extract_page_slug(prev) or False,
-                    "nextPageSlug": extract_page_slug(next_) or False,
-                    "totalPages": int(extract_page_slug(last) or current_page),
-                }
-        except Exception as e:
-            print(f"Error parsing pagination: {e}")
-
-        return pages_info
@@ -0,0 +1,69 @@
+import time
+from typing import Dict, Optional
+
+from app.lib.scheduler import FetcherBusy
+
+
+class CircuitOpen(FetcherBusy):
+    """raised instead of sending a request while upstream is failing"""
+
+
+class CircuitBreaker:
+    """
+    Fails fast for `reset_after` seconds once `threshold` requests failed in a row,
+    then lets a single request through to check if upstream recovered.
+    """
+
+    def __init__(self, threshold: int, reset_after: float) -> None:
+        self.threshold = threshold  # 0 disables it
+        self.reset_after = reset_after
+
+        self.failures = 0  # in a row
+        self._opened: Optional[float] = None
+        self._probing = False
+
+        # `opened` counts the trips, `rejected` the requests failed fast
+        self.stats: Dict[str, int] = {"opened": 0, "rejected": 0}
+
+    @property
+    def state(self) -> str:
+        if self._opened is None:
+            return "closed"
+
+        if time.monotonic() - self._opened < self.reset_after:
+            return "open"
+
+        return "half_open"
+
+    def allow(self) -> bool:
+        """if a request may be sent, `success` / `failure` / `abandon` must follow"""
+        state = self.state
+        if state == "closed":
+            return True
+
+        if state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+
+        self.stats["rejected"] += 1
+        return False
+
+    def success(self) -> None:
+        self.failures = 0
+        self._opened = None
+        self._probing = False
+
+    def failure(self) -> None:
+        self.failures += 1
+
+        if self.threshold > 0 and (self._probing or self.failures >= self.threshold):
+            if self._opened is None or self._probing:
+                self.stats["opened"] += 1
+
+            self._opened = time.monotonic()
+
+        self._probing = False
+
+    def abandon(self) -> None:
+        """the request ended without telling anything about upstream"""
+        self._probing = False
@@ -0,0 +1,273 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+import msgspec
+
+from app import config
+
+
+class CacheEntry:
+    __slots__ = ("code", "value", "size", "stored", "expires", "etag")
+
+    def __init__(
+        self, code: int, value: Any, size: int, stored: float, expires: float
+    ) -> None:
+        self.code = code
+        self.value = value
+        self.size = size
+        self.stored = stored  # wall-clock time, so it survives restarts
+        self.expires = expires
+        self.etag: Optional[str] = None  # computed on the first conditional reply
+
+    def age(self, now: Optional[float] = None) -> int:
+        return max(0, int((now or time.time()) - self.stored))
+
+    def fresh(self, now: Optional[float] = None) -> bool:
+        return (now or time.time()) < self.expires
+
+    def stale_for(self, now: Optional[float] = None) -> float:
+        """seconds since the entry expired"""
+        return max(0.0, (now or time.time()) - self.expires)
+
+
+class CacheLookup:
+    """result of the last cache lookup, used for the `X-Cache` / `Age` headers"""
+
+    __slots__ = ("status", "age", "entry")
+
+    def __init__(
+        self, status: str, age: int = 0, entry: Optional[CacheEntry] = None
+    ) -> None:
+        self.status = status  # HIT / MISS / STALE
+        self.age = age
+        self.entry = entry  # the entry that was served, if any
+
+
+cache_lookup: ContextVar[Optional[CacheLookup]] = ContextVar(
+    "cache_lookup", default=None
+)
+
+
+class DiskStore:
+    """
+    persistent cache tier, survives restarts
+
+    Writes go to a single background thread, in order, so they never block the
+    event loop. Rows expired for longer than `keep_expired` (they can no longer
+    be served stale) are pruned every `prune_every` writes.
+    """
+
+    def __init__(
+        self, path: str, keep_expired: float = 0.0, prune_every: int = 256
+    ) -> None:
+        self.keep_expired = keep_expired
+        self.prune_every = prune_every
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, code INTEGER, body BLOB, stored REAL, expires REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)")
+        self._db.commit()
+
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache")
+        self._writes = 0
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT code, body, stored, expires FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        code, body, stored, expires = row
+        return CacheEntry(code, msgspec.json.decode(body), len(body), stored, expires)
+
+    def set(self, key: str, entry: CacheEntry, body: bytes) -> None:
+        self._writer.submit(self._set, key, entry, body)
+
+    def _set(self, key: str, entry: CacheEntry, body: bytes) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)",
+                (key, entry.code, body, entry.stored, entry.expires),
+            )
+            self._db.commit()
+
+        self._writes += 1
+        if self._writes % self.prune_every == 0:
+            self.prune()
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """delete the rows that can not be served anymore, even stale"""
+        before = (now or time.time()) - self.keep_expired
+        with self._lock:
+            deleted = self._db.execute(
+                "DELETE FROM cache WHERE expires < ?", (before,)
+            ).rowcount
+            self._db.commit()
+
+        return deleted
+
+    def delete(self, key: str) -> None:
+        self._writer.submit(self._delete, key)
+
+    def _delete(self, key: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._db.commit()
+
+    def flush(self) -> None:
+        """wait for the pending writes"""
+        self._writer.submit(lambda: None).result()
+
+    def close(self) -> None:
+        self._writer.shutdown(wait=True)
+        with self._lock:
+            self._db.close()
+
+
+class ResponseCache:
+    """
+    In-memory LRU (bounded by entries and bytes) in front of an optional
+    on-disk store.
+    """
+
+    def __init__(
+        self, max_entries: int, max_bytes: int, disk: Optional[DiskStore] = None
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk = disk
+
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._bytes = 0
+
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "stale": 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        return self._bytes
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """get a fresh entry"""
+        entry = self.peek(key)
+
+        if entry is None or not entry.fresh():
+            self.stats["misses"] += 1
+            return None
+
+        self.stats["hits"] += 1
+        return entry
+
+    def peek(self, key: str) -> Optional[CacheEntry]:
+        """get an entry, even if it is already expired"""
+        entry = self._entries.get(key)
+
+        if entry is not None:
+            self._entries.move_to_end(key)
+        elif self.disk is not None:
+            entry = self.disk.get(key)
+            if entry is not None:
+                self._put(key, entry)
+
+        return entry
+
+    async def load(self, key: str) -> Optional[CacheEntry]:
+        """like `peek`, but reads the disk on a thread, off the event loop"""
+        entry = self._entries.get(key)
+
+        if entry is not None:
+            self._entries.move_to_end(key)
+        elif self.disk is not None:
+            entry = await asyncio.to_thread(self.disk.get, key)
+            if entry is not None:
+                self._put(key, entry)
+
+        return entry
+
+    def set(self, key: str, code: int, value: Any, ttl: float) -> CacheEntry:
+        body = msgspec.json.encode(value)
+        now = time.time()
+        entry = CacheEntry(code, value, len(body), now, now + ttl)
+
+        self._put(key, entry)
+        if self.disk is not None:
+            self.disk.set(key, entry, body)
+
+        return entry
+
+    def delete(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def _put(self, key: str, entry: CacheEntry) -> None:
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old.size
+
+        # too big to ever fit
+        if entry.size > self.max_bytes:
+            return
+
+        self._entries[key] = entry
+        self._bytes += entry.size
+
+        # evict the least recently used entries
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+
+    def close(self) -> None:
+        if self.disk is not None:
+            self.disk.close()
+
+
+_cache: Optional[ResponseCache] = None
+
+
+def get_cache() -> ResponseCache:
+    global _cache
+
+    if _cache is None:
+        _cache = ResponseCache(
+            max_entries=config.CACHE_MAX_ENTRIES,
+            max_bytes=config.CACHE_MAX_BYTES,
+            disk=DiskStore(
+                config.CACHE_DB_PATH,
+                # the longest an expired response can still be served
+                keep_expired=max(
+                    config.CACHE_STALE_WHILE_REVALIDATE, config.CACHE_STALE_IF_ERROR
+                ),
+            )
+            if config.CACHE_DB_PATH
+            else None,
+        )
+
+    return _cache
+
+
+def close_cache() -> None:
+    global _cache
+
+    if _cache is not None:
+        _cache.close()
+        _cache = None
@@ -0,0 +1,360 @@
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from msgspec import UNSET
+
+from app import config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS drama (
+    slug TEXT PRIMARY KEY,
+    title TEXT,
+    native_title TEXT,
+    country TEXT COLLATE NOCASE,
+    type TEXT,
+    year INTEGER,
+    episodes INTEGER,
+    rating REAL,
+    ranking INTEGER,
+    poster TEXT,
+    synopsis TEXT,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS drama_country_year ON drama (country, year);
+CREATE INDEX IF NOT EXISTS drama_year ON drama (year);
+CREATE INDEX IF NOT EXISTS drama_rating ON drama (rating);
+
+CREATE TABLE IF NOT EXISTS drama_genre (
+    drama TEXT,
+    genre TEXT COLLATE NOCASE,
+    PRIMARY KEY (drama, genre)
+);
+CREATE INDEX IF NOT EXISTS drama_genre_genre ON drama_genre (genre, drama);
+
+CREATE TABLE IF NOT EXISTS person (
+    slug TEXT PRIMARY KEY,
+    name TEXT,
+    native_name TEXT,
+    nationality TEXT,
+    gender TEXT,
+    born TEXT,
+    profile TEXT,
+    updated REAL
+);
+
+CREATE TABLE IF NOT EXISTS credit (
+    drama TEXT,
+    person TEXT,
+    role TEXT,
+    character TEXT,
+    PRIMARY KEY (drama, person, role)
+);
+CREATE INDEX IF NOT EXISTS credit_person ON credit (person);
+
+CREATE TABLE IF NOT EXISTS episode (
+    drama TEXT,
+    number INTEGER,
+    title TEXT,
+    air_date TEXT,
+    rating REAL,
+    link TEXT,
+    PRIMARY KEY (drama, number)
+);
+"""
+
+# e.g. "Goblin (2016)", "Goblin(2016)"
+_TITLE_YEAR = re.compile(r"^(.*?)\s*\((\d{4})\)$")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+
+def _slug(link: str) -> str:
+    # https://mydramalist.com/18452-goblin, /people/3356-gong-yoo
+    return re.sub(r"^(https?://[^/]+)?/", "", link).strip("/")
+
+
+def _number(value: Any, cast: Any = float) -> Any:
+    """the first number in a value, e.g. 16 of "16", 8.9 of "8.9/10 from 1,024 users" """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return cast(value)
+
+    match = _NUMBER.search(value.replace(",", "")) if isinstance(value, str) else None
+    return cast(float(match.group())) if match is not None else None
+
+
+def _known(value: Any) -> Any:
+    return None if value is UNSET else value
+
+
+def _role(value: Optional[str]) -> Optional[str]:
+    """
+    "main role", "director", ... whether it comes from a cast page or a person's
+    page (their case and spacing can differ), so both write the same credit
+    """
+    return " ".join(value.split()).lower() if value else None
+
+
+def _title_year(title: str) -> Tuple[str, Optional[int]]:
+    match = _TITLE_YEAR.match(title)
+    if match is None:
+        return title, None
+
+    return match.group(1), int(match.group(2))
+
+
+class EntityStore:
+    """
+    Normalized dramas, people, their credits and episodes from the scraped
+    responses, in SQLite (WAL). Only what a response knows is written, a
+    drama seen in a filmography does not erase what its own page said.
+
+    Writes go to a single background thread, in order, so they never block the
+    event loop.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="entities")
+
+    def _upsert(self, table: str, row: Dict[str, Any]) -> None:
+        # columns that are not known (None) keep their stored value
+        columns = ", ".join(row)
+        updates = ", ".join(
+            f"{c} = COALESCE(excluded.{c}, {table}.{c})" for c in row if c != "slug"
+        )
+        self._db.execute(
+            f"INSERT INTO {table} ({columns}) VALUES ({', '.join('?' * len(row))}) "
+            f"ON CONFLICT (slug) DO UPDATE SET {updates}",
+            tuple(row.values()),
+        )
+
+    def save(self, t: str, query: str, r: Dict[str, Any]) -> None:
+        """store what a scraped response knows about dramas and people"""
+        self._writer.submit(self._save, t, query, r)
+
+    def _save(self, t: str, query: str, r: Dict[str, Any]) -> None:
+        save = {
+            "drama": self._drama,
+            "cast": self._cast,
+            "person": self._person,
+            "episodes": self._episodes,
+        }.get(t)
+        if save is None:
+            return
+
+        # `{slug}/cast`, `{slug}/episodes`
+        slug = query.rsplit("/", 1)[0] if t in ("cast", "episodes") else query
+
+        with self._lock:
+            try:
+                save(slug, r["data"])
+            except Exception as e:
+                self._db.rollback()
+                print(f"Error storing {t} {query}: {e}")
+                return
+            self._db.commit()
+
+    def _drama(self, slug: str, data: Dict[str, Any]) -> None:
+        details, others = data.get("details", {}), data.get("others", {})
+        title, year = _title_year(data.get("title", ""))
+        native = others.get("native_title") or [None]
+
+        self._upsert(
+            "drama",
+            {
+                "slug": slug,
+                "title": title or None,
+                "native_title": native[0],
+                "country": details.get("country"),
+                "type": details.get("type"),
+                "year": year,
+                "episodes": _number(details.get("episodes"), int),
+                "rating": _number(data.get("rating")),
+                "ranking": _number(details.get("ranked"), int),
+                "poster": data.get("poster"),
+                "synopsis": data.get("synopsis"),
+                "updated": time.time(),
+            },
+        )
+
+        self._db.execute("DELETE FROM drama_genre WHERE drama = ?", (slug,))
+        self._db.executemany(
+            "INSERT OR IGNORE INTO drama_genre VALUES (?, ?)",
+            [(slug, genre) for genre in others.get("genres", [])],
+        )
+
+    def _cast(self, slug: str, data: Dict[str, Any]) -> None:
+        self._db.execute("DELETE FROM credit WHERE drama = ?", (slug,))
+
+        for role, casts in data.get("casts", {}).items():
+            for cast in casts:
+                person = _slug(cast.slug)
+                self._upsert("person", {"slug": person, "name": cast.name})
+
+                # the crew is listed with their job as the name of their role
+                character = _known(cast.role) and cast.role.name
+                if character == role:
+                    character = None
+
+                self._db.execute(
+                    "INSERT OR REPLACE INTO credit VALUES (?, ?, ?, ?)",
+                    (slug, person, _role(role), character),
+                )
+
+    def _person(self, slug: str, data: Dict[str, Any]) -> None:
+        details = data.get("details", {})
+        self._upsert(
+            "person",
+            {
+                "slug": slug,
+                "name": data.get("name"),
+                "native_name": details.get("native_name"),
+                "nationality": details.get("nationality"),
+                "gender": details.get("gender"),
+                "born": details.get("born"),
+                "profile": data.get("profile"),
+                "updated": time.time(),
+            },
+        )
+
+        self._db.execute("DELETE FROM credit WHERE person = ?", (slug,))
+        for works in data.get("works", {}).values():
+            for work in works:
+                drama = _slug(work.title.link)
+                self._upsert(
+                    "drama",
+                    {
+                        "slug": drama,
+                        "title": work.title.name,
+                        "year": _number(work.year, int),
+                        "rating": _number(work.rating),
+                    },
+                )
+
+                # an actor has a role, a director / screenwriter only a type
+                role = work.role if work.role is not UNSET else None
+                self._db.execute(
+                    "INSERT OR REPLACE INTO credit VALUES (?, ?, ?, ?)",
+                    (
+                        drama,
+                        slug,
+                        _role(role.type if role is not None else _known(work.type)),
+                        role.name if role is not None else None,
+                    ),
+                )
+
+    def _episodes(self, slug: str, data: Dict[str, Any]) -> None:
+        self._db.execute("DELETE FROM episode WHERE drama = ?", (slug,))
+        self._db.executemany(
+            "INSERT OR REPLACE INTO episode VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    slug,
+                    _number(episode.link.rsplit("/", 1)[-1], int),
+                    episode.title,
+                    episode.air_date,
+                    _number(episode.rating),
+                    episode.link,
+                )
+                for episode in data.get("episodes", [])
+            ],
+        )
+
+    def query_dramas(
+        self,
+        country: Optional[str] = None,
+        year: Optional[int] = None,
+        min_rating: Optional[float] = None,
+        genre: Optional[str] = None,
+        limit: int = 50,
+        offset: int = 0,
+    ) -> List[Dict[str, Any]]:
+        """the dramas matching every filter given, the best rated first"""
+        where: List[str] = []
+        params: List[Any] = []
+        if country is not None:
+            where.append("country = ?")
+            params.append(country)
+        if year is not None:
+            where.append("year = ?")
+            params.append(year)
+        if min_rating is not None:
+            where.append("rating >= ?")
+            params.append(min_rating)
+        if genre is not None:
+            where.append("slug IN (SELECT drama FROM drama_genre WHERE genre = ?)")
+            params.append(genre)
+
+        sql = (
+            "SELECT * FROM drama"
+            + (f" WHERE {' AND '.join(where)}" if where else "")
+            + " ORDER BY rating IS NULL, rating DESC, slug LIMIT ? OFFSET ?"
+        )
+
+        with self._lock:
+            rows = self._db.execute(sql, (*params, limit, offset)).fetchall()
+            genres = self._genres([row["slug"] for row in rows])
+
+        return [{**dict(row), "genres": genres.get(row["slug"], [])} for row in rows]
+
+    def _genres(self, slugs: Sequence[str]) -> Dict[str, List[str]]:
+        found: Dict[str, List[str]] = {}
+        if not slugs:
+            return found
+
+        rows = self._db.execute(
+            "SELECT drama, genre FROM drama_genre "
+            f"WHERE drama IN ({', '.join('?' * len(slugs))}) ORDER BY rowid",
+            tuple(slugs),
+        )
+        for drama, genre in rows:
+            found.setdefault(drama, []).append(genre)
+
+        return found
+
+    def counts(self) -> Dict[str, int]:
+        """rows in each table"""
+        with self._lock:
+            return {
+                t: self._db.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+                for t in ("drama", "person", "credit", "episode")
+            }
+
+    def flush(self) -> None:
+        """wait for the pending writes"""
+        self._writer.submit(lambda: None).result()
+
+    def close(self) -> None:
+        self._writer.shutdown(wait=True)
+        with self._lock:
+            self._db.close()
+
+
+_store: Optional[EntityStore] = None
+
+
+def get_entity_store() -> EntityStore:
+    global _store
+
+    if _store is None:
+        _store = EntityStore(config.ENTITY_DB_PATH)
+
+    return _store
+
+
+def close_entity_store() -> None:
+    global _store
+
+    if _store is not None:
+        _store.close()
+        _store = None
@@ -0,0 +1,32 @@
+import hashlib
+from contextvars import ContextVar
+from typing import Any, Optional
+
+import msgspec
+
+# `If-None-Match` header of the current request
+if_none_match: ContextVar[Optional[str]] = ContextVar("if_none_match", default=None)
+
+# changes on every scrape, even if nothing else did
+VOLATILE_KEYS = ("scrape_date",)
+
+
+def content_etag(r: Any) -> str:
+    """strong ETag of a scraped response, the `scrape_date` is not part of it"""
+    content = r
+    if isinstance(r, dict):
+        content = {k: v for k, v in r.items() if k not in VOLATILE_KEYS}
+    digest = hashlib.blake2b(msgspec.json.encode(content), digest_size=16)
+
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """if an `If-None-Match` header matches the ETag (weak comparison)"""
+    if not header:
+        return False
+
+    if header.strip() == "*":
+        return True
+
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
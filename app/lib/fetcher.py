@@ -0,0 +1,236 @@
+import asyncio
+import random
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Dict, Optional
+
+import requests
+from requests import Response
+
+from app import config
+from app.lib.breaker import CircuitBreaker, CircuitOpen
+from app.lib.metrics import upstream_responses
+from app.lib.scheduler import FetcherBusy as FetcherBusy  # raised by `request`
+from app.lib.scheduler import Scheduler
+from app.lib.sessions import SessionPool
+
+# statuses returned by cloudflare when the clearance is not accepted anymore
+CHALLENGE_STATUSES = (403, 503)
+
+# kinds of upstream failures
+TIMEOUT = "timeout"
+CHALLENGE = "challenge"
+RATE_LIMITED = "rate_limited"
+NOT_FOUND = "not_found"
+SERVER_ERROR = "server_error"  # other 5xx, or the connection failed
+PARSE_FAILURE = "parse_failure"
+
+# failures that may go away on their own, these are retried
+TRANSIENT = {TIMEOUT, CHALLENGE, RATE_LIMITED, SERVER_ERROR}
+
+# number of failures of each kind, parse failures are counted by the parser
+upstream_errors: Dict[str, int] = dict.fromkeys(
+    [TIMEOUT, CHALLENGE, RATE_LIMITED, NOT_FOUND, SERVER_ERROR, PARSE_FAILURE], 0
+)
+
+
+def classify_status(code: int) -> Optional[str]:
+    """kind of failure of an upstream status code, `None` if it is not one"""
+    if code in CHALLENGE_STATUSES:
+        return CHALLENGE
+    if code == 429:
+        return RATE_LIMITED
+    if code == 404:
+        return NOT_FOUND
+    if code >= 500:
+        return SERVER_ERROR
+
+    return None
+
+
+def classify_exception(e: BaseException) -> str:
+    if isinstance(e, (requests.Timeout, TimeoutError)):
+        return TIMEOUT
+
+    return SERVER_ERROR
+
+
+def backoff(attempt: int, base: float, cap: float) -> float:
+    """exponential backoff with full jitter, `attempt` starts at 0"""
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+# seconds upstream asked us to wait, only the delay-seconds form is supported
+def _retry_after(resp: Response) -> float:
+    try:
+        return max(0.0, float(resp.headers.get("Retry-After", 0)))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class Fetcher:
+    """
+    Runs the blocking cloudscraper requests on a bounded thread pool,
+    so that the event loop is free while waiting for MyDramaList.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        max_pending: int,
+        timeout: float,
+        sessions: Optional[SessionPool] = None,
+        scheduler: Optional[Scheduler] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        retries: int = 0,
+        retry_delay: float = 0.5,
+        retry_max_delay: float = 8.0,
+    ) -> None:
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.retry_max_delay = retry_max_delay
+        self.sessions = sessions or SessionPool(
+            size=workers, max_age=config.SESSION_MAX_AGE
+        )
+
+        # one request per worker, the rest wait for their turn
+        self.scheduler = scheduler or Scheduler(
+            max_in_flight=workers, max_queued=max_pending
+        )
+
+        # never opens unless a threshold is given
+        self.breaker = breaker or CircuitBreaker(threshold=0, reset_after=0)
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="mdl-fetch"
+        )
+
+    @property
+    def in_flight(self) -> int:
+        return self.scheduler.in_flight
+
+    async def request(self, method: str, url: str, **kwargs: Any) -> Response:
+        """
+        Send a request, retrying transient failures with backoff.
+        Fails fast with `CircuitOpen` while upstream keeps failing.
+        """
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise CircuitOpen("MyDramaList is unavailable.")
+
+            resp: Optional[Response] = None
+            failed: Optional[Exception] = None
+            try:
+                resp = await self._request(method, url, **kwargs)
+                kind = classify_status(resp.status_code)
+            except (FetcherBusy, asyncio.CancelledError):
+                # nothing was learned about upstream
+                self.breaker.abandon()
+                raise
+            except Exception as e:
+                kind = classify_exception(e)
+                failed = e
+
+            if kind is not None:
+                upstream_errors[kind] += 1
+
+            status = str(resp.status_code) if resp is not None else kind
+            upstream_responses.inc(status=status or "")
+
+            if kind not in TRANSIENT:
+                self.breaker.success()
+            else:
+                self.breaker.failure()
+
+            if kind not in TRANSIENT or attempt >= self.retries:
+                if failed is not None:
+                    raise failed
+
+                assert resp is not None
+                return resp
+
+            # wait outside of the scheduler, the slot is free for someone else
+            delay = backoff(attempt, self.retry_delay, self.retry_max_delay)
+            if resp is not None:
+                delay = max(delay, min(_retry_after(resp), self.retry_max_delay))
+
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _request(self, method: str, url: str, **kwargs: Any) -> Response:
+        async with self.scheduler.slot():
+            kwargs.setdefault("timeout", self.timeout)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor, partial(self._send, method, url, **kwargs)
+            )
+
+    async def get(
+        self, url: str, headers: Optional[Dict[str, str]] = None, **kwargs: Any
+    ) -> Response:
+        return await self.request("GET", url, headers=headers, **kwargs)
+
+    async def post(
+        self, url: str, data: Optional[Dict[str, Any]] = None, **kwargs: Any
+    ) -> Response:
+        return await self.request("POST", url, data=data, **kwargs)
+
+    def _send(self, method: str, url: str, **kwargs: Any) -> Response:
+        with self.sessions.session(timeout=self.timeout) as s:
+            resp: Response = s.scraper.request(method, url, **kwargs)
+
+            # start over with a fresh session if we got challenged again
+            if resp.status_code in CHALLENGE_STATUSES:
+                s.discard = True
+
+            return resp
+
+    def close(self) -> None:
+        self.scheduler.close()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.sessions.close()
+
+
+_fetcher: Optional[Fetcher] = None
+
+
+def get_fetcher() -> Fetcher:
+    global _fetcher
+
+    if _fetcher is None:
+        _fetcher = Fetcher(
+            workers=config.FETCH_WORKERS,
+            max_pending=config.FETCH_MAX_PENDING,
+            timeout=config.FETCH_TIMEOUT,
+            sessions=SessionPool(
+                size=config.SESSION_POOL_SIZE, max_age=config.SESSION_MAX_AGE
+            ),
+            scheduler=Scheduler(
+                max_in_flight=config.FETCH_MAX_IN_FLIGHT,
+                max_queued=config.FETCH_MAX_PENDING,
+                rate=config.FETCH_RATE,
+                burst=config.FETCH_BURST,
+                queue_timeout=config.FETCH_QUEUE_TIMEOUT,
+            ),
+            breaker=CircuitBreaker(
+                threshold=config.BREAKER_THRESHOLD,
+                reset_after=config.BREAKER_RESET_AFTER,
+            ),
+            retries=config.FETCH_RETRIES,
+            retry_delay=config.FETCH_RETRY_DELAY,
+            retry_max_delay=config.FETCH_RETRY_MAX_DELAY,
+        )
+
+    return _fetcher
+
+
+def close_fetcher() -> None:
+    global _fetcher
+
+    if _fetcher is not None:
+        _fetcher.close()
+        _fetcher = None
@@ -0,0 +1,90 @@
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from app import config
+
+# the part of a MyDramaList page that is actually scraped,
+# everything around it (ads, tokens, the footer) changes on every request
+CONTENT_START = 'class="app-body"'
+CONTENT_END = "<footer"
+
+
+def page_digest(html: str) -> str:
+    """hash of the scraped region of a page"""
+    start = html.find(CONTENT_START)
+    start = 0 if start < 0 else start
+
+    end = html.find(CONTENT_END, start)
+    end = len(html) if end < 0 else end
+
+    return hashlib.blake2b(
+        html[start:end].encode("utf-8", "surrogatepass"), digest_size=16
+    ).hexdigest()
+
+
+class KnownPage:
+    """the validators of an upstream page and what was parsed from it"""
+
+    __slots__ = ("etag", "last_modified", "digest", "result")
+
+    def __init__(
+        self,
+        etag: Optional[str],
+        last_modified: Optional[str],
+        digest: str,
+        result: Any,
+    ) -> None:
+        self.etag = etag
+        self.last_modified = last_modified
+        self.digest = digest
+        self.result = result
+
+    def conditional_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+
+        return headers
+
+
+class KnownPages:
+    """
+    Remembers the last parse of each upstream page (LRU, bounded by entries),
+    so an unchanged page is neither downloaded in full nor parsed again.
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._pages: OrderedDict[Hashable, KnownPage] = OrderedDict()
+
+        # `not_modified` are 304s, `unchanged` are full pages with the same digest
+        self.stats: Dict[str, int] = {"not_modified": 0, "unchanged": 0}
+
+    def __len__(self) -> int:
+        return len(self._pages)
+
+    def get(self, key: Hashable) -> Optional[KnownPage]:
+        page = self._pages.get(key)
+        if page is not None:
+            self._pages.move_to_end(key)
+
+        return page
+
+    def set(self, key: Hashable, page: KnownPage) -> None:
+        if self.max_entries <= 0:
+            return
+
+        self._pages[key] = page
+        self._pages.move_to_end(key)
+
+        while len(self._pages) > self.max_entries:
+            self._pages.popitem(last=False)
+
+    def clear(self) -> None:
+        self._pages.clear()
+
+
+known_pages = KnownPages(max_entries=config.UPSTREAM_KNOWN_PAGES)
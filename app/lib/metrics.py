@@ -0,0 +1,239 @@
+import bisect
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple, Union
+
+# content type of the prometheus text format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = Tuple[str, ...]
+
+# seconds, from a cached parse to a slow upstream
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+# bytes, MyDramaList pages are ~50KB to a few MB (people with hundreds of works)
+SIZE_BUCKETS = (
+    16_384,
+    65_536,
+    131_072,
+    262_144,
+    524_288,
+    1_048_576,
+    2_097_152,
+    4_194_304,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _format(name: str, names: Sequence[str], values: Labels, value: float) -> str:
+    if not names:
+        return f"{name} {_number(value)}"
+
+    labels = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(names, values, strict=True))
+    return f"{name}{{{labels}}} {_number(value)}"
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+
+    def _key(self, labels: Dict[str, str]) -> Labels:
+        return tuple(str(labels.get(k, "")) for k in self.labels)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} {self.type}",
+            *self.samples(),
+        ]
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labels)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        return [
+            _format(self.name, self.labels, key, value)
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+        # per label values: the count of each bucket (and +Inf), the sum
+        self._counts: Dict[Labels, List[int]] = {}
+        self._sums: Dict[Labels, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            self._sums[key] = 0.0
+
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self._sums[key] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: str) -> int:
+        return sum(self._counts.get(self._key(labels), ()))
+
+    def samples(self) -> List[str]:
+        lines = []
+        names = (*self.labels, "le")
+
+        bounds = [_number(b) for b in self.buckets] + ["+Inf"]
+
+        for key, counts in sorted(self._counts.items()):
+            total = 0
+            for le, n in zip(bounds, counts, strict=True):
+                total += n
+                lines.append(_format(f"{self.name}_bucket", names, (*key, le), total))
+
+            lines.append(_format(f"{self.name}_sum", self.labels, key, self._sums[key]))
+            lines.append(_format(f"{self.name}_count", self.labels, key, total))
+
+        return lines
+
+
+class Collected(Metric):
+    """read when scraped, from state that is already tracked somewhere else"""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        collect: Callable[[], Union[float, Dict[Labels, float]]],
+        labels: Sequence[str] = (),
+        type: str = "gauge",
+    ) -> None:
+        super().__init__(name, help, labels)
+        self.collect = collect
+        self.type = type
+
+    def samples(self) -> List[str]:
+        values = self.collect()
+        if not isinstance(values, dict):
+            values = {(): values}
+
+        return [
+            _format(self.name, self.labels, key, value)
+            for key, value in sorted(values.items())
+        ]
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> None:
+        # re-registering replaces it, e.g. when a module is reloaded
+        self._metrics[metric.name] = metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        counter = Counter(name, help, labels)
+        self.register(counter)
+        return counter
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        histogram = Histogram(name, help, labels, buckets)
+        self.register(histogram)
+        return histogram
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# where the time of a request goes: cache (lookup), fetch (upstream),
+# parse (html to soup), extract (the handler's `_get`) and encode (msgspec),
+# recorded with `app.lib.timing.timed`
+stage_seconds = registry.histogram(
+    "kuryana_stage_seconds",
+    "Seconds spent in each stage of a scrape, by handler.",
+    labels=("stage", "handler"),
+)
+upstream_responses = registry.counter(
+    "kuryana_upstream_responses_total",
+    "Responses of MyDramaList by status code, or the kind of error if there was none.",
+    labels=("status",),
+)
+html_bytes = registry.histogram(
+    "kuryana_upstream_html_bytes",
+    "Size of the downloaded pages, by handler.",
+    labels=("handler",),
+    buckets=SIZE_BUCKETS,
+)
+cache_lookups = registry.counter(
+    "kuryana_cache_lookups_total",
+    "Response cache lookups by type and result (HIT / MISS / STALE).",
+    labels=("type", "result"),
+)
@@ -1,9 +1,41 @@
-from typing import Any
+from typing import Any, AsyncIterable, AsyncIterator, Mapping, Optional
 
 import msgspec
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.lib.timing import timed
 
 
 class MsgSpecJSONResponse(JSONResponse):
     def render(self, content: Any) -> bytes:
-        return msgspec.json.encode(content)
+        with timed("encode", "json"):
+            return msgspec.json.encode(content)
+
+
+class MsgSpecNDJSONResponse(StreamingResponse):
+    """streams one json document per line, each is sent as soon as it is ready"""
+
+    media_type = "application/x-ndjson"
+
+    def __init__(
+        self,
+        content: AsyncIterable[Any],
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+    ) -> None:
+        super().__init__(
+            self._encode(content),
+            status_code=status_code,
+            headers=headers,
+            media_type=self.media_type,
+        )
+
+    @staticmethod
+    async def _encode(content: AsyncIterable[Any]) -> AsyncIterator[bytes]:
+        encoder = msgspec.json.Encoder()
+        buf = bytearray()
+
+        async for item in content:
+            encoder.encode_into(item, buf)
+            buf.extend(b"\n")
+            yield bytes(buf)
@@ -0,0 +1,116 @@
+import asyncio
+import importlib
+import io
+import multiprocessing
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, TypeVar
+
+from app import config
+from app.lib.fetcher import upstream_errors
+from app.lib.timing import record, stage_log
+
+T = TypeVar("T")
+
+# imported by every worker before it takes its first page
+WARM_MODULES = ["app.utils"]
+
+
+def _warm_up() -> None:
+    for module in WARM_MODULES:
+        importlib.import_module(module)
+
+
+def _ping() -> None:
+    """no-op task, used to start the workers"""
+
+
+class Observed(NamedTuple):
+    """the result of a task and what the worker saw while running it"""
+
+    result: Any
+    stages: List[Tuple[str, str, float]]  # (stage, handler, seconds)
+    errors: Dict[str, int]  # new upstream errors, e.g. parse failures
+    output: str  # what it printed
+
+
+def _observed(fn: Callable[..., Any], *args: Any) -> Observed:
+    # the metrics of a worker process are never scraped, so they are sent back
+    stages: List[Tuple[str, str, float]] = []
+    errors = dict(upstream_errors)
+    output = io.StringIO()
+
+    token = stage_log.set(stages)
+    try:
+        with redirect_stdout(output):
+            result = fn(*args)
+    finally:
+        stage_log.reset(token)
+
+    return Observed(
+        result,
+        stages,
+        {k: v - errors[k] for k, v in upstream_errors.items() if v != errors[k]},
+        output.getvalue(),
+    )
+
+
+class ParsePool:
+    """
+    Runs the CPU-bound parsing on a pool of worker processes,
+    so that a big page does not hold up the event loop (and the other requests).
+    """
+
+    def __init__(self, workers: int) -> None:
+        self.workers = workers
+
+        # `spawn`, forking a process that already runs the fetcher threads is unsafe
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warm_up,
+        )
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        loop = asyncio.get_running_loop()
+        observed = await loop.run_in_executor(self._executor, _observed, fn, *args)
+
+        # as if it had run here, for /metrics, /stats and `Server-Timing`
+        for stage, handler, seconds in observed.stages:
+            record(stage, handler, seconds)
+        for kind, count in observed.errors.items():
+            upstream_errors[kind] += count
+        if observed.output:
+            sys.stdout.write(observed.output)
+
+        result: T = observed.result
+        return result
+
+    async def warm(self) -> None:
+        # start every worker now instead of on the first requests
+        await asyncio.gather(*[self.run(_ping) for _ in range(self.workers)])
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_parse_pool: Optional[ParsePool] = None
+
+
+def get_parse_pool() -> Optional[ParsePool]:
+    """the shared parse pool, `None` if pages are parsed in-process"""
+    global _parse_pool
+
+    if _parse_pool is None and config.PARSE_WORKERS > 0:
+        _parse_pool = ParsePool(workers=config.PARSE_WORKERS)
+
+    return _parse_pool
+
+
+def close_parse_pool() -> None:
+    global _parse_pool
+
+    if _parse_pool is not None:
+        _parse_pool.close()
+        _parse_pool = None
@@ -0,0 +1,146 @@
+import asyncio
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+from app import config, utils
+from app.lib.scheduler import PREFETCH, fetch_priority
+
+# homepage lists of the dramas that get the most traffic, and where their links are
+HOT_LISTS = {
+    "topairing": "topAiringShows",
+    "trendingthisweek": "trendingThisWeek",
+}
+
+# what is scraped for each of them, `{slug}` is replaced with the drama
+RESOURCES = [
+    ("{slug}", "drama"),
+    ("{slug}/cast", "cast"),
+    ("{slug}/episodes", "episodes"),
+]
+
+
+def _slug(link: str) -> Optional[str]:
+    # e.g. https://mydramalist.com/18452-goblin
+    slug = urlparse(link).path.strip("/")
+    return slug or None
+
+
+class Prefetcher:
+    """
+    Keeps the dramas that are airing or trending right now warm in the cache,
+    so the requests for them do not have to wait on MyDramaList.
+    Scrapes at the lowest priority and only a few at a time.
+    """
+
+    def __init__(self, interval: float, concurrency: int, max_dramas: int) -> None:
+        self.interval = interval
+        self.concurrency = concurrency
+        self.max_dramas = max_dramas
+
+        self._task: Optional["asyncio.Future[None]"] = None
+
+        # `fresh` were still cached long enough, `failed` did not scrape with a 200
+        self.stats: Dict[str, int] = {
+            "runs": 0,
+            "dramas": 0,
+            "scraped": 0,
+            "fresh": 0,
+            "failed": 0,
+        }
+
+    async def hot_slugs(self) -> List[str]:
+        slugs: Dict[str, None] = {}  # keeps the order, top airing first
+
+        for t, key in HOT_LISTS.items():
+            code, r = await utils.fetch_func(query="", t=t)
+            if code != 200:
+                continue
+
+            for show in r["data"].get(key, []):
+                slug = _slug(show.get("link", ""))
+                if slug is not None:
+                    slugs[slug] = None
+
+        return list(slugs)[: self.max_dramas]
+
+    async def run_once(self) -> None:
+        fetch_priority.set(PREFETCH)  # requests of clients go first
+
+        slugs = await self.hot_slugs()
+        sem = asyncio.Semaphore(self.concurrency)
+
+        async def prefetch(query: str, t: str) -> None:
+            # still cached after the next run, nothing to do
+            if await utils.expires_in(t, query) > self.interval:
+                self.stats["fresh"] += 1
+                return
+
+            async with sem:
+                try:
+                    code, _ = await utils.refresh_func(query=query, t=t)
+                except Exception as e:
+                    print(f"Error prefetching {t} {query}: {e}")
+                    code = 500
+
+            self.stats["scraped" if code == 200 else "failed"] += 1
+
+        await asyncio.gather(
+            *[
+                prefetch(query.format(slug=slug), t)
+                for slug in slugs
+                for query, t in RESOURCES
+            ]
+        )
+
+        self.stats["runs"] += 1
+        self.stats["dramas"] = len(slugs)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"Error in prefetch run: {e}")
+
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+        self._task = None
+
+
+_prefetcher: Optional[Prefetcher] = None
+
+
+def get_prefetcher() -> Optional[Prefetcher]:
+    """the prefetcher, `None` if prefetching is disabled"""
+    global _prefetcher
+
+    if _prefetcher is None and config.PREFETCH_INTERVAL > 0:
+        _prefetcher = Prefetcher(
+            interval=config.PREFETCH_INTERVAL,
+            concurrency=config.PREFETCH_CONCURRENCY,
+            max_dramas=config.PREFETCH_MAX_DRAMAS,
+        )
+
+    return _prefetcher
+
+
+async def close_prefetcher() -> None:
+    global _prefetcher
+
+    if _prefetcher is not None:
+        await _prefetcher.stop()
+        _prefetcher = None
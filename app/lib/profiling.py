@@ -0,0 +1,98 @@
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import time
+from typing import List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from app.lib.timing import ASGIApp, Message, Receive, Scope, Send
+
+# number of functions listed in a profile
+PROFILE_LINES = 60
+
+
+def _header(scope: Scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", []):
+        if key.lower() == name:
+            return bytes(value).decode("latin-1")
+
+    return None
+
+
+class ProfileMiddleware:
+    """
+    Runs a request under cProfile if it asks for it with `?_profile=1`
+    (or `X-Profile: 1`) and has the `X-Profile-Token`, and answers with the
+    profile instead of the response. Disabled without a token.
+
+    Everything the event loop runs in the meantime is profiled too,
+    so it is best used on a quiet instance.
+    """
+
+    def __init__(self, app: ASGIApp, token: str, directory: str = "") -> None:
+        self.app = app
+        self.token = token
+        self.directory = directory  # `.prof` files are kept here, if set
+
+        self._running = False  # only one profiler can run at a time
+
+    def _wanted(self, scope: Scope) -> bool:
+        if not self.token or scope["type"] != "http":
+            return False
+
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        if query.get("_profile") != ["1"] and _header(scope, b"x-profile") != "1":
+            return False
+
+        token = _header(scope, b"x-profile-token") or ""
+        return hmac.compare_digest(token.encode(), self.token.encode())
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self._running or not self._wanted(scope):
+            await self.app(scope, receive, send)
+            return
+
+        status = 0
+        headers: List[Tuple[bytes, bytes]] = []
+
+        # the response itself is dropped, only its status and headers are kept
+        async def capture(message: Message) -> None:
+            nonlocal status, headers
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+
+        profiler = cProfile.Profile()
+        self._running = True
+        try:
+            profiler.enable()
+            try:
+                await self.app(scope, receive, capture)
+            finally:
+                profiler.disable()
+        finally:
+            self._running = False
+
+        report = io.StringIO()
+        stats = pstats.Stats(profiler, stream=report)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(PROFILE_LINES)
+
+        extra = [
+            (b"x-profiled-status", str(status).encode()),
+            *[(k, v) for k, v in headers if k.lower() == b"server-timing"],
+        ]
+        if self.directory:
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{id(profiler)}.prof"
+            stats.dump_stats(os.path.join(self.directory, name))
+            extra.append((b"x-profile-file", name.encode()))
+
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"text/plain; charset=utf-8"), *extra],
+            }
+        )
+        await send({"type": "http.response.body", "body": report.getvalue().encode()})
@@ -0,0 +1,281 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+# priority classes of upstream requests, lower ones are sent first
+INTERACTIVE = 0
+BATCH = 1
+PREFETCH = 2
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch", PREFETCH: "prefetch"}
+
+# priority of the upstream requests made by the current task
+fetch_priority: ContextVar[int] = ContextVar("fetch_priority", default=INTERACTIVE)
+
+
+class SharedPriority:
+    """
+    priority of work shared by several callers (see `SingleFlight`), the one of
+    the most urgent caller, it goes up when a more urgent one joins
+    """
+
+    def __init__(self, value: int) -> None:
+        self.value = value
+        self._listeners: List[Callable[[int], None]] = []
+
+    def raise_to(self, priority: int) -> None:
+        if priority >= self.value:
+            return
+
+        self.value = priority
+        for listener in list(self._listeners):
+            listener(priority)
+
+    def listen(self, listener: Callable[[int], None]) -> None:
+        self._listeners.append(listener)
+
+    def unlisten(self, listener: Callable[[int], None]) -> None:
+        self._listeners.remove(listener)
+
+
+# set in the tasks that run shared work, overrides `fetch_priority`
+shared_priority: ContextVar[Optional[SharedPriority]] = ContextVar(
+    "shared_priority", default=None
+)
+
+
+def current_priority() -> int:
+    """priority of the upstream requests made by the current task"""
+    shared = shared_priority.get()
+    return shared.value if shared is not None else fetch_priority.get()
+
+
+class FetcherBusy(Exception):
+    """raised when too many upstream requests are already waiting"""
+
+    code = 503
+
+
+class QueueTimeout(FetcherBusy):
+    """raised when an upstream request waited too long for its turn"""
+
+    def __init__(self, code: int) -> None:
+        super().__init__("Timed out waiting for an upstream slot.")
+        self.code = code
+
+
+class TokenBucket:
+    """`rate` requests per second on average, up to `burst` at once"""
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            float(self.burst), self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def take(self) -> bool:
+        # a rate of 0 is unlimited
+        if self.rate <= 0:
+            return True
+
+        self._refill()
+        if self._tokens < 1:
+            return False
+
+        self._tokens -= 1
+        return True
+
+    def delay(self) -> float:
+        """seconds until the next token"""
+        if self.rate <= 0:
+            return 0.0
+
+        self._refill()
+        return max(0.0, (1 - self._tokens) / self.rate)
+
+
+class Scheduler:
+    """
+    Sends upstream requests in priority order, at most `max_in_flight` at a time
+    and no faster than the token bucket allows, the others wait in a queue.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int,
+        max_queued: int,
+        rate: float = 0,
+        burst: int = 1,
+        queue_timeout: Optional[float] = None,
+    ) -> None:
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.bucket = TokenBucket(rate, burst)
+
+        self._queue: List[Tuple[int, int, "asyncio.Future[None]"]] = []
+        # (priority, order) of the queued requests, a request that was raised
+        # to a higher priority also has a stale entry left in `_queue`
+        self._queued: Dict["asyncio.Future[None]", Tuple[int, int]] = {}
+        self._order = itertools.count()  # first come, first served within a priority
+        self._depth = dict.fromkeys(PRIORITY_NAMES, 0)
+        self._in_flight = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # `waited` had to queue, `rejected` found the queue full
+        self.stats: Dict[str, int] = {
+            "sent": 0,
+            "waited": 0,
+            "rejected": 0,
+            "timeouts": 0,
+        }
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queued(self) -> int:
+        return sum(self._depth.values())
+
+    def depth(self) -> Dict[str, int]:
+        """number of queued requests of each priority"""
+        return {PRIORITY_NAMES[p]: n for p, n in self._depth.items()}
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self) -> None:
+        if (
+            not self.queued
+            and self._in_flight < self.max_in_flight
+            and self.bucket.take()
+        ):
+            self._send()
+            return
+
+        # backpressure, reject instead of queueing forever
+        if self.queued >= self.max_queued:
+            self.stats["rejected"] += 1
+            raise FetcherBusy("Too many upstream requests.")
+
+        waiter: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        self._enqueue(waiter, current_priority(), next(self._order))
+        self.stats["waited"] += 1
+        self._dispatch()
+
+        try:
+            with self._follow(waiter):
+                async with asyncio.timeout(self.queue_timeout):
+                    await waiter
+
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # it was our turn right as we gave up
+                if isinstance(e, TimeoutError):
+                    return
+
+                self.release()
+                raise
+
+            waiter.cancel()
+            self._dequeue(waiter)
+
+            if isinstance(e, TimeoutError):
+                self.stats["timeouts"] += 1
+                # waiting on the rate limit rather than on a free slot
+                code = 429 if self._in_flight < self.max_in_flight else 503
+                raise QueueTimeout(code) from None
+
+            raise
+
+    # move up the queue if a more urgent caller starts waiting on the same work
+    @contextmanager
+    def _follow(self, waiter: "asyncio.Future[None]") -> Iterator[None]:
+        shared = shared_priority.get()
+        if shared is None:
+            yield
+            return
+
+        def raised(priority: int) -> None:
+            if waiter in self._queued:
+                self._enqueue(waiter, priority, self._queued[waiter][1])
+
+        shared.listen(raised)
+        try:
+            yield
+        finally:
+            shared.unlisten(raised)
+
+    def _enqueue(
+        self, waiter: "asyncio.Future[None]", priority: int, order: int
+    ) -> None:
+        self._dequeue(waiter)
+        self._queued[waiter] = (priority, order)
+        self._depth[priority] += 1
+        heapq.heappush(self._queue, (priority, order, waiter))
+
+    def _dequeue(self, waiter: "asyncio.Future[None]") -> None:
+        queued = self._queued.pop(waiter, None)
+        if queued is not None:
+            self._depth[queued[0]] -= 1
+
+    def release(self) -> None:
+        self._in_flight -= 1
+        self._dispatch()
+
+    def _send(self) -> None:
+        self._in_flight += 1
+        self.stats["sent"] += 1
+
+    # let the queued requests go, as far as the slots and tokens allow
+    def _dispatch(self) -> None:
+        while self._queue and self._in_flight < self.max_in_flight:
+            priority, order, waiter = self._queue[0]
+            if self._queued.get(waiter) != (priority, order):
+                # timed out, cancelled, or queued again with a higher priority
+                heapq.heappop(self._queue)
+                continue
+
+            if not self.bucket.take():
+                self._dispatch_later(self.bucket.delay())
+                return
+
+            heapq.heappop(self._queue)
+            self._dequeue(waiter)
+            self._send()
+            waiter.set_result(None)
+
+    def _dispatch_later(self, delay: float) -> None:
+        loop = asyncio.get_running_loop()
+        if self._timer is not None and self._timer_loop is loop:
+            return
+
+        self._timer = loop.call_later(delay, self._on_timer)
+        self._timer_loop = loop
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._dispatch()
+
+    def close(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
@@ -0,0 +1,480 @@
+import bisect
+import heapq
+import math
+import re
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+from urllib.parse import urlparse
+
+from app import config
+from app.handlers.models import SearchDrama, SearchPerson
+
+DRAMA = "drama"
+PERSON = "person"
+
+# where an entry comes from, the more authoritative the higher
+MENTION = 0  # a cast member, a filmography row, a list item
+RESULT = 1  # a search result
+PAGE = 2  # the drama or person page itself
+
+# e.g. "Goblin (2016)"
+_TITLE_YEAR = re.compile(r"^(.*?)\s*\((\d{4})\)$")
+_NOT_WORD = re.compile(r"[^\w]+")
+
+
+def normalize(text: str) -> str:
+    """lowercase words, without accents and punctuation"""
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return _NOT_WORD.sub(" ", text).strip()
+
+
+def trigrams(text: str) -> Set[str]:
+    """trigrams of every word, padded so the start of a word counts the most"""
+    grams: Set[str] = set()
+    for word in normalize(text).split():
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+
+    return grams
+
+
+def _slug(link: str) -> str:
+    # https://mydramalist.com/18452-goblin, /people/3356-gong-yoo
+    return urlparse(link).path.strip("/")
+
+
+def _ranking(ranking: Any) -> Optional[int]:
+    # "#1,209"
+    if not isinstance(ranking, str):
+        return None
+
+    digits = ranking.lstrip("#").replace(",", "")
+    return int(digits) if digits.isdigit() else None
+
+
+def _rating(rating: Any) -> Optional[float]:
+    return float(rating) if isinstance(rating, (int, float)) else None
+
+
+def _year(year: Any) -> Optional[int]:
+    if isinstance(year, int):
+        return year
+
+    return int(year) if isinstance(year, str) and year.isdigit() else None
+
+
+class Entry:
+    """a drama or a person, from whatever was scraped about it"""
+
+    __slots__ = (
+        "kind",
+        "slug",
+        "title",
+        "aliases",
+        "thumb",
+        "type",
+        "year",
+        "series",
+        "ranking",
+        "rating",
+        "nationality",
+        "source",
+    )
+
+    def __init__(
+        self,
+        kind: str,
+        slug: str,
+        title: str,
+        aliases: Tuple[str, ...] = (),
+        thumb: Optional[str] = None,
+        type: Optional[str] = None,
+        year: Optional[int] = None,
+        series: Union[str, bool, None] = None,
+        ranking: Optional[int] = None,
+        rating: Optional[float] = None,
+        nationality: Optional[str] = None,
+        source: int = MENTION,
+    ) -> None:
+        self.kind = kind
+        self.slug = slug
+        self.title = title
+        self.aliases = aliases  # native titles / names, also known as
+        self.thumb = thumb
+        self.type = type
+        self.year = year
+        self.series = series
+        self.ranking = ranking
+        self.rating = rating
+        self.nationality = nationality
+        self.source = source
+
+    @property
+    def key(self) -> str:
+        return f"{self.kind}:{self.slug}"
+
+    def names(self) -> Iterator[str]:
+        yield self.title
+        yield from self.aliases
+
+    def merge(self, other: "Entry") -> None:
+        """
+        keep what is known, a less authoritative source (a filmography row
+        after the drama page) only fills in what is still missing
+        """
+        overwrite = other.source >= self.source
+        for name in self.__slots__:
+            value = getattr(other, name)
+            if name == "aliases":
+                value = tuple(dict.fromkeys(self.aliases + value))
+            elif not overwrite and getattr(self, name) is not None:
+                continue
+            if value is not None:
+                setattr(self, name, value)
+
+    def popularity(self) -> Tuple[int, float]:
+        """sorts the most popular first"""
+        return (
+            self.ranking if self.ranking is not None else 1 << 30,
+            -(self.rating or 0.0),
+        )
+
+    def suggestion(self) -> Dict[str, Any]:
+        """the entry as an autocomplete suggestion"""
+        return {
+            "kind": self.kind,
+            "slug": self.slug,
+            "title": self.title,
+            "thumb": self.thumb,
+            "year": self.year,
+            "ranking": self.ranking,
+            "rating": self.rating,
+        }
+
+    def result(self) -> Union[SearchDrama, SearchPerson]:
+        """the entry as a search result"""
+        if self.kind == PERSON:
+            return SearchPerson(
+                slug=self.slug,
+                thumb=self.thumb or "",
+                name=self.title,
+                nationality=self.nationality or "",
+            )
+
+        return SearchDrama(
+            slug=self.slug,
+            thumb=self.thumb or "",
+            mdl_id=f"mdl-{self.slug.split('-', 1)[0]}",
+            title=self.title,
+            ranking=f"#{self.ranking}" if self.ranking is not None else None,
+            type=self.type,
+            year=self.year,
+            series=self.series if self.series is not None else False,
+        )
+
+
+def _drama(data: Dict[str, Any], query: str) -> Iterator[Entry]:
+    title, year = data.get("title", ""), None
+    match = _TITLE_YEAR.match(title)
+    if match is not None:
+        title, year = match.group(1), int(match.group(2))
+
+    details, others = data.get("details", {}), data.get("others", {})
+    yield Entry(
+        DRAMA,
+        query,
+        title,
+        aliases=tuple(others.get("native_title", []) + others.get("also_known_as", [])),
+        thumb=data.get("poster"),
+        year=year,
+        ranking=_ranking(details.get("ranked")),
+        rating=_rating(data.get("rating")),
+        source=PAGE,
+    )
+
+    for cast in data.get("casts", []):
+        yield Entry(PERSON, _slug(cast.slug), cast.name, thumb=cast.profile_image)
+
+
+def _person(data: Dict[str, Any], query: str) -> Iterator[Entry]:
+    details = data.get("details", {})
+    native = details.get("native_name")
+    yield Entry(
+        PERSON,
+        query,
+        data.get("name", ""),
+        aliases=(native,) if native else (),
+        thumb=data.get("profile"),
+        nationality=details.get("nationality"),
+        source=PAGE,
+    )
+
+    for works in data.get("works", {}).values():
+        for work in works:
+            yield Entry(
+                DRAMA,
+                _slug(work.title.link),
+                work.title.name,
+                year=_year(work.year),
+                rating=_rating(work.rating),
+            )
+
+
+def _search(results: Dict[str, Any]) -> Iterator[Entry]:
+    for drama in results.get("dramas", []):
+        yield Entry(
+            DRAMA,
+            drama.slug,
+            drama.title,
+            thumb=drama.thumb,
+            type=drama.type,
+            year=drama.year,
+            series=drama.series,
+            ranking=_ranking(drama.ranking),
+            source=RESULT,
+        )
+
+    for person in results.get("people", []):
+        yield Entry(
+            PERSON,
+            person.slug,
+            person.name,
+            thumb=person.thumb,
+            nationality=person.nationality,
+            source=RESULT,
+        )
+
+
+def _list(data: Dict[str, Any]) -> Iterator[Entry]:
+    for item in data.get("list", []):
+        if hasattr(item, "title"):
+            yield Entry(
+                DRAMA,
+                _slug(item.slug),
+                item.title,
+                thumb=item.image,
+                type=item.type,
+                year=_year(item.year),
+            )
+        else:
+            yield Entry(
+                PERSON,
+                _slug(item.slug),
+                item.name,
+                thumb=item.image,
+                nationality=item.nationality,
+            )
+
+
+def entries(t: str, query: str, r: Dict[str, Any]) -> List[Entry]:
+    """the dramas and people in a scraped response"""
+    if t == "drama":
+        found = _drama(r["data"], query)
+    elif t == "person":
+        found = _person(r["data"], query)
+    elif t == "search":
+        found = _search(r["results"])
+    elif t == "lists":
+        found = _list(r["data"])
+    else:
+        return []
+
+    return [e for e in found if e.slug and e.title]
+
+
+# prefixes this long or shorter have their suggestions remembered
+SHORT_PREFIX = 2
+
+# (normalized name from one of its words on, if it starts later than the name, key)
+Name = Tuple[str, bool, str]
+
+
+class PrefixIndex:
+    """
+    Sorted array of the names of the entries, from each of their words on,
+    so a prefix is found with two bisects. Updated in place, one entry at a time.
+    """
+
+    def __init__(self) -> None:
+        self._names: List[Name] = []
+        self._entry_names: Dict[str, List[Name]] = {}
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def add(self, key: str, names: Iterable[str]) -> None:
+        self.remove(key)
+
+        found: Dict[Name, None] = {}
+        for name in names:
+            words = normalize(name).split()
+            for i in range(len(words)):
+                found[" ".join(words[i:]), i > 0, key] = None
+
+        for item in found:
+            bisect.insort(self._names, item)
+        self._entry_names[key] = list(found)
+
+    def remove(self, key: str) -> None:
+        for item in self._entry_names.pop(key, ()):
+            i = bisect.bisect_left(self._names, item)
+            if i < len(self._names) and self._names[i] == item:
+                del self._names[i]
+
+    def matches(self, prefix: str) -> List[Name]:
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+
+        lo = bisect.bisect_left(self._names, (prefix,))
+        hi = bisect.bisect_left(self._names, (prefix + "\U0010ffff",), lo)
+        return self._names[lo:hi]
+
+    def clear(self) -> None:
+        self._names.clear()
+        self._entry_names.clear()
+
+
+class SearchIndex:
+    """
+    In-process trigram index over the titles and names of everything scraped,
+    LRU bounded by entries. Lookups tolerate typos: an entry matches if it
+    shares most of the trigrams of the query. Its names are also kept in a
+    `PrefixIndex` for suggestions.
+    """
+
+    def __init__(self, max_entries: int, min_similarity: float = 0.4) -> None:
+        self.max_entries = max_entries
+        self.min_similarity = min_similarity
+
+        self._entries: OrderedDict[str, Entry] = OrderedDict()
+        self._grams: Dict[str, Set[str]] = {}  # trigram -> keys of the entries
+        self._entry_grams: Dict[str, Set[str]] = {}
+        self.prefixes = PrefixIndex()
+        # suggestions for the short prefixes, which match the most names,
+        # until the next change
+        self._suggested: Dict[Tuple[str, int], List[Entry]] = {}
+
+        self.stats: Dict[str, int] = {
+            "indexed": 0,
+            "lookups": 0,
+            "hits": 0,
+            "suggestions": 0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, kind: str, slug: str) -> Optional[Entry]:
+        return self._entries.get(f"{kind}:{slug}")
+
+    def add(self, entry: Entry) -> Entry:
+        """index an entry, or what is new about it"""
+        if self.max_entries <= 0:
+            return entry
+
+        key = entry.key
+        old = self._entries.get(key)
+        if old is not None:
+            old.merge(entry)
+            entry = old
+            self._unlink(key)
+
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+
+        grams = set().union(*(trigrams(name) for name in entry.names()))
+        self._entry_grams[key] = grams
+        for gram in grams:
+            self._grams.setdefault(gram, set()).add(key)
+        self.prefixes.add(key, entry.names())
+        self._suggested.clear()
+
+        self.stats["indexed"] += 1
+
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            self._unlink(evicted)
+
+        return entry
+
+    def _unlink(self, key: str) -> None:
+        self.prefixes.remove(key)
+        self._suggested.clear()
+        for gram in self._entry_grams.pop(key, ()):
+            keys = self._grams[gram]
+            keys.discard(key)
+            if not keys:
+                del self._grams[gram]
+
+    def search(self, query: str, limit: int = 20) -> Dict[str, List[Entry]]:
+        """the best matches of each kind, the most similar and popular first"""
+        self.stats["lookups"] += 1
+
+        wanted = trigrams(query)
+        found: Dict[str, List[Entry]] = {DRAMA: [], PERSON: []}
+        if not wanted:
+            return found
+
+        # an entry with `needed` of the trigrams has at least one of the rarest
+        # `len - needed + 1`, so only those are scanned for candidates
+        postings = sorted((self._grams.get(g, set()) for g in wanted), key=len)
+        needed = max(1, math.ceil(len(wanted) * self.min_similarity))
+        candidates = set().union(*postings[: len(postings) - needed + 1])
+
+        scored = []
+        for key in candidates:
+            count = sum(key in keys for keys in postings)
+            if count >= needed:
+                scored.append((-count, self._entries[key].popularity(), key))
+        scored.sort()
+
+        for _, _, key in scored:
+            entry = self._entries[key]
+            if len(found[entry.kind]) < limit:
+                found[entry.kind].append(entry)
+
+        if scored:
+            self.stats["hits"] += 1
+
+        return found
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[Entry]:
+        """
+        entries with a name (or a word of it) starting with `prefix`,
+        the names that start with it first, then the most popular
+        """
+        self.stats["suggestions"] += 1
+
+        prefix = normalize(prefix)
+        suggested = self._suggested.get((prefix, limit))
+        if suggested is not None:
+            return suggested
+
+        later: Dict[str, bool] = {}
+        for _, starts_later, key in self.prefixes.matches(prefix):
+            later[key] = later.get(key, True) and starts_later
+
+        best = heapq.nsmallest(
+            limit,
+            later,
+            key=lambda key: (later[key], self._entries[key].popularity(), key),
+        )
+        suggested = [self._entries[key] for key in best]
+
+        if len(prefix) <= SHORT_PREFIX:
+            self._suggested[prefix, limit] = suggested
+
+        return suggested
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._grams.clear()
+        self._entry_grams.clear()
+        self.prefixes.clear()
+        self._suggested.clear()
+
+
+search_index = SearchIndex(config.SEARCH_INDEX_MAX_ENTRIES)
@@ -0,0 +1,124 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+# bypassing cloudflare anti-bot
+import cloudscraper  # type: ignore[import-untyped]
+
+from app.lib.scheduler import FetcherBusy
+
+# cookie set by cloudflare once the challenge was solved
+CLEARANCE_COOKIE = "cf_clearance"
+
+
+class NoFreeSession(FetcherBusy):
+    """
+    raised when every session stayed in use for the whole timeout, we are busy,
+    upstream did nothing wrong
+    """
+
+    def __init__(self) -> None:
+        super().__init__("No free upstream session.")
+
+
+class PooledSession:
+    def __init__(self, scraper: cloudscraper.CloudScraper) -> None:
+        self.scraper = scraper
+        self.created = time.monotonic()
+        self.discard = False  # set by the user if the session should not be reused
+
+    def clearance_expired(self) -> bool:
+        for cookie in self.scraper.cookies:
+            if cookie.name == CLEARANCE_COOKIE and cookie.expires is not None:
+                # cookie expiry is wall-clock time
+                expires: int = cookie.expires
+                return expires <= time.time()
+
+        return False
+
+    def expired(self, max_age: float) -> bool:
+        return time.monotonic() - self.created >= max_age or self.clearance_expired()
+
+    def close(self) -> None:
+        self.scraper.close()
+
+
+class SessionPool:
+    """
+    Keeps long-lived cloudscraper sessions around, so that keep-alive
+    connections and the solved cloudflare challenge are reused between requests.
+    """
+
+    def __init__(self, size: int, max_age: float) -> None:
+        self.size = size
+        self.max_age = max_age
+
+        self._idle: List[PooledSession] = []
+        self._created = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    @property
+    def idle(self) -> int:
+        return len(self._idle)
+
+    def acquire(self, timeout: Optional[float] = None) -> PooledSession:
+        with self._cond:
+            while True:
+                while self._idle:
+                    s = self._idle.pop()  # most recently used first
+                    if not s.expired(self.max_age):
+                        return s
+
+                    self._drop(s)
+
+                if self._created < self.size:
+                    self._created += 1
+                    break
+
+                if not self._cond.wait(timeout):
+                    raise NoFreeSession()
+
+        try:
+            return PooledSession(cloudscraper.create_scraper())
+        except Exception:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, s: PooledSession) -> None:
+        with self._cond:
+            if self._closed or s.discard or s.expired(self.max_age):
+                self._drop(s)
+            else:
+                self._idle.append(s)
+
+            self._cond.notify()
+
+    @contextmanager
+    def session(self, timeout: Optional[float] = None) -> Iterator[PooledSession]:
+        s = self.acquire(timeout)
+        try:
+            yield s
+        except Exception:
+            s.discard = True
+            raise
+        finally:
+            self.release(s)
+
+    def _drop(self, s: PooledSession) -> None:
+        self._created -= 1
+        try:
+            s.close()
+        except Exception:
+            pass
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                self._drop(self._idle.pop())
+
+            self._cond.notify_all()
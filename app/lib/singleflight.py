@@ -0,0 +1,67 @@
+import asyncio
+import contextvars
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, Tuple, TypeVar
+
+from app.lib.scheduler import SharedPriority, current_priority, shared_priority
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+    """
+    Deduplicates concurrent calls for the same key,
+    every caller waits on the one running call and gets its result.
+
+    The call's upstream requests are sent with the priority of its most urgent
+    caller, an interactive request that joins a prefetch is not served last.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, Tuple["asyncio.Future[Any]", SharedPriority]] = {}
+
+        # `coalesced` are the calls that waited on another caller's call
+        self.stats: Dict[str, int] = {"calls": 0, "coalesced": 0}
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        self.stats["calls"] += 1
+
+        if key in self._calls:
+            self.stats["coalesced"] += 1
+            call, priority = self._calls[key]
+            priority.raise_to(current_priority())
+        else:
+            priority = SharedPriority(current_priority())
+
+            # run it as its own task, so one cancelled caller
+            # does not cancel the call for everyone else waiting on it
+            context = contextvars.copy_context()
+            context.run(shared_priority.set, priority)
+            loop = asyncio.get_running_loop()
+            call = loop.create_task(self._run(fn), context=context)
+
+            self._calls[key] = call, priority
+            call.add_done_callback(lambda _: self._forget(key, call))
+
+        # a caller that is itself shared work passes on its priority when it goes up
+        caller = shared_priority.get()
+        if caller is not None:
+            caller.listen(priority.raise_to)
+
+        try:
+            result: T = await asyncio.shield(call)
+        finally:
+            if caller is not None:
+                caller.unlisten(priority.raise_to)
+
+        return result
+
+    @staticmethod
+    async def _run(fn: Callable[[], Awaitable[T]]) -> T:
+        return await fn()
+
+    def _forget(self, key: Hashable, call: "asyncio.Future[Any]") -> None:
+        if key in self._calls and self._calls[key][0] is call:
+            del self._calls[key]
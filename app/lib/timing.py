@@ -0,0 +1,106 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    MutableMapping,
+    Optional,
+    Tuple,
+)
+
+from app.lib.metrics import stage_seconds
+
+Scope = MutableMapping[str, Any]
+Message = MutableMapping[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+ASGIApp = Callable[[Scope, Receive, Send], Awaitable[None]]
+
+
+class Timings:
+    """seconds spent in each stage while serving one request"""
+
+    __slots__ = ("stages",)
+
+    def __init__(self) -> None:
+        self.stages: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def header(self) -> str:
+        """the `Server-Timing` header, in milliseconds"""
+        return ", ".join(
+            f"{stage};dur={seconds * 1000:.1f}"
+            for stage, seconds in self.stages.items()
+        )
+
+
+# timings of the current request, shared with the tasks it starts
+current_timings: ContextVar[Optional[Timings]] = ContextVar(
+    "current_timings", default=None
+)
+
+
+# (stage, handler, seconds) of every stage timed in a parse pool worker,
+# recorded again by the server process, see `ParsePool.run`
+stage_log: ContextVar[Optional[List[Tuple[str, str, float]]]] = ContextVar(
+    "stage_log", default=None
+)
+
+
+def record(stage: str, handler: str, seconds: float) -> None:
+    """add a stage's time to the metrics and the `Server-Timing` of the request"""
+    stage_seconds.observe(seconds, stage=stage, handler=handler)
+
+    timings = current_timings.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+    log = stage_log.get()
+    if log is not None:
+        log.append((stage, handler, seconds))
+
+
+@contextmanager
+def timed(stage: str, handler: str) -> Iterator[None]:
+    """time a stage, for the metrics and the `Server-Timing` of the request"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, handler, time.perf_counter() - start)
+
+
+class ServerTimingMiddleware:
+    """adds the stages timed while serving a request as a `Server-Timing` header"""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = Timings()
+
+        async def send_with_timings(message: Message) -> None:
+            if message["type"] == "http.response.start" and timings.stages:
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"server-timing", timings.header().encode("latin-1")),
+                ]
+
+            await send(message)
+
+        token = current_timings.set(timings)
+        try:
+            await self.app(scope, receive, send_with_timings)
+        finally:
+            current_timings.reset(token)
@@ -1,26 +1,98 @@
-from typing import Any, Dict 
+import asyncio
+from contextlib import asynccontextmanager
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Dict,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+)
 
-import cloudscraper  # bypassing cloudflare anti-bot
-from fastapi import FastAPI, Response
+from fastapi import Depends, FastAPI, Path, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-
-from app.lib.msgspec_json import MsgSpecJSONResponse
+from pydantic import BaseModel, Field
+
+from app import config
+from app.lib.cache import cache_lookup, close_cache, get_cache
+from app.lib.entity_store import close_entity_store, get_entity_store
+from app.lib.etag import content_etag, etag_matches, if_none_match
+from app.lib.fetcher import close_fetcher, get_fetcher, upstream_errors
+from app.lib.known_pages import known_pages
+from app.lib.metrics import CONTENT_TYPE, Collected, registry
+from app.lib.msgspec_json import MsgSpecJSONResponse, MsgSpecNDJSONResponse
+from app.lib.parse_pool import close_parse_pool, get_parse_pool
+from app.lib.prefetch import close_prefetcher, get_prefetcher
+from app.lib.profiling import ProfileMiddleware
+from app.lib.search_index import search_index
+from app.lib.timing import ServerTimingMiddleware
 from app.utils import (
+    error,
     fetch_func, 
     search_func,
+    search_local,
+    suggest_func,
+    query_dramas,
     # New specialized functions
     fetch_homepage_newsfeeds,
     fetch_homepage_topairing,
     fetch_homepage_shows_starting_this_week,
     fetch_homepage_trending_this_week,
     fetch_homepage_todays_birthdays,
+    fetch_homepage_all,
+    fetch_batch,
+    iter_batch,
+    iter_dramalist_lines,
+    iter_lines,
+    iter_page_lines,
+    fetch_pages,
+    FetchPage,
+    page_limit,
+    paged_items,
+    fetch_seasonal,
+    fetch_seasonal_year,
+    upstream_flight,
     fetch_drama_recommendations,
     fetch_drama_episode_details,
 )
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    get_fetcher()  # start the upstream thread pool and session pool
+    get_cache()
+    get_entity_store()
+
+    # start the parse workers before the first request needs one
+    pool = get_parse_pool()
+    if pool is not None:
+        await pool.warm()
+
+    # keep the airing and trending dramas in the cache
+    prefetcher = get_prefetcher()
+    if prefetcher is not None:
+        prefetcher.start()
+
+    yield
+    await close_prefetcher()
+    close_fetcher()
+    close_cache()
+    close_entity_store()
+    close_parse_pool()
+
+
+# remember the validator of a conditional request for `_reply`
+async def _conditional(request: Request) -> None:
+    if_none_match.set(request.headers.get("if-none-match"))
+
+
 app = FastAPI(
     title="Kuryana",
     default_response_class=MsgSpecJSONResponse,
+    lifespan=lifespan,
+    dependencies=[Depends(_conditional)],
 )
 
 
@@ -30,104 +102,353 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
+)
+app.add_middleware(ServerTimingMiddleware)
+app.add_middleware(
+    ProfileMiddleware, token=config.PROFILE_TOKEN, directory=config.PROFILE_DIR
 )
 
 
+def _cache_headers() -> Dict[str, str]:
+    lookup = cache_lookup.get()
+    if lookup is None:
+        return {}
+
+    return {"X-Cache": lookup.status, "Age": str(lookup.age)}
+
+
+def _etag(r: Dict[str, Any]) -> str:
+    # responses served from the cache only need to be hashed once
+    lookup = cache_lookup.get()
+    entry = lookup.entry if lookup is not None else None
+    if entry is None or entry.value is not r:
+        return content_etag(r)
+
+    if entry.etag is None:
+        entry.etag = content_etag(r)
+
+    return entry.etag
+
+
+# set the status code and the cache headers of the scraped response,
+# answer with `304 Not Modified` if the client already has it
+def _reply(response: Response, code: int, r: Dict[str, Any]) -> Response:
+    response.headers.update(_cache_headers())
+
+    if code == 200:
+        etag = _etag(r)
+        response.headers["ETag"] = etag
+
+        if etag_matches(if_none_match.get(), etag):
+            # nothing is serialized, the headers set so far are kept
+            return Response(status_code=304, headers=response.headers)
+
+    # the scraped responses hold msgspec structs that only msgspec can encode,
+    # so they skip FastAPI's own serialization, with the headers set so far
+    return MsgSpecJSONResponse(r, status_code=code, headers=response.headers)
+
+
+# stream the scraped response as ndjson, one item per line
+def _stream(items: AsyncIterable[Any]) -> MsgSpecNDJSONResponse:
+    return MsgSpecNDJSONResponse(items, headers=_cache_headers())
+
+
+# fetch many pages of a listing at once (`pages=all` / `max_pages=K`)
+async def _reply_pages(
+    response: Response, t: str, fetch_page: FetchPage, limit: int, stream: bool
+) -> Response:
+    keys = paged_items[t]
+
+    if stream:
+        first = await fetch_page(1)
+        if first[0] != 200:
+            return _reply(response, *first)
+
+        return _stream(iter_page_lines(fetch_page, keys, limit, first))
+
+    code, r = await fetch_pages(fetch_page, keys, limit)
+    return _reply(response, code, r)
+
+
 @app.get("/")
 async def index() -> Dict[str, Any]:
     return {"message": "A Simple and Basic MDL Scraper API"}
 
 
+@app.get("/stats")
+async def stats() -> Dict[str, Any]:
+    cache = get_cache()
+    fetcher = get_fetcher()
+    prefetcher = get_prefetcher()
+    scheduler, breaker = fetcher.scheduler, fetcher.breaker
+    return {
+        "cache": {**cache.stats, "entries": len(cache), "bytes": cache.size},
+        "coalescing": upstream_flight.stats,
+        "upstream": {
+            **scheduler.stats,
+            "in_flight": scheduler.in_flight,
+            "queued": scheduler.depth(),
+            "errors": upstream_errors,
+            "breaker": {"state": breaker.state, **breaker.stats},
+        },
+        "revalidation": {**known_pages.stats, "pages": len(known_pages)},
+        "search_index": {
+            **search_index.stats,
+            "entries": len(search_index),
+            "names": len(search_index.prefixes),
+        },
+        "entities": await asyncio.to_thread(get_entity_store().counts),
+        "prefetch": prefetcher.stats if prefetcher is not None else None,
+    }
+
+
+def _cache_hit_ratio() -> float:
+    stats = get_cache().stats
+    lookups = stats["hits"] + stats["misses"] + stats["stale"]
+    return (stats["hits"] + stats["stale"]) / lookups if lookups else 0.0
+
+
+# gauges read from the state the app already tracks for `/stats`
+for metric in [
+    Collected(
+        "kuryana_upstream_in_flight",
+        "Upstream requests being sent.",
+        lambda: get_fetcher().scheduler.in_flight,
+    ),
+    Collected(
+        "kuryana_upstream_queued",
+        "Upstream requests waiting for their turn, by priority.",
+        lambda: {(k,): v for k, v in get_fetcher().scheduler.depth().items()},
+        labels=("priority",),
+    ),
+    Collected(
+        "kuryana_upstream_errors_total",
+        "Upstream failures by kind.",
+        lambda: {(k,): v for k, v in upstream_errors.items()},
+        labels=("kind",),
+        type="counter",
+    ),
+    Collected(
+        "kuryana_upstream_circuit_open",
+        "1 while requests to MyDramaList fail fast.",
+        lambda: get_fetcher().breaker.state != "closed",
+    ),
+    Collected(
+        "kuryana_coalesced_total",
+        "Scrapes that waited on an identical one instead of fetching again.",
+        lambda: upstream_flight.stats["coalesced"],
+        type="counter",
+    ),
+    Collected(
+        "kuryana_cache_entries",
+        "Responses kept in memory.",
+        lambda: len(get_cache()),
+    ),
+    Collected(
+        "kuryana_cache_bytes",
+        "Size of the responses kept in memory.",
+        lambda: get_cache().size,
+    ),
+    Collected(
+        "kuryana_cache_hit_ratio",
+        "Lookups served from the cache (fresh or stale) since the start.",
+        _cache_hit_ratio,
+    ),
+]:
+    registry.register(metric)
+
+
+@app.get("/metrics")
+async def metrics() -> Response:
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
+
 @app.get("/search/q/{query}")
-async def search(query: str, response: Response) -> Dict[str, Any]:
+async def search(
+    query: str,
+    response: Response,
+    pages: Optional[Literal["all"]] = None,
+    max_pages: Optional[int] = None,
+    stream: bool = False,
+    source: Literal["local", "upstream", "auto"] = "upstream",
+) -> Any:
+    limit = page_limit(pages, max_pages)
+    paged = limit is not None or stream
+
+    # the local index has a single page, `auto` pages through upstream instead
+    if source == "local" and paged:
+        code = 400
+        description = "pages, max_pages and stream need source=upstream."
+        return _reply(response, code, error(code, description))
+
+    # `local` answers from what was already scraped, `auto` falls back to upstream
+    if source == "local" or (source == "auto" and not paged):
+        code, r = search_local(query=query)
+        results = r["results"]
+        if source == "local" or results["dramas"] or results["people"]:
+            response.headers["X-Search-Source"] = "local"
+            return _reply(response, code, r)
+
+    response.headers["X-Search-Source"] = "upstream"
+
+    if limit is not None:
+
+        async def fetch_page(n: int) -> Tuple[int, Dict[str, Any]]:
+            return await search_func(query=query if n == 1 else f"{query}&page={n}")
+
+        return await _reply_pages(response, "search", fetch_page, limit, stream)
+
     code, r = await search_func(query=query)
 
-    response.status_code = code
-    return r
+    return _reply(response, code, r)
+
+
+# typeahead, only from the titles and names already scraped
+@app.get("/search/suggest/{prefix}")
+async def suggest(
+    prefix: str, response: Response, limit: int = Query(10, ge=1, le=50)
+) -> Response:
+    code, r = suggest_func(prefix=prefix, limit=limit)
+    return _reply(response, code, r)
+
+
+# dramas already scraped, filtered without going upstream
+@app.get("/query/dramas")
+async def query(
+    response: Response,
+    country: Optional[str] = None,
+    year: Optional[int] = None,
+    min_rating: Optional[float] = None,
+    genre: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+) -> Response:
+    code, r = await query_dramas(
+        country=country,
+        year=year,
+        min_rating=min_rating,
+        genre=genre,
+        limit=limit,
+        offset=offset,
+    )
+    return _reply(response, code, r)
+
+
+class BatchRequest(BaseModel):
+    slugs: List[str] = Field(min_length=1, max_length=config.BATCH_MAX_SLUGS)
+    include: List[Literal["cast", "episodes", "reviews"]] = []
+
+
+@app.post("/id/batch")
+async def fetch_many(batch: BatchRequest, stream: bool = False) -> Any:
+    # every slug has its own status code, the batch itself always succeeds
+    if stream:
+        # one line per slug / resource, in the order they are done
+        return _stream(iter_batch(slugs=batch.slugs, include=list(batch.include)))
+
+    results = await fetch_batch(slugs=batch.slugs, include=list(batch.include))
+    return MsgSpecJSONResponse({"results": results})
 
 
 @app.get("/id/{drama_id}")
-async def fetch(drama_id: str, response: Response) -> Dict[str, Any]:
+async def fetch(drama_id: str, response: Response) -> Response:
     code, r = await fetch_func(query=drama_id, t="drama")
 
-    response.status_code = code
-    return r
+    return _reply(response, code, r)
 
 
 @app.get("/id/{drama_id}/cast")
-async def fetch_cast(drama_id: str, response: Response) -> Dict[str, Any]:
+async def fetch_cast(drama_id: str, response: Response) -> Response:
     code, r = await fetch_func(query=f"{drama_id}/cast", t="cast")
 
-    response.status_code = code
-    return r
+    return _reply(response, code, r)
 
 
 @app.get("/id/{drama_id}/episodes")
-async def fetch_episodes(drama_id: str, response: Response) -> Dict[str, Any]:
+async def fetch_episodes(drama_id: str, response: Response) -> Response:
     code, r = await fetch_func(query=f"{drama_id}/episodes", t="episodes")
 
-    response.status_code = code
-    return r
+    return _reply(response, code, r)
 
 
 @app.get("/id/{drama_id}/reviews")
 async def fetch_reviews(
-    drama_id: str, response: Response, page: int = 1
-) -> Dict[str, Any]:
+    drama_id: str,
+    response: Response,
+    page: int = 1,
+    pages: Optional[Literal["all"]] = None,
+    max_pages: Optional[int] = None,
+    stream: bool = False,
+) -> Any:
+    limit = page_limit(pages, max_pages)
+    if limit is not None:
+
+        async def fetch_page(n: int) -> Tuple[int, Dict[str, Any]]:
+            return await fetch_func(query=f"{drama_id}/reviews?page={n}", t="reviews")
+
+        return await _reply_pages(response, "reviews", fetch_page, limit, stream)
+
     code, r = await fetch_func(query=f"{drama_id}/reviews?page={page}", t="reviews")
 
-    response.status_code = code
-    return r
+    if stream and code == 200:
+        return _stream(iter_lines(r, "reviews"))
+
+    return _reply(response, code, r)
 
 
 @app.get("/people/{person_id}")
-async def person(person_id: str, response: Response) -> Dict[str, Any]:
+async def person(person_id: str, response: Response) -> Response:
     code, r = await fetch_func(query=f"people/{person_id}", t="person")
 
-    response.status_code = code
-    return r
+    return _reply(response, code, r)
 
 
 @app.get("/dramalist/{user_id}")
-async def dramalist(user_id: str, response: Response) -> Dict[str, Any]:
+async def dramalist(user_id: str, response: Response, stream: bool = False) -> Any:
     code, r = await fetch_func(query=f"dramalist/{user_id}", t="dramalist")
 
-    response.status_code = code
-    return r
+    if stream and code == 200:
+        return _stream(iter_dramalist_lines(r))
+
+    return _reply(response, code, r)
 
 
 @app.get("/list/{list_id}")
-async def lists(list_id: str, response: Response) -> Dict[str, Any]:
+async def lists(list_id: str, response: Response) -> Response:
     code, r = await fetch_func(query=f"list/{list_id}", t="lists")
 
-    response.status_code = code
-    return r
+    return _reply(response, code, r)
 
 
 # get seasonal drama list -- official api available, use it with cloudflare bypass
 @app.get("/seasonal/{year}/{quarter}")
-async def mdlSeasonal(year: int, quarter: int) -> Any:
+async def mdlSeasonal(
+    year: int, response: Response, quarter: int = Path(ge=1, le=4)
+) -> Any:
     # year -> ex. ... / 2019 / 2020 / 2021 / ...
     # quarter -> every 3 months (Jan-Mar=1, Apr-Jun=2, Jul-Sep=3, Oct-Dec=4)
     # --- seasonal information --- winter --- spring --- summer --- fall ---
 
-    scraper = cloudscraper.create_scraper()
+    code, r = await fetch_seasonal(year=year, quarter=quarter)
+    return _reply(response, code, r)
 
-    return scraper.post(
-        "https://mydramalist.com/v1/quarter_calendar",
-        data={"quarter": quarter, "year": year},
-    ).json()
+
+# every quarter of a year, fetched at the same time
+@app.get("/seasonal/{year}")
+async def mdlSeasonalYear(year: int, response: Response) -> Any:
+    code, r = await fetch_seasonal_year(year=year)
+    return _reply(response, code, r)
 
 
 # NEW ENDPOINTS BASED ON NODE.JS FUNCTIONALITY
 
 @app.get("/api/mdl/newsfeeds")
-async def get_newsfeeds(response: Response) -> Dict[str, Any]:
+async def get_newsfeeds(response: Response) -> Any:
     """Get news feeds from MDL homepage"""
     try:
         code, data = await fetch_homepage_newsfeeds()
-        response.status_code = code
-        return data
+        return _reply(response, code, data)
     except Exception as err:
         print(f"Error in mdl newsfeeds request: {err}")
         response.status_code = 422
@@ -135,12 +456,11 @@ async def get_newsfeeds(response: Response) -> Dict[str, Any]:
 
 
 @app.get("/api/mdl/topairing")
-async def get_top_airing(response: Response) -> Dict[str, Any]:
+async def get_top_airing(response: Response) -> Any:
     """Get top airing shows from MDL homepage"""
     try:
         code, data = await fetch_homepage_topairing()
-        response.status_code = code
-        return data
+        return _reply(response, code, data)
     except Exception as err:
         print(f"Error in mdl top airing request: {err}")
         response.status_code = 422
@@ -148,12 +468,11 @@ async def get_top_airing(response: Response) -> Dict[str, Any]:
 
 
 @app.get("/api/mdl/showsstartingthisweek")
-async def get_shows_starting_this_week(response: Response) -> Dict[str, Any]:
+async def get_shows_starting_this_week(response: Response) -> Any:
     """Get shows starting this week from MDL homepage"""
     try:
         code, data = await fetch_homepage_shows_starting_this_week()
-        response.status_code = code
-        return data
+        return _reply(response, code, data)
     except Exception as err:
         print(f"Error in mdl shows starting this week request: {err}")
         response.status_code = 422
@@ -161,12 +480,11 @@ async def get_shows_starting_this_week(response: Response) -> Dict[str, Any]:
 
 
 @app.get("/api/mdl/trendingthisweek")
-async def get_trending_this_week(response: Response) -> Dict[str, Any]:
+async def get_trending_this_week(response: Response) -> Any:
     """Get shows trending this week from MDL homepage"""
     try:
         code, data = await fetch_homepage_trending_this_week()
-        response.status_code = code
-        return data
+        return _reply(response, code, data)
     except Exception as err:
         print(f"Error in mdl trending this week request: {err}")
         response.status_code = 422
@@ -174,25 +492,52 @@ async def get_trending_this_week(response: Response) -> Dict[str, Any]:
 
 
 @app.get("/api/mdl/todaysbirthdays")
-async def get_todays_birthdays(response: Response) -> Dict[str, Any]:
+async def get_todays_birthdays(response: Response) -> Any:
     """Get today's birthdays from MDL homepage"""
     try:
         code, data = await fetch_homepage_todays_birthdays()
-        response.status_code = code
-        return data
+        return _reply(response, code, data)
     except Exception as err:
         print(f"Error in mdl today's birthdays request: {err}")
         response.status_code = 422
         return {"errors": [{"msg": "Server Error"}]}
 
 
+@app.get("/api/mdl/home")
+async def get_home(response: Response) -> Any:
+    """Get every MDL homepage section at once"""
+    try:
+        code, data = await fetch_homepage_all()
+        return _reply(response, code, data)
+    except Exception as err:
+        print(f"Error in mdl home request: {err}")
+        response.status_code = 422
+        return {"errors": [{"msg": "Server Error"}]}
+
+
 @app.get("/api/mdl/recommendations")
-async def get_recommendations(query: str, page: int = 1, response: Response = None) -> Dict[str, Any]:
+async def get_recommendations(
+    query: str,
+    page: int = 1,
+    pages: Optional[Literal["all"]] = None,
+    max_pages: Optional[int] = None,
+    stream: bool = False,
+    response: Response = None,
+) -> Any:
     """Get drama recommendations with pagination"""
     try:
+        limit = page_limit(pages, max_pages)
+        if limit is not None:
+
+            async def fetch_page(n: int) -> Tuple[int, Dict[str, Any]]:
+                return await fetch_drama_recommendations(drama_id=query, page=n)
+
+            return await _reply_pages(
+                response, "recommendations", fetch_page, limit, stream
+            )
+
         code, data = await fetch_drama_recommendations(drama_id=query, page=page)
-        response.status_code = code
-        return data
+        return _reply(response, code, data)
     except Exception as err:
         print(f"Error in mdl recommendations request: {err}")
         response.status_code = 422
@@ -200,12 +545,11 @@ async def get_recommendations(query: str, page: int = 1, response: Response = No
 
 
 @app.get("/api/mdl/episode-details")
-async def get_episode_details(query: str, response: Response = None) -> Dict[str, Any]:
+async def get_episode_details(query: str, response: Response = None) -> Any:
     """Get detailed episode information"""
     try:
         code, data = await fetch_drama_episode_details(drama_id=query)
-        response.status_code = code
-        return data
+        return _reply(response, code, data)
     except Exception as err:
         print(f"Error in mdl episode details request: {err}")
         response.status_code = 422
@@ -1,5 +1,23 @@
-from typing import Any, Dict, Tuple
+import asyncio
+import math
+import time
+from datetime import datetime, timezone
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    TypeVar,
+)
+from urllib.parse import urljoin
 
+from app import MYDRAMALIST_WEBSITE, config
 from app.handlers.fetch import (
     FetchCast,
     FetchDrama,
@@ -17,7 +35,30 @@ from app.handlers.fetch import (
     FetchShowsTrendingThisWeek,
     FetchTodaysBirthdays,
 )
+from app.handlers.lxml_fetch import (
+    LxmlFetchCast,
+    LxmlFetchDrama,
+    LxmlFetchEpisodes,
+    LxmlFetchPerson,
+)
+from app.handlers.parser import BaseFetch, Page, Parser, scrape_url
 from app.handlers.search import Search
+from app.lib.cache import CacheLookup, cache_lookup, get_cache
+from app.lib.entity_store import get_entity_store
+from app.lib.fetcher import (
+    PARSE_FAILURE,
+    TIMEOUT,
+    classify_exception,
+    get_fetcher,
+    upstream_errors,
+)
+from app.lib.known_pages import KnownPage, known_pages
+from app.lib.metrics import cache_lookups
+from app.lib.parse_pool import get_parse_pool
+from app.lib.scheduler import BATCH, PREFETCH, FetcherBusy, fetch_priority
+from app.lib.search_index import entries, search_index
+from app.lib.singleflight import SingleFlight
+from app.lib.timing import timed
 
 
 def error(code: int, description: str) -> Dict[str, Any]:
@@ -30,17 +71,267 @@ def error(code: int, description: str) -> Dict[str, Any]:
     }
 
 
+def _cache_key(t: str, query: str) -> str:
+    return f"{t}:{query}"
+
+
+def _store(
+    t: str, query: str, code: int, r: Dict[str, Any], ttl: Optional[float] = None
+) -> None:
+    if ttl is None:
+        ttl = config.CACHE_TTLS.get(t, 0)
+
+    # only successful scrapes are cached
+    if ttl > 0 and code == 200:
+        get_cache().set(_cache_key(t, query), code, r, ttl)
+
+
+# upstream failures where an old response is better than an error
+def _upstream_failed(code: int) -> bool:
+    return code >= 500 or code in (403, 429)
+
+
+_refresh_flight: SingleFlight[Tuple[int, Dict[str, Any]]] = SingleFlight()
+_refresh_tasks: Set["asyncio.Future[Any]"] = set()
+
+
+# re-scrape an expired entry in the background, at most once at a time
+def _revalidate(
+    t: str, query: str, scrape: Callable[[], Awaitable[Tuple[int, Dict[str, Any]]]]
+) -> None:
+    key = _cache_key(t, query)
+    if _refresh_flight.in_flight(key):
+        return
+
+    async def refresh() -> Tuple[int, Dict[str, Any]]:
+        code, r = await scrape()
+        _store(t, query, code, r)
+        return code, r
+
+    async def revalidate() -> Tuple[int, Dict[str, Any]]:
+        # nobody is waiting for it, requests of clients go first,
+        # unless one of them joins the scrape, see `SingleFlight`
+        fetch_priority.set(PREFETCH)
+        return await _refresh_flight.do(key, refresh)
+
+    task = asyncio.ensure_future(revalidate())
+    _refresh_tasks.add(task)  # keep a reference until it is done
+    task.add_done_callback(_refresh_tasks.discard)
+
+
+# serve from the cache if possible, otherwise scrape and cache the result
+async def _cached(
+    t: str,
+    query: str,
+    scrape: Callable[[], Awaitable[Tuple[int, Dict[str, Any]]]],
+    ttl: Optional[float] = None,  # instead of the ttl of the type
+) -> Tuple[int, Dict[str, Any]]:
+    cache = get_cache()
+    entry = None
+
+    if config.CACHE_TTLS.get(t, 0) > 0:
+        with timed("cache", t):
+            entry = await cache.load(_cache_key(t, query))
+
+    if entry is not None:
+        if entry.fresh():
+            cache.stats["hits"] += 1
+            cache_lookups.inc(type=t, result="HIT")
+            cache_lookup.set(CacheLookup("HIT", entry.age(), entry))
+            return entry.code, entry.value
+
+        # serve the expired entry right away and refresh it for the next one
+        if (
+            t in config.CACHE_SWR_TYPES
+            and entry.stale_for() <= config.CACHE_STALE_WHILE_REVALIDATE
+        ):
+            _revalidate(t, query, scrape)
+            cache.stats["stale"] += 1
+            cache_lookups.inc(type=t, result="STALE")
+            cache_lookup.set(CacheLookup("STALE", entry.age(), entry))
+            return entry.code, entry.value
+
+    cache.stats["misses"] += 1
+    cache_lookups.inc(type=t, result="MISS")
+    cache_lookup.set(CacheLookup("MISS"))
+
+    code, r = await scrape()
+
+    # keep serving the last good response while MyDramaList is failing
+    if (
+        _upstream_failed(code)
+        and entry is not None
+        and entry.stale_for() <= config.CACHE_STALE_IF_ERROR
+    ):
+        cache.stats["stale"] += 1
+        cache_lookups.inc(type=t, result="STALE")
+        cache_lookup.set(CacheLookup("STALE", entry.age(), entry))
+        return entry.code, entry.value
+
+    _store(t, query, code, r, ttl)
+
+    return code, r
+
+
+# identical concurrent scrapes share the one upstream request and parse
+upstream_flight: SingleFlight[Any] = SingleFlight()
+
+
+# unchanged upstream pages are served from their last parse, see `Parser.download`
+P = TypeVar("P", bound=Parser)
+R = TypeVar("R")
+
+
+def _parsed(f: P, extract: Callable[[P], R], refresh: Callable[[R], R]) -> R:
+    page = f.page
+    if page is not None and page.known is not None:
+        return _reuse(page, page.known, refresh)
+
+    result = extract(f)
+    if page is not None:
+        _remember(page, result)
+
+    return result
+
+
+def _reuse(page: Page, known: KnownPage, refresh: Callable[[R], R]) -> R:
+    # keep the newest validators
+    _remember(page, known.result)
+    return refresh(known.result)
+
+
+def _remember(page: Page, result: Any) -> None:
+    if page.digest is None:
+        return
+
+    # a page that could not be parsed is tried again next time
+    if isinstance(result, tuple) and result[0] == 500:
+        return
+
+    known_pages.set(
+        page.key, KnownPage(page.etag, page.last_modified, page.digest, result)
+    )
+
+
+# a reused response is as fresh as the download that confirmed it
+def _refreshed(result: Tuple[int, Dict[str, Any]]) -> Tuple[int, Dict[str, Any]]:
+    code, r = result
+    if "scrape_date" not in r:
+        return result
+
+    return code, {**r, "scrape_date": datetime.now(timezone.utc)}
+
+
 # search function
 async def search_func(query: str) -> Tuple[int, Dict[str, Any]]:
+    async def scrape() -> Tuple[int, Dict[str, Any]]:
+        key = ("search", scrape_url(query, "search"))
+        result: Tuple[int, Dict[str, Any]] = await upstream_flight.do(
+            key, lambda: _indexed("search", query, _search(query))
+        )
+        return result
+
+    return await _cached("search", query, scrape)
+
+
+def search_local(query: str) -> Tuple[int, Dict[str, Any]]:
+    """search the dramas and people indexed from what was already scraped"""
+    found = search_index.search(query)
+    return 200, {
+        "query": query,
+        "results": {
+            "dramas": [e.result() for e in found["drama"]],
+            "people": [e.result() for e in found["person"]],
+            # the same shape as upstream's, the index answers with a single page
+            "pages": {
+                "currentPage": "1",
+                "prevPageSlug": False,
+                "nextPageSlug": False,
+                "totalPages": 1,
+            },
+        },
+        "scrape_date": datetime.now(timezone.utc),
+    }
+
+
+def suggest_func(prefix: str, limit: int = 10) -> Tuple[int, Dict[str, Any]]:
+    """titles and names already scraped that start with the prefix, for autocomplete"""
+    found = search_index.suggest(prefix, limit)
+    return 200, {"prefix": prefix, "suggestions": [e.suggestion() for e in found]}
+
+
+async def query_dramas(
+    country: Optional[str] = None,
+    year: Optional[int] = None,
+    min_rating: Optional[float] = None,
+    genre: Optional[str] = None,
+    limit: int = 50,
+    offset: int = 0,
+) -> Tuple[int, Dict[str, Any]]:
+    """dramas already scraped, filtered in the entity store, off the event loop"""
+    dramas = await asyncio.to_thread(
+        get_entity_store().query_dramas, country, year, min_rating, genre, limit, offset
+    )
+    return 200, {"dramas": dramas}
+
+
+# keep the local search index and the entity store up to date with every scrape
+async def _indexed(
+    t: str, query: str, scrape: Awaitable[Tuple[int, Dict[str, Any]]]
+) -> Tuple[int, Dict[str, Any]]:
+    code, r = await scrape
+    if code != 200:
+        return code, r
+
+    # one failing does not keep the other from being updated
+    try:
+        for entry in entries(t, query, r):
+            search_index.add(entry)
+    except Exception as e:
+        print(f"Error indexing {t} {query}: {e}")
+
+    try:
+        get_entity_store().save(t, query, r)
+    except Exception as e:
+        print(f"Error storing {t} {query}: {e}")
+
+    return code, r
+
+
+async def _search(query: str) -> Tuple[int, Dict[str, Any]]:
+    pool = get_parse_pool()
+    if pool is not None:
+        page = await Search.download(query=query, t="search")
+        if page.known is not None:
+            return _reuse(page, page.known, _refreshed)
+
+        # parsed and extracted in the worker, timed here as one stage
+        with timed("worker", "Search"):
+            result = await pool.run(parse_search, query, page.code, page.html)
+        _remember(page, result)
+        return result
+
     f = await Search.scrape(query=query, t="search")
+    return _parsed(f, _search_results, _refreshed)
+
+
+def _search_results(f: Search) -> Tuple[int, Dict[str, Any]]:
     if not f.ok:
         return f.status_code, error(f.status_code, "An unexpected error occurred.")
     else:
-        f._get_search_results()
+        with timed("extract", type(f).__name__):
+            f._get_search_results()
 
     return f.status_code, f.search()
 
 
+# runs in the parse pool's worker processes
+def parse_search(
+    query: str, code: int, html: Optional[str]
+) -> Tuple[int, Dict[str, Any]]:
+    return _search_results(Search.from_html(html, query, code))
+
+
 fs = {
     "drama": FetchDrama,
     "person": FetchPerson,
@@ -59,21 +350,177 @@ fs = {
     "todaysbirthdays": FetchTodaysBirthdays,
 }
 
+# lxml / xpath ports, used for the types listed in `KURYANA_LXML_HANDLERS`
+fs_lxml = {
+    "drama": LxmlFetchDrama,
+    "person": LxmlFetchPerson,
+    "cast": LxmlFetchCast,
+    "episodes": LxmlFetchEpisodes,
+}
+
+
+def handler(t: str) -> Type[BaseFetch]:
+    if t in config.LXML_HANDLERS and t in fs_lxml:
+        return fs_lxml[t]
+
+    return fs[t]
+
+
+# these are all parsed from the same page, the MyDramaList homepage
+homepage_types = [
+    "newsfeeds",
+    "topairing",
+    "showsstartingthisweek",
+    "trendingthisweek",
+    "todaysbirthdays",
+]
+
+
+class Homepage(Parser):
+    # only the sections read by the homepage handlers are parsed
+    regions = {"id": [i for t in homepage_types for i in (fs[t].regions or {})["id"]]}
+
+
+async def _scrape_homepage() -> Dict[str, Tuple[int, Dict[str, Any]]]:
+    sections = await _homepage()
+
+    # a scrape for one section warms the cache for all the others
+    for t, (code, r) in sections.items():
+        _store(t, "", code, r)
+
+    return sections
+
+
+async def _homepage() -> Dict[str, Tuple[int, Dict[str, Any]]]:
+    pool = get_parse_pool()
+    if pool is not None:
+        page = await Homepage.download(query="", t="page")
+        if page.known is not None:
+            return _reuse(page, page.known, _refreshed_sections)
+
+        with timed("worker", Homepage.__name__):
+            sections = await pool.run(parse_homepage, page.code, page.html)
+        _remember(page, sections)
+        return sections
+
+    f = await Homepage.scrape(query="", t="page")
+    return _parsed(f, _homepage_sections, _refreshed_sections)
+
+
+def _homepage_sections(page: Parser) -> Dict[str, Tuple[int, Dict[str, Any]]]:
+    # every homepage section shares the one parsed soup
+    sections = {}
+    for t in homepage_types:
+        f = fs[t](page.soup, page.query, page.status_code, page.ok)
+        if not f.ok:
+            sections[t] = f.status_code, f.res_get_err()
+            continue
+
+        with timed("extract", type(f).__name__):
+            f._get()
+        sections[t] = f.status_code, f.fetch()
+
+    return sections
+
+
+# runs in the parse pool's worker processes
+def parse_homepage(
+    code: int, html: Optional[str]
+) -> Dict[str, Tuple[int, Dict[str, Any]]]:
+    return _homepage_sections(Homepage.from_html(html, "", code))
+
+
+def _refreshed_sections(
+    sections: Dict[str, Tuple[int, Dict[str, Any]]],
+) -> Dict[str, Tuple[int, Dict[str, Any]]]:
+    return {t: _refreshed(result) for t, result in sections.items()}
+
+
+# fetch the homepage once for all concurrent callers
+async def fetch_homepage() -> Dict[str, Tuple[int, Dict[str, Any]]]:
+    key = ("homepage", scrape_url("", "page"))
+    sections: Dict[str, Tuple[int, Dict[str, Any]]] = await upstream_flight.do(
+        key, _scrape_homepage
+    )
+    return sections
+
 
 # fetch function
 async def fetch_func(query: str, t: str) -> Tuple[int, Dict[str, Any]]:
     if t not in fs.keys():
         raise Exception("Invalid Error")
 
-    f = await fs[t].scrape(query=query, t="page")
+    return await _cached(t, query, lambda: _scrape(query, t))
+
+
+async def _scrape(query: str, t: str) -> Tuple[int, Dict[str, Any]]:
+    # keyed by type too, since some types parse the same page differently
+    key = (t, scrape_url(query, "page"))
+    result: Tuple[int, Dict[str, Any]] = await upstream_flight.do(
+        key, lambda: _indexed(t, query, _fetch(query, t))
+    )
+    return result
+
+
+async def refresh_func(query: str, t: str) -> Tuple[int, Dict[str, Any]]:
+    """scrape again and cache the result, even if the cached one is still fresh"""
+    code, r = await _scrape(query, t)
+    _store(t, query, code, r)
+
+    return code, r
+
+
+async def expires_in(t: str, query: str) -> float:
+    """seconds until the cached response expires, 0 if there is none"""
+    entry = await get_cache().load(_cache_key(t, query))
+    if entry is None:
+        return 0.0
+
+    return max(0.0, entry.expires - time.time())
+
+
+async def _fetch(query: str, t: str) -> Tuple[int, Dict[str, Any]]:
+    if t in homepage_types:
+        return (await fetch_homepage())[t]
+
+    pool = get_parse_pool()
+    if pool is not None:
+        page = await handler(t).download(query=query, t="page")
+        if page.known is not None:
+            return _reuse(page, page.known, _refreshed)
+
+        with timed("worker", handler(t).__name__):
+            result = await pool.run(parse_page, t, query, page.code, page.html)
+        _remember(page, result)
+        return result
+
+    f = await handler(t).scrape(query=query, t="page")
+    return _parsed(f, _extract, _refreshed)
+
+
+def _extract(f: BaseFetch) -> Tuple[int, Dict[str, Any]]:
     if not f.ok:
         return f.status_code, f.res_get_err()
-    else:
-        f._get()
+
+    try:
+        with timed("extract", type(f).__name__):
+            f._get()
+    except Exception as e:
+        # the page is not laid out like the handler expects
+        upstream_errors[PARSE_FAILURE] += 1
+        print(f"Error parsing {f.query}: {e}")
+        return 500, error(500, "The page could not be parsed.")
 
     return f.status_code, f.fetch()
 
 
+# runs in the parse pool's worker processes, only plain data goes in and out
+def parse_page(
+    t: str, query: str, code: int, html: Optional[str]
+) -> Tuple[int, Dict[str, Any]]:
+    return _extract(handler(t).from_html(html, query, code))
+
+
 # New specialized functions for homepage data
 async def fetch_homepage_newsfeeds() -> Tuple[int, Dict[str, Any]]:
     """Fetch news feeds from homepage"""
@@ -98,6 +545,352 @@ async def fetch_homepage_todays_birthdays() -> Tuple[int, Dict[str, Any]]:
     return await fetch_func(query="", t="todaysbirthdays")
 
 
+async def fetch_homepage_all() -> Tuple[int, Dict[str, Any]]:
+    """Fetch every homepage section in one response"""
+    data: Dict[str, Any] = {}
+
+    async def section(t: str) -> Tuple[Tuple[int, Dict[str, Any]], CacheLookup]:
+        # every section is looked up in its own task, bring its lookup back here
+        result = await fetch_func(query="", t=t)
+        return result, cache_lookup.get() or CacheLookup("MISS")
+
+    # the sections that are not cached share one homepage scrape, see `fetch_homepage`
+    sections = await asyncio.gather(*[section(t) for t in homepage_types])
+
+    for (code, r), _ in sections:
+        # all sections share the same status, since it is the same page
+        if r.get("error"):
+            return code, r
+
+        data.update(r["data"])
+
+    # the response is as old as its oldest section, and only a hit if they all are
+    statuses = {lookup.status for _, lookup in sections}
+    (_, oldest), lookup = max(sections, key=lambda s: s[1].age)
+    status = next(s for s in ("MISS", "STALE", "HIT") if s in statuses)
+    cache_lookup.set(CacheLookup(status, lookup.age))
+
+    return code, {
+        "slug_query": oldest["slug_query"],
+        "data": data,
+        "scrape_date": oldest["scrape_date"],
+    }
+
+
+# sub-resources that can be requested together with a drama in a batch
+batch_resources = {
+    "drama": ("{slug}", "drama"),
+    "cast": ("{slug}/cast", "cast"),
+    "episodes": ("{slug}/episodes", "episodes"),
+    "reviews": ("{slug}/reviews?page=1", "reviews"),
+}
+
+
+async def iter_batch(
+    slugs: List[str], include: List[str]
+) -> AsyncIterator[Dict[str, Any]]:
+    """Fetch many dramas (and their sub-resources), yield each one as soon as it is done"""
+    limit = asyncio.Semaphore(config.BATCH_CONCURRENCY)
+    resources = ["drama"] + [i for i in include if i != "drama"]
+
+    async def fetch_one(slug: str, resource: str) -> Dict[str, Any]:
+        query, t = batch_resources[resource]
+        fetch_priority.set(BATCH)  # single lookups go first
+
+        async with limit:
+            try:
+                code, r = await fetch_func(query=query.format(slug=slug), t=t)
+            except Exception as e:
+                print(f"Error in batch item {slug}/{resource}: {e}")
+                code, r = 500, error(500, "An unexpected error occurred.")
+
+        return {"slug": slug, "resource": resource, "code": code, "response": r}
+
+    tasks = [
+        asyncio.ensure_future(fetch_one(slug, resource))
+        for slug in dict.fromkeys(slugs)  # drop duplicates, keep the order
+        for resource in resources
+    ]
+
+    try:
+        for done in asyncio.as_completed(tasks):
+            yield await done
+    finally:
+        # the client went away, do not keep scraping for it
+        for task in tasks:
+            task.cancel()
+
+
+async def fetch_batch(
+    slugs: List[str], include: List[str]
+) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """Fetch many dramas (and their sub-resources) at once, each one fails on its own"""
+    results: Dict[str, Dict[str, Dict[str, Any]]] = {slug: {} for slug in slugs}
+
+    done = {}
+    async for item in iter_batch(slugs, include):
+        done[item["slug"], item["resource"]] = {
+            "code": item["code"],
+            "response": item["response"],
+        }
+
+    # keep the requested order, not the completion order
+    resources = ["drama"] + [i for i in include if i != "drama"]
+    for slug in results:
+        for resource in resources:
+            results[slug][resource] = done[slug, resource]
+
+    return results
+
+
+# streaming helpers, split a scraped response into ndjson lines
+
+
+async def iter_lines(r: Dict[str, Any], key: str) -> AsyncIterator[Dict[str, Any]]:
+    """
+    the response without `data[key]` first, then one line per item of it
+
+    The page is already parsed in full, this only changes the format; the
+    batch and multi-page iterators are the ones sending items as they are ready.
+    """
+    data = r["data"]
+
+    yield {
+        "slug_query": r["slug_query"],
+        "data": {k: v for k, v in data.items() if k != key},
+        "scrape_date": r["scrape_date"],
+    }
+
+    for item in data[key]:
+        yield item
+
+
+async def iter_dramalist_lines(r: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+    """
+    one line per drama of every list, followed by the stats of that list,
+    from the already parsed dramalist (it is a single upstream page)
+    """
+    yield {"slug_query": r["slug_query"], "scrape_date": r["scrape_date"]}
+
+    for name, items in r["data"]["list"].items():
+        for item in items["items"]:
+            yield {"list": name, "item": item}
+
+        yield {"list": name, "stats": items["stats"]}
+
+
+# multi-page listings, and the lists that are merged from each of their pages
+paged_items = {
+    "search": ["dramas", "people"],
+    "reviews": ["reviews"],
+    "recommendations": ["recommendations"],
+}
+
+FetchPage = Callable[[int], Awaitable[Tuple[int, Dict[str, Any]]]]
+
+
+def _page_container_key(r: Dict[str, Any]) -> str:
+    # search keeps its results in `results`, the others in `data`
+    return "results" if "results" in r else "data"
+
+
+def _page_container(r: Dict[str, Any]) -> Dict[str, Any]:
+    container: Dict[str, Any] = r[_page_container_key(r)]
+    return container
+
+
+def _total_pages(r: Dict[str, Any]) -> int:
+    pages = _page_container(r).get("pages")
+    if isinstance(pages, list):  # recommendations
+        pages = pages[0] if pages else None
+
+    try:
+        return int(pages["totalPages"]) if pages else 1
+    except (KeyError, TypeError, ValueError):
+        return 1
+
+
+def page_limit(pages: Optional[str], max_pages: Optional[int]) -> Optional[int]:
+    """number of pages to fetch, None if only the requested page is wanted"""
+    if max_pages is not None:
+        return max(1, min(max_pages, config.PAGES_MAX))
+
+    if pages == "all":
+        return config.PAGES_MAX
+
+    return None
+
+
+async def iter_pages(
+    fetch_page: FetchPage,
+    limit: int,
+    first: Optional[Tuple[int, Dict[str, Any]]] = None,
+) -> AsyncIterator[Tuple[int, int, Dict[str, Any]]]:
+    """page 1 tells the number of pages, the rest are fetched concurrently but yielded in order"""
+    code, r = first or await fetch_page(1)
+    yield 1, code, r
+
+    if code != 200:
+        return
+
+    sem = asyncio.Semaphore(config.PAGES_CONCURRENCY)
+
+    async def fetch_one(n: int) -> Tuple[int, Dict[str, Any]]:
+        async with sem:
+            try:
+                return await fetch_page(n)
+            except Exception as e:
+                print(f"Error fetching page {n}: {e}")
+                return 500, error(500, "An unexpected error occurred.")
+
+    last = min(_total_pages(r), limit)
+    tasks = [asyncio.ensure_future(fetch_one(n)) for n in range(2, last + 1)]
+
+    try:
+        for n, task in enumerate(tasks, start=2):
+            code, r = await task
+            yield n, code, r
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def fetch_pages(
+    fetch_page: FetchPage, keys: List[str], limit: int
+) -> Tuple[int, Dict[str, Any]]:
+    """fetch up to `limit` pages and merge their `keys` lists, in page order"""
+    first: Optional[Dict[str, Any]] = None
+    items: Dict[str, List[Any]] = {k: [] for k in keys}
+    failed = []
+    fetched = 0
+
+    async for n, code, r in iter_pages(fetch_page, limit):
+        if code != 200:
+            if n == 1:
+                return code, r
+
+            failed.append({"page": n, "code": code})
+            continue
+
+        if first is None:
+            first = r
+
+        container = _page_container(r)
+        for k in keys:
+            items[k].extend(container.get(k, []))
+
+        fetched += 1
+
+    assert first is not None
+
+    pages: Any = {
+        "totalPages": _total_pages(first),
+        "fetchedPages": fetched,
+        "failedPages": failed,
+    }
+    if isinstance(_page_container(first).get("pages"), list):
+        pages = [pages]  # recommendations keep their list of one
+
+    # the cached pages are shared, so build new dicts instead of changing them
+    merged = {**_page_container(first), **items, "pages": pages}
+
+    return 200, {**first, _page_container_key(first): merged}
+
+
+async def iter_page_lines(
+    fetch_page: FetchPage,
+    keys: List[str],
+    limit: int,
+    first: Tuple[int, Dict[str, Any]],
+) -> AsyncIterator[Dict[str, Any]]:
+    """the first page without its lists, then one line per item of every page"""
+    async for n, code, r in iter_pages(fetch_page, limit, first):
+        if code != 200:
+            yield {"page": n, "code": code, "error": True}
+            continue
+
+        container = _page_container(r)
+        if n == 1:
+            lists = {k: v for k, v in container.items() if k not in keys}
+            yield {**r, _page_container_key(r): lists}
+
+        for k in keys:
+            for item in container.get(k, []):
+                # lists are only named if there are more than one
+                yield item if len(keys) == 1 else {"list": k, "item": item}
+
+
+SEASONAL_URL = urljoin(MYDRAMALIST_WEBSITE, "v1/quarter_calendar")
+QUARTERS = (1, 2, 3, 4)
+
+
+def seasonal_ttl(year: int, quarter: int, now: Optional[datetime] = None) -> float:
+    """past quarters never change, they are cached for good"""
+    ttl = config.CACHE_TTLS.get("seasonal", 0)
+    if ttl <= 0:
+        return 0
+
+    now = now or datetime.now(timezone.utc)
+    if (year, quarter) < (now.year, (now.month - 1) // 3 + 1):
+        return math.inf
+
+    return ttl
+
+
+async def _seasonal(year: int, quarter: int) -> Tuple[int, Any]:
+    try:
+        resp = await get_fetcher().post(
+            SEASONAL_URL, data={"quarter": quarter, "year": year}
+        )
+    except FetcherBusy as e:
+        return e.code, error(e.code, "MyDramaList is busy, try again later.")
+    except Exception as e:
+        code = 504 if classify_exception(e) == TIMEOUT else 500
+        return code, error(code, "MyDramaList could not be reached.")
+
+    if resp.status_code != 200:
+        code = resp.status_code
+        return code, error(code, "The seasonal calendar could not be fetched.")
+
+    try:
+        return 200, resp.json()
+    except ValueError:
+        upstream_errors[PARSE_FAILURE] += 1
+        return 500, error(500, "The seasonal calendar could not be parsed.")
+
+
+async def fetch_seasonal(year: int, quarter: int) -> Tuple[int, Any]:
+    """Fetch the seasonal drama calendar from the official api"""
+
+    async def scrape() -> Tuple[int, Any]:
+        key = ("seasonal", SEASONAL_URL, year, quarter)
+        result: Tuple[int, Any] = await upstream_flight.do(
+            key, lambda: _seasonal(year, quarter)
+        )
+        return result
+
+    return await _cached(
+        "seasonal", f"{year}/{quarter}", scrape, seasonal_ttl(year, quarter)
+    )
+
+
+async def fetch_seasonal_year(year: int) -> Tuple[int, Dict[str, Any]]:
+    """Fetch the calendars of every quarter of a year at the same time"""
+    results = await asyncio.gather(*[fetch_seasonal(year, q) for q in QUARTERS])
+
+    failed = [q for q, (code, _) in zip(QUARTERS, results, strict=True) if code != 200]
+    if len(failed) == len(QUARTERS):
+        return results[0]
+
+    return 200, {
+        "year": year,
+        "quarters": {
+            str(q): r for q, (code, r) in zip(QUARTERS, results, strict=True)
+        },
+        "failedQuarters": failed,
+    }
+
+
 async def fetch_drama_recommendations(drama_id: str, page: int = 1) -> Tuple[int, Dict[str, Any]]:
     """Fetch drama recommendations with pagination"""
     query = f"{drama_id}/recs?page={page}"
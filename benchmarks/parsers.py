@@ -0,0 +1,237 @@
+"""
+Parser benchmarks over the pages in `tests/fixture`, no network needed.
+
+    python -m benchmarks.parsers --iterations 200 --output results.json
+    python -m benchmarks.parsers --compare results.json  # exits 1 on a regression
+
+Every `fs` handler, their lxml ports and `Search` parse and extract their page
+like a real scrape does (`from_html` + `_get`). Each one reports its throughput,
+its p50 / p99 time and the peak memory of a single parse, as json.
+
+The fixtures are small hand-written pages (2-6 KB) laid out like MyDramaList's,
+not saved copies of real ones, which are many times bigger. The numbers are for
+comparing runs with each other, a real page takes longer to parse.
+
+`--compare` only gates on pages of at least `--min-bytes` (`MIN_GATED_BYTES`),
+a slower parser barely shows on a few KB. Put a saved page next to the fixtures
+and point `CORPUS` at it to gate on it, `--min-bytes 0` gates on everything.
+"""
+
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from importlib.metadata import version
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+from app import utils
+from app.handlers.parser import BaseFetch
+
+FIXTURES = Path(__file__).parent.parent / "tests" / "fixture"
+
+# smaller pages are still benchmarked, but a slowdown on them does not fail --compare
+MIN_GATED_BYTES = 50_000
+
+# the fixture page each fetch type is parsed from
+CORPUS = {
+    "drama": "drama.html",
+    "cast": "cast.html",
+    "episodes": "episodes.html",
+    "episodedetails": "episodes.html",
+    "reviews": "reviews.html",
+    "person": "person.html",
+    "lists": "list.html",
+    "dramalist": "dramalist.html",
+    "recommendations": "recs.html",
+    "newsfeeds": "homepage.html",
+    "topairing": "homepage.html",
+    "showsstartingthisweek": "homepage.html",
+    "trendingthisweek": "homepage.html",
+    "todaysbirthdays": "homepage.html",
+    "search": "search.html",
+}
+
+Parse = Callable[[], Tuple[int, Dict[str, Any]]]
+
+
+def _page(handler: Type[BaseFetch], html: str) -> Parse:
+    def run() -> Tuple[int, Dict[str, Any]]:
+        return utils._extract(handler.from_html(html, "bench", 200))
+
+    return run
+
+
+def _search(html: str) -> Parse:
+    def run() -> Tuple[int, Dict[str, Any]]:
+        return utils._search_results(utils.Search.from_html(html, "bench", 200))
+
+    return run
+
+
+def cases() -> Dict[str, Tuple[str, Parse]]:
+    """name -> (fixture, parse and extract it once)"""
+    found: Dict[str, Tuple[str, Parse]] = {}
+
+    for t, fixture in CORPUS.items():
+        html = (FIXTURES / fixture).read_text()
+
+        if t == "search":
+            found[t] = fixture, _search(html)
+            continue
+
+        found[t] = fixture, _page(utils.fs[t], html)
+        if t in utils.fs_lxml:
+            found[f"{t}@lxml"] = fixture, _page(utils.fs_lxml[t], html)
+
+    return found
+
+
+def _percentile(times: List[float], p: float) -> float:
+    ordered = sorted(times)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def _peak_memory(fn: Callable[[], Any]) -> int:
+    """peak bytes allocated by a single run"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return peak
+
+
+def bench(fn: Callable[[], Any], size: int, iterations: int) -> Dict[str, Any]:
+    code, _ = fn()  # warm up, and make sure the page is actually parsed
+    if code != 200:
+        raise RuntimeError(f"the fixture could not be parsed ({code})")
+
+    times = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    total = sum(times)
+    return {
+        "iterations": iterations,
+        "pages_per_second": round(iterations / total, 2),
+        "mb_per_second": round(size * iterations / total / 1_000_000, 3),
+        "p50_ms": round(_percentile(times, 0.50) * 1000, 4),
+        "p99_ms": round(_percentile(times, 0.99) * 1000, 4),
+        "peak_memory_bytes": _peak_memory(fn),
+    }
+
+
+def run(iterations: int, only: Optional[List[str]] = None) -> Dict[str, Any]:
+    results = {}
+    for name, (fixture, fn) in cases().items():
+        if only and name not in only:
+            continue
+
+        size = len((FIXTURES / fixture).read_bytes())
+        results[name] = {
+            "fixture": fixture,
+            "bytes": size,
+            **bench(fn, size, iterations),
+        }
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "packages": {p: version(p) for p in ["beautifulsoup4", "lxml", "msgspec"]},
+        "results": results,
+    }
+
+
+def ungated(report: Dict[str, Any], min_bytes: int) -> List[str]:
+    """handlers whose page is too small for --compare to gate on"""
+    return [
+        name
+        for name, result in report["results"].items()
+        if result.get("bytes", 0) < min_bytes
+    ]
+
+
+def compare(
+    old: Dict[str, Any], new: Dict[str, Any], threshold: float, min_bytes: int = 0
+) -> List[str]:
+    """
+    handlers whose p50 got slower by more than `threshold` (0.2 is 20%),
+    leaving out the ones parsed from a page smaller than `min_bytes`
+    """
+    skipped = set(ungated(new, min_bytes))
+
+    regressions = []
+    for name, result in new["results"].items():
+        before = old["results"].get(name)
+        if before is None or name in skipped:
+            continue
+
+        if result["p50_ms"] > before["p50_ms"] * (1 + threshold):
+            regressions.append(
+                f"{name}: p50 {before['p50_ms']}ms -> {result['p50_ms']}ms"
+            )
+
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--only", nargs="*", help="handlers to run, e.g. drama cast")
+    parser.add_argument("--output", help="write the results to this file")
+    parser.add_argument("--compare", help="results of an earlier run")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2, help="allowed p50 slowdown"
+    )
+    parser.add_argument(
+        "--min-bytes",
+        type=int,
+        default=MIN_GATED_BYTES,
+        help="smallest page --compare gates on",
+    )
+    args = parser.parse_args(argv)
+
+    report = run(args.iterations, args.only)
+
+    encoded = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(encoded + "\n")
+    else:
+        print(encoded)
+
+    if args.compare:
+        skipped = ungated(report, args.min_bytes)
+        if skipped:
+            print(
+                f"not gated, pages under {args.min_bytes} bytes: {' '.join(skipped)}",
+                file=sys.stderr,
+            )
+        if len(skipped) == len(report["results"]):
+            print("nothing to compare, every page is too small", file=sys.stderr)
+            return 2
+
+        regressions = compare(
+            json.loads(Path(args.compare).read_text()),
+            report,
+            args.threshold,
+            args.min_bytes,
+        )
+        for line in regressions:
+            print(f"regression: {line}", file=sys.stderr)
+
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+import pytest
+
+from app.handlers.parser import Parser
+from app.lib.cache import close_cache
+from app.lib.entity_store import close_entity_store
+from app.lib.known_pages import known_pages
+from app.lib.search_index import search_index
+
+# a drama page with just the parts `FetchDrama` reads
+DRAMA = """
+<div class="app-body">
+  <h1 class="film-title">Goblin</h1>
+  <div class="col-film-rating"><div>8.8</div></div>
+  <img src="goblin.jpg">
+  <div class="show-synopsis"><p>A goblin.</p></div>
+  <div class="show-detailsxss"><ul class="list m-a-0"></ul></div>
+  <div class="episodes"></div>
+</div>
+"""
+
+# the trending section of the homepage
+HOMEPAGE = """
+<div id="slide-trending"><div class="swiper-slide">
+  <a class="film-cover" href="/18452-goblin"><img data-src="goblin.jpg"></a>
+  <div class="film-title">Goblin</div><div class="text-muted">Korean Drama</div>
+</div></div>
+"""
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    # every test starts with an empty response cache, no known upstream pages,
+    # an empty search index and an empty entity store
+    close_cache()
+    close_entity_store()
+    known_pages.clear()
+    search_index.clear()
+    yield
+    close_cache()
+    close_entity_store()
+    known_pages.clear()
+    search_index.clear()
+
+
+@pytest.fixture
+def drama_html():
+    return DRAMA
+
+
+@pytest.fixture
+def scrape_drama(monkeypatch):
+    # every scrape gets the drama page, `missing...` a 404 and `broken...` fails
+    async def scrape(cls, query, t):
+        if query.startswith("broken"):
+            raise RuntimeError("broken page")
+
+        if query.startswith("missing"):
+            return cls.from_html("<div></div>", query, 404)
+
+        return cls.from_html(DRAMA, query, 200)
+
+    monkeypatch.setattr(Parser, "scrape", classmethod(scrape))
+
+
+@pytest.fixture
+def homepage_html():
+    return HOMEPAGE
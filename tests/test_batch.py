@@ -0,0 +1,34 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+client = TestClient(app)
+
+
+def test_batch(scrape_drama):
+    response = client.post(
+        "/id/batch",
+        json={
+            "slugs": ["1-goblin", "missing", "broken", "1-goblin"],
+            "include": ["episodes"],
+        },
+    )
+    assert response.status_code == 200
+
+    results = response.json()["results"]
+    assert list(results) == ["1-goblin", "missing", "broken"]
+
+    assert results["1-goblin"]["drama"]["code"] == 200
+    assert results["1-goblin"]["drama"]["response"]["data"]["title"] == "Goblin"
+    assert results["1-goblin"]["episodes"]["code"] == 200
+    assert results["missing"]["drama"]["code"] == 404
+    assert results["broken"]["drama"]["code"] == 500
+    assert results["broken"]["episodes"]["response"]["error"] is True
+
+
+def test_batch_validation():
+    response = client.post("/id/batch", json={"slugs": []})
+    assert response.status_code == 422
+
+    response = client.post("/id/batch", json={"slugs": ["x"], "include": ["x"]})
+    assert response.status_code == 422
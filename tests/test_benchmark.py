@@ -0,0 +1,70 @@
+from benchmarks import parsers
+
+
+def test_corpus_covers_every_handler():
+    names = set(parsers.cases())
+
+    assert set(parsers.utils.fs) | {"search"} <= names
+    assert {f"{t}@lxml" for t in parsers.utils.fs_lxml} <= names
+
+
+def test_every_fixture_is_parsed():
+    for name, (_, parse) in parsers.cases().items():
+        code, r = parse()
+        assert code == 200, name
+
+        data = r.get("data") or r.get("results")
+        # something besides the `link` every handler adds
+        assert any(v for k, v in data.items() if k != "link"), name
+
+
+def test_report():
+    report = parsers.run(iterations=3, only=["drama", "search"])
+
+    assert list(report["results"]) == ["drama", "search"]
+    drama = report["results"]["drama"]
+    assert drama["fixture"] == "drama.html"
+    assert drama["pages_per_second"] > 0
+    assert 0 < drama["p50_ms"] <= drama["p99_ms"]
+    assert drama["peak_memory_bytes"] > 0
+
+
+def test_compare():
+    old = {"results": {"drama": {"p50_ms": 1.0}, "cast": {"p50_ms": 1.0}}}
+    new = {
+        "results": {
+            "drama": {"p50_ms": 1.1},
+            "cast": {"p50_ms": 1.5},
+            "person": {"p50_ms": 9.0},  # new, nothing to compare to
+        }
+    }
+
+    assert parsers.compare(old, new, threshold=0.2) == ["cast: p50 1.0ms -> 1.5ms"]
+
+
+def test_compare_skips_small_pages():
+    old = {"results": {"drama": {"p50_ms": 1.0}, "cast": {"p50_ms": 1.0}}}
+    new = {
+        "results": {
+            "drama": {"bytes": 150_000, "p50_ms": 1.5},
+            "cast": {"bytes": 4_000, "p50_ms": 1.5},
+        }
+    }
+
+    assert parsers.ungated(new, min_bytes=50_000) == ["cast"]
+    assert parsers.compare(old, new, threshold=0.2, min_bytes=50_000) == [
+        "drama: p50 1.0ms -> 1.5ms"
+    ]
+
+
+def test_compare_refuses_to_gate_on_the_fixtures(tmp_path, capsys):
+    earlier = tmp_path / "main.json"
+    parsers.main(["--iterations", "2", "--only", "drama", "--output", str(earlier)])
+
+    assert (
+        parsers.main(
+            ["--iterations", "2", "--only", "drama", "--compare", str(earlier)]
+        )
+        == 2
+    )
+    assert "every page is too small" in capsys.readouterr().err
@@ -0,0 +1,189 @@
+import asyncio
+
+import pytest
+import requests
+
+from app.handlers import parser
+from app.lib.breaker import CircuitBreaker, CircuitOpen
+from app.lib.fetcher import (
+    CHALLENGE,
+    NOT_FOUND,
+    RATE_LIMITED,
+    SERVER_ERROR,
+    TIMEOUT,
+    Fetcher,
+    backoff,
+    classify_exception,
+    classify_status,
+    upstream_errors,
+)
+
+from app.lib.sessions import NoFreeSession, SessionPool
+
+
+class FakeResponse:
+    def __init__(self, url, status_code=200):
+        self.url = url
+        self.status_code = status_code
+        self.headers = {}
+
+
+class FlakyFetcher(Fetcher):
+    """answers with the given statuses (or raises the given exceptions) in order"""
+
+    def __init__(self, outcomes, **kwargs):
+        super().__init__(workers=1, max_pending=10, timeout=1, **kwargs)
+        self.outcomes = list(outcomes)
+        self.sent = 0
+
+    def _send(self, method, url, **kwargs):
+        self.sent += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+
+        return FakeResponse(url, outcome)
+
+
+def test_classify():
+    assert classify_status(200) is None
+    assert classify_status(304) is None
+    assert classify_status(403) == CHALLENGE
+    assert classify_status(503) == CHALLENGE
+    assert classify_status(429) == RATE_LIMITED
+    assert classify_status(404) == NOT_FOUND
+    assert classify_status(502) == SERVER_ERROR
+    assert classify_exception(requests.ReadTimeout()) == TIMEOUT
+    assert classify_exception(requests.ConnectionError()) == SERVER_ERROR
+
+
+def test_backoff_is_jittered_and_capped():
+    delays = [
+        backoff(attempt, base=1, cap=4) for attempt in range(10) for _ in range(10)
+    ]
+
+    assert all(0 <= d <= 4 for d in delays)
+    assert len(set(delays)) > 1
+
+
+def test_transient_failures_are_retried():
+    fetcher = FlakyFetcher(
+        [503, requests.ReadTimeout(), 200], retries=2, retry_delay=0.001
+    )
+
+    resp = asyncio.run(fetcher.get("u"))
+    fetcher.close()
+
+    assert resp.status_code == 200
+    assert fetcher.sent == 3
+
+
+def test_not_found_is_not_retried():
+    fetcher = FlakyFetcher([404, 200], retries=2, retry_delay=0.001)
+
+    resp = asyncio.run(fetcher.get("u"))
+    fetcher.close()
+
+    assert resp.status_code == 404
+    assert fetcher.sent == 1
+
+
+def test_last_failure_is_returned():
+    fetcher = FlakyFetcher([429, 429], retries=1, retry_delay=0.001)
+    assert asyncio.run(fetcher.get("u")).status_code == 429
+
+    fetcher.outcomes = [requests.ReadTimeout()]
+    fetcher.retries = 0
+    with pytest.raises(requests.ReadTimeout):
+        asyncio.run(fetcher.get("u"))
+
+    fetcher.close()
+
+
+def test_circuit_breaker_fails_fast():
+    breaker = CircuitBreaker(threshold=2, reset_after=60)
+    fetcher = FlakyFetcher([500, 500, 200], breaker=breaker)
+
+    assert asyncio.run(fetcher.get("u")).status_code == 500
+    assert asyncio.run(fetcher.get("u")).status_code == 500
+    assert breaker.state == "open"
+
+    with pytest.raises(CircuitOpen) as e:
+        asyncio.run(fetcher.get("u"))
+
+    fetcher.close()
+
+    assert e.value.code == 503
+    assert fetcher.sent == 2
+    assert breaker.stats == {"opened": 1, "rejected": 1}
+
+
+def test_circuit_breaker_probes_after_reset():
+    breaker = CircuitBreaker(threshold=1, reset_after=0)
+    breaker.failure()
+    assert breaker.state == "half_open"
+
+    # a single request checks if upstream is back
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.failure()
+    assert breaker.allow()
+    breaker.success()
+
+    assert breaker.state == "closed"
+    assert breaker.allow()
+    assert breaker.stats["opened"] == 2
+
+
+def test_no_free_session_is_not_an_upstream_failure(monkeypatch):
+    # fewer sessions than requests in flight, the only one is in use
+    sessions = SessionPool(size=1, max_age=60)
+    busy = sessions.acquire()
+
+    breaker = CircuitBreaker(threshold=1, reset_after=60)
+    fetcher = Fetcher(
+        workers=2,
+        max_pending=10,
+        timeout=0.01,
+        sessions=sessions,
+        breaker=breaker,
+        retries=2,
+    )
+    timeouts = upstream_errors[TIMEOUT]
+
+    with pytest.raises(NoFreeSession) as e:
+        asyncio.run(fetcher.get("u"))
+
+    assert e.value.code == 503
+    assert breaker.state == "closed"
+    assert upstream_errors[TIMEOUT] == timeouts
+
+    monkeypatch.setattr(parser, "get_fetcher", lambda: fetcher)
+    assert asyncio.run(parser.Parser.download("1-goblin", "page")).code == 503
+
+    sessions.release(busy)
+    fetcher.close()
+
+
+def test_download_fails_fast_while_circuit_is_open(monkeypatch):
+    breaker = CircuitBreaker(threshold=1, reset_after=60)
+    breaker.failure()
+    fetcher = FlakyFetcher([200], breaker=breaker)
+    monkeypatch.setattr(parser, "get_fetcher", lambda: fetcher)
+
+    page = asyncio.run(parser.Parser.download("1-goblin", "page"))
+    fetcher.close()
+
+    assert page.code == 503
+    assert fetcher.sent == 0
+
+
+def test_download_timeout(monkeypatch):
+    fetcher = FlakyFetcher([requests.ReadTimeout()])
+    monkeypatch.setattr(parser, "get_fetcher", lambda: fetcher)
+
+    page = asyncio.run(parser.Parser.download("1-goblin", "page"))
+    fetcher.close()
+
+    assert page.code == 504
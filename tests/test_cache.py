@@ -0,0 +1,171 @@
+import asyncio
+import time
+
+from bs4 import BeautifulSoup
+
+from app import utils
+from app.handlers.parser import Parser
+from app.lib.cache import DiskStore, ResponseCache
+
+
+def test_cache_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=2, max_bytes=1024)
+    cache.set("a", 200, {"v": "a"}, ttl=60)
+    cache.set("b", 200, {"v": "b"}, ttl=60)
+
+    assert cache.get("a") is not None  # `b` is now the oldest
+    cache.set("c", 200, {"v": "c"}, ttl=60)
+
+    assert cache.get("b") is None
+    assert cache.get("a").value == {"v": "a"}
+    assert cache.get("c").value == {"v": "c"}
+    assert len(cache) == 2
+
+
+def test_cache_is_bounded_by_bytes():
+    cache = ResponseCache(max_entries=100, max_bytes=30)
+    cache.set("a", 200, {"v": "a" * 10}, ttl=60)
+    cache.set("b", 200, {"v": "b" * 10}, ttl=60)
+
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
+    assert cache.size <= 30
+
+    cache.set("c", 200, {"v": "c" * 100}, ttl=60)  # never fits
+    assert cache.get("c") is None
+
+
+def test_cache_expires_entries():
+    cache = ResponseCache(max_entries=10, max_bytes=1024)
+    cache.set("a", 200, {"v": "a"}, ttl=0)
+
+    assert cache.get("a") is None
+    assert cache.stats == {"hits": 0, "misses": 1, "stale": 0}
+
+
+def test_disk_store_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.db")
+
+    cache = ResponseCache(max_entries=10, max_bytes=1024, disk=DiskStore(path))
+    cache.set("a", 200, {"v": "a"}, ttl=60)
+    cache.close()
+
+    cache = ResponseCache(max_entries=10, max_bytes=1024, disk=DiskStore(path))
+    entry = cache.get("a")
+    cache.close()
+
+    assert entry is not None
+    assert entry.value == {"v": "a"}
+
+
+def test_disk_store_prunes_expired_rows(tmp_path):
+    disk = DiskStore(str(tmp_path / "cache.db"), keep_expired=60, prune_every=3)
+    cache = ResponseCache(max_entries=10, max_bytes=1024, disk=disk)
+
+    cache.set("old", 200, {"v": "old"}, ttl=-120)  # can not be served stale anymore
+    cache.set("stale", 200, {"v": "stale"}, ttl=-30)
+    cache.set("fresh", 200, {"v": "fresh"}, ttl=60)  # the third write prunes
+    disk.flush()
+
+    assert disk.get("old") is None
+    assert disk.get("stale") is not None
+    assert disk.get("fresh") is not None
+
+    assert disk.prune(now=time.time() + 1000) == 2
+    cache.close()
+
+
+def test_cache_loads_from_disk_off_the_loop(tmp_path):
+    path = str(tmp_path / "cache.db")
+
+    cache = ResponseCache(max_entries=10, max_bytes=1024, disk=DiskStore(path))
+    cache.set("a", 200, {"v": "a"}, ttl=60)
+    cache.close()
+
+    cache = ResponseCache(max_entries=10, max_bytes=1024, disk=DiskStore(path))
+    entry = asyncio.run(cache.load("a"))
+    assert entry is not None and entry.value == {"v": "a"}
+    assert len(cache) == 1
+    cache.close()
+
+
+def test_fetch_func_is_cached(monkeypatch):
+    calls = 0
+
+    async def scrape(cls, query, t):
+        nonlocal calls
+        calls += 1
+        soup = BeautifulSoup("<div></div>", "lxml")
+        return cls(soup, query, 200, True)
+
+    monkeypatch.setattr(Parser, "scrape", classmethod(scrape))
+
+    async def main():
+        first = await utils.fetch_func(query="dramalist/x", t="dramalist")
+        first_lookup = utils.cache_lookup.get().status
+        second = await utils.fetch_func(query="dramalist/x", t="dramalist")
+        second_lookup = utils.cache_lookup.get().status
+        return first, first_lookup, second, second_lookup
+
+    first, first_lookup, second, second_lookup = asyncio.run(main())
+
+    assert calls == 1
+    assert first == second
+    assert (first_lookup, second_lookup) == ("MISS", "HIT")
+
+
+def _expire(t, query):
+    entry = utils.get_cache().peek(utils._cache_key(t, query))
+    entry.expires = entry.stored - 10
+
+
+def test_stale_while_revalidate(monkeypatch):
+    titles = iter(["Old", "New"])
+
+    async def scrape(cls, query, t):
+        html = (
+            f"<div class='app-body'><h1 class='film-title'>{next(titles)}</h1>"
+            "<div class='episodes'></div></div>"
+        )
+        return cls(BeautifulSoup(html, "lxml"), query, 200, True)
+
+    monkeypatch.setattr(Parser, "scrape", classmethod(scrape))
+
+    async def main():
+        await utils.fetch_func(query="1-x/episodes", t="episodes")
+        _expire("episodes", "1-x/episodes")
+
+        _, stale = await utils.fetch_func(query="1-x/episodes", t="episodes")
+        lookup = utils.cache_lookup.get().status
+        await asyncio.gather(*utils._refresh_tasks)
+
+        _, fresh = await utils.fetch_func(query="1-x/episodes", t="episodes")
+        return stale, lookup, fresh
+
+    stale, lookup, fresh = asyncio.run(main())
+
+    assert lookup == "STALE"
+    assert stale["data"]["title"] == "Old"
+    assert fresh["data"]["title"] == "New"
+
+
+def test_stale_if_error(monkeypatch):
+    codes = iter([200, 503])
+
+    async def scrape(cls, query, t):
+        code = next(codes)
+        soup = BeautifulSoup("<div></div>", "lxml")
+        return cls(soup, query, code, code == 200)
+
+    monkeypatch.setattr(Parser, "scrape", classmethod(scrape))
+
+    async def main():
+        await utils.fetch_func(query="dramalist/x", t="dramalist")
+        _expire("dramalist", "dramalist/x")
+        return await utils.fetch_func(query="dramalist/x", t="dramalist")
+
+    code, r = asyncio.run(main())
+
+    assert code == 200
+    assert "list" in r["data"]
+    assert utils.get_cache().stats["stale"] == 1
@@ -0,0 +1,161 @@
+import asyncio
+import threading
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app import utils
+from app.handlers.parser import Parser
+from app.lib.entity_store import EntityStore, get_entity_store
+from app.lib.search_index import search_index
+from app.main import app
+
+client = TestClient(app)
+
+FIXTURES = Path(__file__).parent / "fixture"
+
+PAGES = {
+    "drama": "drama.html",
+    "cast": "cast.html",
+    "person": "person.html",
+    "episodes": "episodes.html",
+}
+
+
+def _save(store, t, query):
+    html = (FIXTURES / PAGES[t]).read_text()
+    code, r = utils._extract(utils.fs[t].from_html(html, query, 200))
+    assert code == 200
+    store.save(t, query, r)
+    store.flush()
+
+
+def _rows(store, sql, *params):
+    return [tuple(row) for row in store._db.execute(sql, params)]
+
+
+def test_save(tmp_path):
+    store = EntityStore(str(tmp_path / "entities.db"))
+    _save(store, "drama", "18452-goblin")
+    _save(store, "cast", "18452-goblin/cast")
+    _save(store, "episodes", "18452-goblin/episodes")
+    _save(store, "person", "people/3356-gong-yoo")
+
+    drama = store.query_dramas()
+    slugs = [d["slug"] for d in drama]
+    assert "18452-goblin" in slugs and "25172-train-to-busan" in slugs
+
+    goblin = drama[slugs.index("18452-goblin")]
+    assert (goblin["title"], goblin["year"], goblin["rating"]) == ("Goblin", 2016, 8.8)
+    assert (goblin["country"], goblin["episodes"]) == ("South Korea", 16)
+    assert goblin["genres"] == ["Comedy", "Romance", "Fantasy", "Melodrama"]
+
+    # the person page writes the same credit as the cast page,
+    # and keeps what the drama page said
+    assert _rows(
+        store,
+        "SELECT role, character FROM credit WHERE drama = ? AND person = ?",
+        "18452-goblin",
+        "people/3356-gong-yoo",
+    ) == [("main role", "Kim Shin")]
+    credits = _rows(
+        store,
+        "SELECT role, person, character FROM credit WHERE drama = ?",
+        "18452-goblin",
+    )
+    assert ("director", "people/9373-lee-eung-bok", None) in credits
+    assert all(character != "Screenwriter" for _, _, character in credits)
+    assert _rows(
+        store,
+        "SELECT name, nationality FROM person WHERE slug = ?",
+        "people/3356-gong-yoo",
+    ) == [("Gong Yoo", "South Korean")]
+    assert _rows(store, "SELECT number, rating FROM episode ORDER BY number") == [
+        (1, 8.9),
+        (2, 9.0),
+        (3, None),
+    ]
+
+    counts = store.counts()
+    assert counts["episode"] == 3 and counts["person"] >= 5
+    store.close()
+
+    # it is all still there after a restart
+    store = EntityStore(str(tmp_path / "entities.db"))
+    assert store.counts() == counts
+    store.close()
+
+
+def test_query_dramas():
+    store = get_entity_store()
+    _save(store, "drama", "18452-goblin")
+    _save(store, "person", "people/3356-gong-yoo")
+
+    def slugs(**filters):
+        return [d["slug"] for d in store.query_dramas(**filters)]
+
+    assert slugs(country="south korea") == ["18452-goblin"]
+    assert slugs(country="Japan") == []
+    assert slugs(genre="fantasy", year=2016) == ["18452-goblin"]
+    assert slugs(year=2016, min_rating=8.5) == ["18452-goblin"]
+
+    # the best rated first
+    assert slugs(min_rating=8)[:2] == ["18452-goblin", "25172-train-to-busan"]
+    assert slugs(limit=1, offset=1) == ["25172-train-to-busan"]
+
+
+async def scrape(cls, query, t):
+    return cls.from_html((FIXTURES / "drama.html").read_text(), query, 200)
+
+
+def test_query_endpoint(monkeypatch):
+    monkeypatch.setattr(Parser, "scrape", classmethod(scrape))
+    assert client.get("/query/dramas").json() == {"dramas": []}
+
+    # every scrape is stored
+    code, _ = asyncio.run(utils.fetch_func(query="18452-goblin", t="drama"))
+    assert code == 200
+    get_entity_store().flush()
+
+    response = client.get("/query/dramas?country=South Korea&genre=Romance")
+    assert response.status_code == 200
+    assert [d["slug"] for d in response.json()["dramas"]] == ["18452-goblin"]
+
+    assert client.get("/query/dramas?min_rating=9").json() == {"dramas": []}
+    assert client.get("/query/dramas?limit=0").status_code == 422
+
+
+def test_store_failure_still_indexes(monkeypatch, capsys):
+    monkeypatch.setattr(Parser, "scrape", classmethod(scrape))
+
+    def fail(slug, data):
+        raise RuntimeError("disk full")
+
+    store = get_entity_store()
+    monkeypatch.setattr(store, "_drama", fail)
+
+    code, _ = asyncio.run(utils.fetch_func(query="18452-goblin", t="drama"))
+    assert code == 200
+    assert search_index.get("drama", "18452-goblin") is not None
+
+    # the write failed on the writer thread, and was rolled back
+    store.flush()
+    assert "Error storing drama 18452-goblin" in capsys.readouterr().out
+    assert store.counts()["drama"] == 0
+
+
+def test_save_does_not_wait_for_the_write(tmp_path):
+    store = EntityStore(str(tmp_path / "entities.db"))
+    html = (FIXTURES / "drama.html").read_text()
+    _, r = utils._extract(utils.fs["drama"].from_html(html, "18452-goblin", 200))
+
+    # the lock is held, as if the writer were committing something else
+    with store._lock:
+        saving = threading.Thread(target=store.save, args=("drama", "18452-goblin", r))
+        saving.start()
+        saving.join(timeout=1)
+        assert not saving.is_alive()
+
+    store.flush()
+    assert [d["slug"] for d in store.query_dramas()] == ["18452-goblin"]
+    store.close()
@@ -0,0 +1,51 @@
+from bs4 import BeautifulSoup
+from fastapi.testclient import TestClient
+
+from app.handlers.parser import Parser
+from app.lib.etag import content_etag, etag_matches
+from app.main import app
+
+client = TestClient(app)
+
+
+def test_etag_ignores_scrape_date():
+    a = {"slug_query": "x", "data": {"title": "Goblin"}, "scrape_date": 1}
+    b = {**a, "scrape_date": 2}
+
+    assert content_etag(a) == content_etag(b)
+    assert content_etag(a) != content_etag({**a, "data": {"title": "Other"}})
+
+
+def test_etag_matches():
+    assert etag_matches('"a", W/"b"', '"b"')
+    assert etag_matches("*", '"a"')
+    assert not etag_matches('"a"', '"b"')
+    assert not etag_matches(None, '"a"')
+
+
+def test_not_modified(scrape_drama):
+
+    response = client.get("/id/1-goblin")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+
+    response = client.get("/id/1-goblin", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert response.headers["x-cache"] == "HIT"
+
+    response = client.get("/id/1-goblin", headers={"If-None-Match": '"other"'})
+    assert response.status_code == 200
+    assert response.json()["data"]["title"] == "Goblin"
+
+
+def test_no_etag_on_errors(monkeypatch):
+    async def missing(cls, query, t):
+        return cls(BeautifulSoup("<div></div>", "lxml"), query, 404, False)
+
+    monkeypatch.setattr(Parser, "scrape", classmethod(missing))
+
+    response = client.get("/id/missing", headers={"If-None-Match": "*"})
+    assert response.status_code == 404
+    assert "etag" not in response.headers
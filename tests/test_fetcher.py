@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+import pytest
+
+from app.lib.fetcher import Fetcher, FetcherBusy
+from app.lib.sessions import NoFreeSession, SessionPool
+
+
+class FakeResponse:
+    def __init__(self, url, status_code=200):
+        self.url = url
+        self.status_code = status_code
+        self.headers = {}
+
+
+class SlowFetcher(Fetcher):
+    def _send(self, method, url, **kwargs):
+        time.sleep(0.2)
+        return FakeResponse(url)
+
+
+def test_fetcher_runs_concurrently():
+    fetcher = SlowFetcher(workers=8, max_pending=0, timeout=1)
+
+    async def main():
+        return await asyncio.gather(*[fetcher.get(f"u{i}") for i in range(8)])
+
+    start = time.perf_counter()
+    results = asyncio.run(main())
+    elapsed = time.perf_counter() - start
+    fetcher.close()
+
+    assert [r.url for r in results] == [f"u{i}" for i in range(8)]
+    assert elapsed < 0.2 * 4  # would be 1.6s if run one by one
+
+
+def test_fetcher_rejects_when_full():
+    fetcher = SlowFetcher(workers=1, max_pending=1, timeout=1)
+
+    async def main():
+        return await asyncio.gather(
+            *[fetcher.get(f"u{i}") for i in range(3)], return_exceptions=True
+        )
+
+    results = asyncio.run(main())
+    fetcher.close()
+
+    assert [r.url for r in results[:2]] == ["u0", "u1"]
+    assert isinstance(results[2], FetcherBusy)
+    assert fetcher.in_flight == 0
+
+
+def test_session_pool_reuses_sessions():
+    pool = SessionPool(size=2, max_age=60)
+
+    with pool.session() as s:
+        first = s.scraper
+
+    with pool.session() as s:
+        assert s.scraper is first
+
+    assert pool.idle == 1
+    pool.close()
+
+
+def test_session_pool_recycles_sessions():
+    pool = SessionPool(size=1, max_age=60)
+
+    with pool.session() as s:
+        first = s.scraper
+        s.discard = True  # e.g. challenged by cloudflare
+
+    with pool.session() as s:
+        second = s.scraper
+        s.created -= 60  # too old
+
+    with pool.session() as s:
+        assert s.scraper is not first
+        assert s.scraper is not second
+
+    pool.close()
+
+
+def test_session_pool_waits_for_free_session():
+    pool = SessionPool(size=1, max_age=60)
+    s = pool.acquire()
+
+    with pytest.raises(NoFreeSession):
+        pool.acquire(timeout=0.01)
+
+    pool.release(s)
+    assert pool.acquire(timeout=0.01) is s
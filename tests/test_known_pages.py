@@ -0,0 +1,84 @@
+import asyncio
+
+from app import utils
+from app.handlers import parser
+from app.lib.known_pages import known_pages, page_digest
+
+
+class FakeResponse:
+    def __init__(self, status_code, text="", headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.content = text.encode()
+        self.headers = headers or {}
+
+
+class FakeFetcher:
+    def __init__(self, pages):
+        self.pages = pages  # one response per request, in order
+        self.sent = []
+
+    async def get(self, url, headers=None):
+        self.sent.append(headers)
+        return self.pages.pop(0)
+
+
+def _fetch(monkeypatch, *pages):
+    fetcher = FakeFetcher(list(pages))
+    monkeypatch.setattr(parser, "get_fetcher", lambda: fetcher)
+
+    async def main():
+        return [await utils._fetch("1-goblin", "drama") for _ in pages]
+
+    return fetcher, asyncio.run(main())
+
+
+def test_digest_ignores_everything_outside_the_content(drama_html):
+    page = f"<head>{{}}</head>{drama_html}<footer>{{}}</footer>"
+
+    assert page_digest(page.format(1, 1)) == page_digest(page.format(2, 2))
+    assert page_digest(page.format(1, 1)) != page_digest(page.replace("8.8", "9.0"))
+
+
+def test_not_modified_reuses_the_last_parse(monkeypatch, drama_html):
+    before = dict(known_pages.stats)
+    fetcher, results = _fetch(
+        monkeypatch,
+        FakeResponse(200, drama_html, {"ETag": '"v1"'}),
+        FakeResponse(304),
+    )
+
+    assert fetcher.sent[1]["If-None-Match"] == '"v1"'
+    assert known_pages.stats["not_modified"] - before["not_modified"] == 1
+
+    (code, first), (code_again, again) = results
+    assert code == code_again == 200
+    assert again["data"] is first["data"]
+    assert again["scrape_date"] >= first["scrape_date"]
+
+
+def test_unchanged_content_is_not_parsed_again(monkeypatch, drama_html):
+    before = dict(known_pages.stats)
+    fetcher, results = _fetch(
+        monkeypatch,
+        FakeResponse(200, f"{drama_html}<footer>1</footer>"),
+        FakeResponse(200, f"{drama_html}<footer>2</footer>"),
+        FakeResponse(200, drama_html.replace("8.8", "9.0")),
+    )
+
+    assert "If-None-Match" not in fetcher.sent[1]
+    assert known_pages.stats["unchanged"] - before["unchanged"] == 1
+
+    assert results[1][1]["data"] is results[0][1]["data"]
+    assert results[2][1]["data"]["rating"] == 9.0
+
+
+def test_errors_are_not_remembered(monkeypatch, drama_html):
+    fetcher, results = _fetch(
+        monkeypatch,
+        FakeResponse(404, "<div></div>"),
+        FakeResponse(200, drama_html),
+    )
+
+    assert fetcher.sent[1] == parser.Parser.headers
+    assert [code for code, _ in results] == [404, 200]
@@ -0,0 +1,57 @@
+from pathlib import Path
+
+import msgspec
+import pytest
+
+from app.handlers.fetch import FetchCast, FetchDrama, FetchEpisodes, FetchPerson
+from app.handlers.lxml_fetch import (
+    LxmlFetchCast,
+    LxmlFetchDrama,
+    LxmlFetchEpisodes,
+    LxmlFetchPerson,
+)
+
+FIXTURES = Path(__file__).parent / "fixture"
+
+ERROR_PAGE = """
+<div class="app-body"><div class="box-body">
+  <h1> 404 Not Found </h1><p> The page you requested could not be found. </p>
+</div></div>
+"""
+
+
+def _parse(handler, html, query="18452-goblin", code=200):
+    f = handler(handler._parse_document(html), query, code, code == 200)
+    if not f.ok:
+        return f.res_get_err()
+
+    f._get()
+    return msgspec.to_builtins(f.info)
+
+
+@pytest.mark.parametrize(
+    "fixture, bs4, lxml",
+    [
+        ("drama.html", FetchDrama, LxmlFetchDrama),
+        ("cast.html", FetchCast, LxmlFetchCast),
+        ("episodes.html", FetchEpisodes, LxmlFetchEpisodes),
+        ("person.html", FetchPerson, LxmlFetchPerson),
+    ],
+)
+def test_lxml_parity(fixture, bs4, lxml):
+    html = (FIXTURES / fixture).read_text()
+
+    expected = _parse(bs4, html)
+    assert len(expected) > 1  # the fixture was actually parsed
+    assert _parse(lxml, html) == expected
+
+
+def test_lxml_error_parity():
+    expected = _parse(FetchDrama, ERROR_PAGE, code=404)
+    assert expected["description"]["title"] == "404 Not Found"
+    assert _parse(LxmlFetchDrama, ERROR_PAGE, code=404) == expected
+
+
+def test_lxml_failed_request():
+    f = LxmlFetchDrama(None, "x", 500, False)
+    assert f.res_get_err() == {"code": 500, "error": True}
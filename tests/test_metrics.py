@@ -0,0 +1,61 @@
+from fastapi.testclient import TestClient
+
+from app.lib.metrics import Collected, Registry, cache_lookups, stage_seconds
+from app.main import app
+
+client = TestClient(app)
+
+
+def test_render():
+    registry = Registry()
+    requests = registry.counter("requests_total", "Requests.", labels=("code",))
+    latency = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1))
+    registry.register(Collected("queued", "Queued.", lambda: 3))
+
+    requests.inc(code="200")
+    requests.inc(code="200")
+    requests.inc(code='a"b')
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5)
+
+    assert registry.render().splitlines() == [
+        "# HELP requests_total Requests.",
+        "# TYPE requests_total counter",
+        'requests_total{code="200"} 2',
+        'requests_total{code="a\\"b"} 1',
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{le="0.1"} 1',
+        'latency_seconds_bucket{le="1"} 2',
+        'latency_seconds_bucket{le="+Inf"} 3',
+        "latency_seconds_sum 5.55",
+        "latency_seconds_count 3",
+        "# HELP queued Queued.",
+        "# TYPE queued gauge",
+        "queued 3",
+    ]
+
+
+def test_metrics_endpoint(scrape_drama):
+    extracted = stage_seconds.count(stage="extract", handler="FetchDrama")
+    parsed = stage_seconds.count(stage="parse", handler="FetchDrama")
+    misses = cache_lookups.value(type="drama", result="MISS")
+    hits = cache_lookups.value(type="drama", result="HIT")
+
+    assert client.get("/id/1-goblin").status_code == 200
+    assert client.get("/id/1-goblin").status_code == 200
+
+    assert stage_seconds.count(stage="extract", handler="FetchDrama") == extracted + 1
+    assert stage_seconds.count(stage="parse", handler="FetchDrama") == parsed + 1
+    assert cache_lookups.value(type="drama", result="MISS") == misses + 1
+    assert cache_lookups.value(type="drama", result="HIT") == hits + 1
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+
+    body = response.text
+    assert 'kuryana_stage_seconds_count{stage="encode",handler="json"}' in body
+    assert 'kuryana_upstream_queued{priority="batch"} 0' in body
+    assert "kuryana_cache_hit_ratio" in body
@@ -0,0 +1,182 @@
+import pickle
+from pathlib import Path
+
+import msgspec
+import pytest
+from fastapi.testclient import TestClient
+
+from app.handlers.fetch import FetchCast, FetchList, FetchPerson, FetchReviews
+from app.handlers.models import PersonWork, Review, WorkTitle
+from app.handlers.parser import Parser
+from app.handlers.search import Search
+from app.main import app
+
+client = TestClient(app)
+
+FIXTURES = Path(__file__).parent / "fixture"
+
+
+def _info(handler, fixture):
+    html = (FIXTURES / fixture).read_text()
+    f = handler.from_html(html, "18452-goblin", 200)
+    f._get()
+    return msgspec.to_builtins(f.info)
+
+
+def test_unset_fields_are_left_out():
+    work = PersonWork(
+        slug="mdl-1", year="TBA", title=WorkTitle(link="l", name="n"), rating="N/A"
+    )
+    assert msgspec.to_builtins(work) == {
+        "_slug": "mdl-1",
+        "year": "TBA",
+        "title": {"link": "l", "name": "n"},
+        "rating": "N/A",
+    }
+    assert msgspec.json.encode(Review()) == b"{}"
+
+
+def test_person_works():
+    works = _info(FetchPerson, "person.html")["works"]
+
+    assert works["Drama"][1] == {
+        "_slug": "mdl-18452",
+        "year": 2016,
+        "title": {"link": "https://mydramalist.com/18452-goblin", "name": "Goblin"},
+        "rating": 8.8,
+        "role": {"name": "Kim Shin", "type": "Main Role"},
+        "episodes": 16,
+    }
+    assert "episodes" not in works["Drama"][0]  # not announced yet
+    assert "role" not in works["director"][0]
+    assert "episodes" not in works["Movie"][0]
+
+
+def test_cast_roles():
+    casts = _info(FetchCast, "cast.html")["casts"]
+
+    assert "role" in casts["Main Role"][0]
+    assert list(casts["Main Role"][0]) == [
+        "name",
+        "profile_image",
+        "slug",
+        "link",
+        "role",
+    ]
+
+
+def test_reviews():
+    reviews = _info(FetchReviews, "reviews.html")["reviews"]
+
+    assert reviews[0]["ratings"] == {
+        "overall": 9.5,
+        "Story": 9.0,
+        "Acting/Cast": 10.0,
+        "Music": 10.0,
+        "Rewatch Value": 8.5,
+    }
+    # a review that failed to parse keeps what was parsed before the failure
+    assert list(reviews[2]) == ["reviewer"]
+
+
+def test_list_items():
+    items = _info(FetchList, "list.html")["list"]
+
+    assert [i.get("title", i.get("name")) for i in items] == [
+        "Goblin",
+        "Love in the Moonlight",
+        "Gong Yoo",
+    ]
+    assert items[1]["episodes"] is None
+    assert items[2]["type"] == "person"
+
+
+def test_search_results():
+    html = (FIXTURES / "search.html").read_text()
+    f = Search.from_html(html, "goblin", 200)
+    f._get_search_results()
+    results = msgspec.to_builtins(f.search_results)
+
+    assert results["dramas"][1] == {
+        "slug": "704215-the-goblin-tale",
+        "thumb": "https://i.mydramalist.com/Ld5Wzc.jpg",
+        "mdl_id": "mdl-704215",
+        "title": "The Goblin Tale",
+        "ranking": None,
+        "type": "Chinese Movie",
+        "year": None,
+        "series": False,
+    }
+    assert results["people"] == [
+        {
+            "slug": "people/1245-gong-yoo",
+            "thumb": "Dp7Jds.jpg",
+            "name": "Gong Yoo",
+            "nationality": "South Korean",
+        }
+    ]
+
+
+def test_models_can_be_pickled():
+    # parse pool workers send them back to the server process
+    info = FetchPerson.from_html(
+        (FIXTURES / "person.html").read_text(), "people/1", 200
+    )
+    info._get()
+    assert pickle.loads(pickle.dumps(info.info)) == info.info
+
+
+# the page each route scrapes, by the last part of its query
+ROUTE_FIXTURES = {
+    "18452-goblin": "drama.html",
+    "cast": "cast.html",
+    "episodes": "episodes.html",
+    "reviews?page=1": "reviews.html",
+    "1245-gong-yoo": "person.html",
+    "1": "list.html",
+    "goblin": "search.html",
+}
+
+
+async def scrape(cls, query, t):
+    html = (FIXTURES / ROUTE_FIXTURES[query.rpartition("/")[2]]).read_text()
+    return cls.from_html(html, query, 200)
+
+
+@pytest.mark.parametrize(
+    "url, key",
+    [
+        ("/id/18452-goblin/cast", "casts"),
+        ("/id/18452-goblin/episodes", "episodes"),
+        ("/id/18452-goblin/reviews", "reviews"),
+        ("/people/1245-gong-yoo", "works"),
+        ("/list/1", "list"),
+    ],
+)
+def test_routes_encode_models(monkeypatch, url, key):
+    monkeypatch.setattr(Parser, "scrape", classmethod(scrape))
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.json()["data"][key]
+
+
+def test_search_route_encodes_models(monkeypatch):
+    monkeypatch.setattr(Parser, "scrape", classmethod(scrape))
+
+    response = client.get("/search/q/goblin")
+    assert response.status_code == 200
+    assert response.headers["x-search-source"] == "upstream"
+    assert response.json()["results"]["people"][0]["name"] == "Gong Yoo"
+
+
+def test_batch_route_encodes_models(monkeypatch):
+    monkeypatch.setattr(Parser, "scrape", classmethod(scrape))
+
+    response = client.post(
+        "/id/batch", json={"slugs": ["18452-goblin"], "include": ["cast"]}
+    )
+    assert response.status_code == 200
+
+    cast = response.json()["results"]["18452-goblin"]["cast"]
+    assert cast["response"]["data"]["casts"]
@@ -0,0 +1,63 @@
+import asyncio
+import re
+
+import msgspec
+from bs4 import BeautifulSoup
+from fastapi.testclient import TestClient
+
+from app.handlers.parser import Parser
+from app.main import app
+
+client = TestClient(app)
+
+RECS_PAGE = """
+<div class="app-body">
+  <div class="recs-box">
+    <img class="img-responsive" src="{n}.jpg">
+    <b><a class="text-primary" href="/{n}-rec">Rec {n}</a></b>
+  </div>
+  <ul class="pagination">
+    <li class="active">{n}</li>
+    <li class="last"><a href="/1-x/recs?page=3">Last</a></li>
+  </ul>
+</div>
+"""
+
+
+async def scrape(cls, query, t):
+    n = int(re.search(r"page=(\d+)", query).group(1))
+    if n == 2:
+        await asyncio.sleep(0.05)  # finishes last, but still merged in order
+
+    return cls(BeautifulSoup(RECS_PAGE.format(n=n), "lxml"), query, 200, True)
+
+
+def test_all_pages(monkeypatch):
+    monkeypatch.setattr(Parser, "scrape", classmethod(scrape))
+
+    response = client.get("/api/mdl/recommendations?query=1-x&pages=all")
+    assert response.status_code == 200
+
+    data = response.json()["data"]
+    assert [i["title"] for i in data["recommendations"]] == ["Rec 1", "Rec 2", "Rec 3"]
+    # the same type as on a single page of recommendations
+    assert data["pages"] == [{"totalPages": 3, "fetchedPages": 3, "failedPages": []}]
+
+
+def test_max_pages(monkeypatch):
+    monkeypatch.setattr(Parser, "scrape", classmethod(scrape))
+
+    response = client.get("/api/mdl/recommendations?query=1-x&max_pages=2")
+    data = response.json()["data"]
+    assert [i["title"] for i in data["recommendations"]] == ["Rec 1", "Rec 2"]
+
+
+def test_all_pages_stream(monkeypatch):
+    monkeypatch.setattr(Parser, "scrape", classmethod(scrape))
+
+    response = client.get("/api/mdl/recommendations?query=1-x&pages=all&stream=true")
+    lines = [msgspec.json.decode(i) for i in response.text.splitlines()]
+
+    assert lines[0]["slug_query"] == "1-x/recs?page=1"
+    assert "recommendations" not in lines[0]["data"]
+    assert [i["title"] for i in lines[1:]] == ["Rec 1", "Rec 2", "Rec 3"]
@@ -0,0 +1,105 @@
+import asyncio
+from pathlib import Path
+
+from app import config, utils
+from app.handlers.parser import Page, Parser
+from app.lib.fetcher import PARSE_FAILURE, upstream_errors
+from app.lib.metrics import stage_seconds
+from app.lib.parse_pool import ParsePool, close_parse_pool
+
+FIXTURES = Path(__file__).parent / "fixture"
+
+
+def test_parse_in_worker_process():
+    html = (FIXTURES / "drama.html").read_text()
+    pool = ParsePool(workers=1)
+
+    async def main():
+        await pool.warm()
+        return await pool.run(utils.parse_page, "drama", "18452-goblin", 200, html)
+
+    try:
+        code, r = asyncio.run(main())
+    finally:
+        pool.close()
+
+    assert code == 200
+    assert r["data"] == utils.parse_page("drama", "18452-goblin", 200, html)[1]["data"]
+    assert r["data"]["title"] == "Goblin (2016)"
+
+
+def test_fetch_func_uses_parse_pool(monkeypatch):
+    html = (FIXTURES / "person.html").read_text()
+
+    async def download(cls, query, t):
+        return Page(200, html)
+
+    monkeypatch.setattr(Parser, "download", classmethod(download))
+    monkeypatch.setattr(config, "PARSE_WORKERS", 1)
+
+    try:
+        code, r = asyncio.run(utils.fetch_func(query="people/1", t="person"))
+    finally:
+        close_parse_pool()
+
+    assert code == 200
+    assert r["data"]["works"]
+
+
+def test_worker_metrics_are_recorded(monkeypatch, capsys):
+    pages = {
+        "people/1": (FIXTURES / "person.html").read_text(),
+        "people/broken": "<div></div>",
+    }
+
+    async def download(cls, query, t):
+        return Page(200, pages[query])
+
+    monkeypatch.setattr(Parser, "download", classmethod(download))
+    monkeypatch.setattr(config, "PARSE_WORKERS", 1)
+
+    parsed = stage_seconds.count(stage="parse", handler="FetchPerson")
+    extracted = stage_seconds.count(stage="extract", handler="FetchPerson")
+    failures = upstream_errors[PARSE_FAILURE]
+
+    async def main():
+        await utils.fetch_func(query="people/1", t="person")
+        return await utils.fetch_func(query="people/broken", t="person")
+
+    try:
+        code, _ = asyncio.run(main())
+    finally:
+        close_parse_pool()
+
+    assert code == 500
+    assert stage_seconds.count(stage="parse", handler="FetchPerson") == parsed + 2
+    assert stage_seconds.count(stage="extract", handler="FetchPerson") == extracted + 2
+    assert upstream_errors[PARSE_FAILURE] == failures + 1
+    assert "Error parsing people/broken" in capsys.readouterr().out
+
+
+def test_homepage_uses_parse_pool(monkeypatch):
+    html = (FIXTURES / "homepage.html").read_text()
+
+    async def download(cls, query, t):
+        return Page(200, html)
+
+    monkeypatch.setattr(Parser, "download", classmethod(download))
+    monkeypatch.setattr(config, "PARSE_WORKERS", 1)
+
+    try:
+        sections = asyncio.run(utils.fetch_homepage())
+    finally:
+        close_parse_pool()
+
+    expected = utils.parse_homepage(200, html)
+    for t, (code, r) in sections.items():
+        assert (code, r["data"]) == (200, expected[t][1]["data"])
+    assert sections["topairing"][1]["data"]
+
+
+def test_failed_download_in_worker_process():
+    assert utils.parse_page("drama", "x", 503, None) == (
+        503,
+        {"code": 503, "error": True},
+    )
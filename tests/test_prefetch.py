@@ -0,0 +1,61 @@
+import asyncio
+from pathlib import Path
+
+from app import utils
+from app.handlers.parser import Parser
+from app.lib.prefetch import Prefetcher
+from app.lib.scheduler import PREFETCH, fetch_priority
+
+FIXTURES = Path(__file__).parent / "fixture"
+
+PAGES = {
+    "": "homepage.html",
+    "cast": "cast.html",
+    "episodes": "episodes.html",
+}
+
+
+def _scrape(monkeypatch):
+    scraped = []
+
+    async def scrape(cls, query, t):
+        scraped.append((query, fetch_priority.get()))
+        page = PAGES.get(query.rpartition("/")[2] if query else "", "drama.html")
+        return cls.from_html((FIXTURES / page).read_text(), query, 200)
+
+    monkeypatch.setattr(Parser, "scrape", classmethod(scrape))
+    return scraped
+
+
+def test_prefetch_hot_dramas(monkeypatch):
+    scraped = _scrape(monkeypatch)
+    prefetcher = Prefetcher(interval=60, concurrency=2, max_dramas=2)
+
+    asyncio.run(prefetcher.run_once())
+
+    assert prefetcher.stats["dramas"] == 2
+    assert prefetcher.stats["scraped"] == 6
+    assert {p for _, p in scraped} == {PREFETCH}
+
+    # the top airing come first
+    for query in ["710541-the-prisoner-of-beauty", "702271-weak-hero-class-2"]:
+        assert asyncio.run(utils.expires_in("drama", query)) > 60
+        assert asyncio.run(utils.expires_in("cast", f"{query}/cast")) > 60
+        assert asyncio.run(utils.expires_in("episodes", f"{query}/episodes")) > 60
+
+    # everything is still fresh on the next run
+    asyncio.run(prefetcher.run_once())
+    assert prefetcher.stats["fresh"] == 6
+    assert prefetcher.stats["scraped"] == 6
+
+
+def test_prefetch_refreshes_what_expires_before_the_next_run(monkeypatch):
+    scraped = _scrape(monkeypatch)
+    prefetcher = Prefetcher(interval=10**9, concurrency=1, max_dramas=1)
+
+    asyncio.run(prefetcher.run_once())
+    asyncio.run(prefetcher.run_once())
+
+    # cached for less than the interval, so scraped on every run
+    assert prefetcher.stats["scraped"] == 6
+    assert len([q for q, _ in scraped if q]) == 6
@@ -0,0 +1,51 @@
+from pathlib import Path
+
+import pytest
+
+from app import utils
+from app.handlers.fetch import (
+    FetchCast,
+    FetchDrama,
+    FetchDramaList,
+    FetchEpisodes,
+    FetchPerson,
+    FetchShowsTrendingThisWeek,
+)
+
+FIXTURES = Path(__file__).parent / "fixture"
+
+
+def _info(handler, html, scoped):
+    f = handler(handler._parse_document(html, scoped=scoped), "x", 200, True)
+    f._get()
+    return f.info
+
+
+@pytest.mark.parametrize(
+    "fixture, handler",
+    [
+        ("drama.html", FetchDrama),
+        ("cast.html", FetchCast),
+        ("episodes.html", FetchEpisodes),
+        ("person.html", FetchPerson),
+        ("dramalist.html", FetchDramaList),
+    ],
+)
+def test_scoped_parse_gives_same_info(fixture, handler):
+    html = (FIXTURES / fixture).read_text()
+
+    soup = handler._parse_document(html, scoped=True)
+    assert soup.find("head") is None
+    assert _info(handler, html, scoped=True) == _info(handler, html, scoped=False)
+
+
+def test_homepage_regions(homepage_html):
+    html = f"<header><h1>MyDramaList</h1></header>{homepage_html}<footer></footer>"
+
+    soup = utils.Homepage._parse_document(html, scoped=True)
+    assert soup.find("header") is None
+    assert soup.find(id="slide-trending") is not None
+
+    f = FetchShowsTrendingThisWeek(soup, "", 200, True)
+    f._get()
+    assert f.info["trendingThisWeek"][0]["title"] == "Goblin"
@@ -0,0 +1,167 @@
+import asyncio
+import time
+
+import pytest
+
+from app.lib.scheduler import (
+    BATCH,
+    INTERACTIVE,
+    PREFETCH,
+    FetcherBusy,
+    QueueTimeout,
+    Scheduler,
+    TokenBucket,
+    fetch_priority,
+)
+from app.lib.singleflight import SingleFlight
+
+
+def test_interactive_requests_go_first():
+    scheduler = Scheduler(max_in_flight=1, max_queued=10)
+    order = []
+
+    async def request(name, priority):
+        fetch_priority.set(priority)
+        async with scheduler.slot():
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        first = asyncio.ensure_future(request("first", PREFETCH))
+        await asyncio.sleep(0)  # holds the only slot, the others queue
+
+        await asyncio.gather(
+            first,
+            request("prefetch", PREFETCH),
+            request("batch", BATCH),
+            request("interactive", INTERACTIVE),
+        )
+
+    asyncio.run(main())
+
+    assert order == ["first", "interactive", "batch", "prefetch"]
+    assert scheduler.in_flight == 0
+    assert scheduler.queued == 0
+
+
+def test_shared_request_goes_at_its_most_urgent_callers_priority():
+    scheduler = Scheduler(max_in_flight=1, max_queued=10)
+    flight = SingleFlight()
+    outer = SingleFlight()
+    order = []
+
+    async def request(name):
+        async with scheduler.slot():
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    async def call(priority, name, fn):
+        fetch_priority.set(priority)
+        return await fn(name)
+
+    async def joined(name):
+        # shared work that itself waits on shared work
+        return await outer.do(name, lambda: flight.do(name, lambda: request(name)))
+
+    async def main():
+        first = asyncio.ensure_future(call(PREFETCH, "first", request))
+        await asyncio.sleep(0)  # holds the only slot, the others queue
+
+        prefetch = asyncio.ensure_future(call(PREFETCH, "shared", joined))
+        await asyncio.sleep(0.001)  # queued before the others
+        others = [
+            asyncio.ensure_future(call(BATCH, "batch", request)),
+            asyncio.ensure_future(call(INTERACTIVE, "interactive", request)),
+        ]
+        await asyncio.sleep(0.001)
+
+        # an interactive caller joins the prefetch
+        await asyncio.gather(
+            first, prefetch, *others, call(INTERACTIVE, "shared", joined)
+        )
+
+    asyncio.run(main())
+
+    assert order == ["first", "shared", "interactive", "batch"]
+    assert scheduler.queued == 0
+
+
+def test_full_queue_is_rejected():
+    scheduler = Scheduler(max_in_flight=1, max_queued=1)
+
+    async def request():
+        async with scheduler.slot():
+            await asyncio.sleep(0.05)
+
+    async def main():
+        return await asyncio.gather(
+            *[request() for _ in range(3)], return_exceptions=True
+        )
+
+    results = asyncio.run(main())
+
+    assert results[:2] == [None, None]
+    assert isinstance(results[2], FetcherBusy)
+    assert results[2].code == 503
+    assert scheduler.stats["rejected"] == 1
+
+
+def test_queue_timeout():
+    scheduler = Scheduler(max_in_flight=1, max_queued=10, queue_timeout=0.05)
+
+    async def main():
+        await scheduler.acquire()  # never released
+
+        with pytest.raises(QueueTimeout) as e:
+            await scheduler.acquire()
+
+        return e.value
+
+    err = asyncio.run(main())
+
+    assert err.code == 503  # no free slot
+    assert scheduler.queued == 0
+    assert scheduler.stats["timeouts"] == 1
+
+
+def test_rate_limited_queue_timeout():
+    scheduler = Scheduler(
+        max_in_flight=10, max_queued=10, rate=1, burst=1, queue_timeout=0.05
+    )
+
+    async def main():
+        async with scheduler.slot():
+            pass
+
+        # the bucket is empty for the next second
+        with pytest.raises(QueueTimeout) as e:
+            await scheduler.acquire()
+
+        return e.value
+
+    assert asyncio.run(main()).code == 429
+
+
+def test_token_bucket_spaces_requests():
+    scheduler = Scheduler(max_in_flight=10, max_queued=10, rate=20, burst=1)
+
+    async def request():
+        async with scheduler.slot():
+            return time.perf_counter()
+
+    async def main():
+        return await asyncio.gather(*[request() for _ in range(3)])
+
+    start = time.perf_counter()
+    sent = asyncio.run(main())
+
+    # one right away, then one every 50ms
+    assert sent[2] - start >= 0.09
+    assert scheduler.stats["sent"] == 3
+
+
+def test_token_bucket_burst():
+    bucket = TokenBucket(rate=1, burst=3)
+
+    assert [bucket.take() for _ in range(4)] == [True, True, True, False]
+    assert 0 < bucket.delay() <= 1
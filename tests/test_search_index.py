@@ -0,0 +1,236 @@
+import asyncio
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app import utils
+from app.handlers.parser import Parser
+from app.lib.search_index import (
+    DRAMA,
+    PERSON,
+    RESULT,
+    Entry,
+    PrefixIndex,
+    SearchIndex,
+    entries,
+    search_index,
+    trigrams,
+)
+from app.main import app
+
+client = TestClient(app)
+
+FIXTURES = Path(__file__).parent / "fixture"
+
+
+def _parse(t, query, fixture):
+    html = (FIXTURES / fixture).read_text()
+    if t == "search":
+        return utils._search_results(utils.Search.from_html(html, query, 200))[1]
+    return utils._extract(utils.fs[t].from_html(html, query, 200))[1]
+
+
+def test_trigrams():
+    assert trigrams("Go!") == {"  g", " go", "go "}
+    assert trigrams("Café") == trigrams("cafe")
+
+
+def test_typos_and_ranking():
+    index = SearchIndex(max_entries=10)
+    index.add(Entry(DRAMA, "1-goblin", "Goblin", rating=8.8, ranking=1209))
+    index.add(Entry(DRAMA, "2-the-goblin-tale", "The Goblin Tale"))
+    index.add(Entry(DRAMA, "3-big", "Big"))
+    index.add(Entry(PERSON, "people/1-gong-yoo", "Gong Yoo"))
+
+    found = index.search("gobiln")
+    assert [e.slug for e in found[DRAMA]] == ["1-goblin", "2-the-goblin-tale"]
+    assert found[PERSON] == []
+
+    assert [e.slug for e in index.search("gong yo")[PERSON]] == ["people/1-gong-yoo"]
+    assert index.search("xyz") == {DRAMA: [], PERSON: []}
+
+
+def test_add_merges_and_evicts():
+    index = SearchIndex(max_entries=2)
+    index.add(Entry(DRAMA, "1-goblin", "Goblin", thumb="a.jpg"))
+    index.add(Entry(DRAMA, "1-goblin", "Goblin", aliases=("도깨비",), rating=8.8))
+
+    entry = index.get(DRAMA, "1-goblin")
+    assert (entry.thumb, entry.rating, entry.aliases) == ("a.jpg", 8.8, ("도깨비",))
+    assert index.search("도깨비")[DRAMA] == [entry]
+
+    index.add(Entry(DRAMA, "2-big", "Big"))
+    index.add(Entry(DRAMA, "3-healer", "Healer"))
+    assert len(index) == 2
+    assert index.get(DRAMA, "1-goblin") is None
+    assert index.search("goblin")[DRAMA] == []
+
+
+def test_thinner_sources_do_not_overwrite_a_page():
+    index = SearchIndex(max_entries=10)
+    page = _parse("drama", "18452-goblin", "drama.html")
+    for entry in entries("drama", "18452-goblin", page):
+        index.add(entry)
+
+    # a filmography row, with its own take on the drama
+    index.add(
+        Entry(
+            DRAMA, "18452-goblin", "Goblin Special", year=2017, rating=7.0, type="Drama"
+        )
+    )
+
+    entry = index.get(DRAMA, "18452-goblin")
+    assert (entry.title, entry.year, entry.rating) == ("Goblin", 2016, 8.8)
+    assert entry.type == "Drama"  # what the page did not know is still filled in
+
+    # a mention is overwritten by a search result
+    index.add(Entry(DRAMA, "2-big", "Big", year=2011))
+    index.add(Entry(DRAMA, "2-big", "Big", year=2012, source=RESULT))
+    assert index.get(DRAMA, "2-big").year == 2012
+
+
+def test_entries():
+    drama = entries(
+        "drama", "18452-goblin", _parse("drama", "18452-goblin", "drama.html")
+    )
+    assert drama[0].slug == "18452-goblin"
+    assert (drama[0].title, drama[0].year, drama[0].rating) == ("Goblin", 2016, 8.8)
+    assert "도깨비" in drama[0].aliases
+    assert {e.slug for e in drama[1:]} >= {"people/3356-gong-yoo"}
+
+    person = entries(
+        "person", "people/1245-gong-yoo", _parse("person", "", "person.html")
+    )
+    assert (person[0].kind, person[0].title) == (PERSON, "Gong Yoo")
+    assert {e.slug for e in person[1:]} >= {"18452-goblin", "25172-train-to-busan"}
+
+    search = entries("search", "goblin", _parse("search", "goblin", "search.html"))
+    assert search[0].ranking == 1209
+
+    lists = entries("lists", "list/1", _parse("lists", "list/1", "list.html"))
+    assert [e.slug for e in lists][-1] == "people/1245-gong-yoo"
+
+    assert entries("cast", "18452-goblin/cast", {}) == []
+
+
+async def scrape(cls, query, t):
+    return cls.from_html((FIXTURES / "search.html").read_text(), query, 200)
+
+
+def test_search_local(monkeypatch):
+    monkeypatch.setattr(Parser, "scrape", classmethod(scrape))
+
+    # nothing indexed yet
+    response = client.get("/search/q/goblin?source=local")
+    assert response.status_code == 200
+    assert response.headers["x-search-source"] == "local"
+    results = response.json()["results"]
+    assert results["dramas"] == results["people"] == []
+
+    asyncio.run(utils.search_func("goblin"))
+    assert len(search_index) > 0
+
+    code, r = utils.search_local("gobiln")
+    assert code == 200
+
+    dramas = r["results"]["dramas"]
+    assert (dramas[0].slug, dramas[0].ranking) == ("18452-goblin", "#1209")
+    assert r["results"]["people"] == []
+
+
+def test_search_local_has_the_upstream_shape(monkeypatch):
+    monkeypatch.setattr(Parser, "scrape", classmethod(scrape))
+
+    upstream = client.get("/search/q/goblin").json()
+    local = client.get("/search/q/goblin?source=local").json()
+
+    assert local.keys() == upstream.keys()
+    assert local["results"].keys() == upstream["results"].keys()
+    assert local["results"]["pages"]["totalPages"] == 1
+
+
+def test_search_local_is_not_paged(monkeypatch):
+    monkeypatch.setattr(Parser, "scrape", classmethod(scrape))
+
+    for params in ["pages=all", "max_pages=2", "stream=true"]:
+        response = client.get(f"/search/q/goblin?source=local&{params}")
+        assert response.status_code == 400, params
+
+    # `auto` pages through upstream, even with something indexed
+    client.get("/search/q/goblin")
+    response = client.get("/search/q/goblin?source=auto&max_pages=1")
+    assert response.status_code == 200
+    assert response.headers["x-search-source"] == "upstream"
+
+
+def test_search_not_modified_keeps_headers(monkeypatch):
+    monkeypatch.setattr(Parser, "scrape", classmethod(scrape))
+
+    response = client.get("/search/q/goblin")
+    etag = response.headers["etag"]
+
+    response = client.get("/search/q/goblin", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.headers["x-search-source"] == "upstream"
+    assert response.headers["x-cache"] == "HIT"
+    assert "age" in response.headers
+
+
+def test_prefix_index():
+    prefixes = PrefixIndex()
+    prefixes.add("drama:1", ["The Goblin Tale", "도깨비"])
+    prefixes.add("drama:2", ["Goblin"])
+
+    assert [key for _, _, key in prefixes.matches("gob")] == ["drama:2", "drama:1"]
+    assert [key for _, _, key in prefixes.matches("도")] == ["drama:1"]
+    assert prefixes.matches("tale x") == []
+    assert prefixes.matches(" ") == []
+
+    prefixes.add("drama:1", ["Healer"])
+    assert [key for _, _, key in prefixes.matches("gob")] == ["drama:2"]
+
+    prefixes.remove("drama:2")
+    assert prefixes.matches("gob") == []
+    assert len(prefixes) == 1
+
+
+def test_suggest_ranking():
+    index = SearchIndex(max_entries=10)
+    index.add(Entry(DRAMA, "1-goblin", "Goblin", rating=8.8, ranking=1209))
+    index.add(Entry(DRAMA, "2-goblin-2", "Goblin 2", rating=9.1))
+    index.add(Entry(DRAMA, "3-the-goblin-tale", "The Goblin Tale", ranking=1))
+    index.add(Entry(PERSON, "people/1-gong-yoo", "Gong Yoo"))
+
+    # names starting with it first, then by ranking and rating
+    slugs = [e.slug for e in index.suggest("go")]
+    assert slugs == ["1-goblin", "2-goblin-2", "people/1-gong-yoo", "3-the-goblin-tale"]
+    assert [e.slug for e in index.suggest("go", limit=1)] == ["1-goblin"]
+
+    # new entries show up right away
+    index.add(Entry(DRAMA, "4-go-go-squid", "Go Go Squid!", ranking=5))
+    assert index.suggest("go")[0].slug == "4-go-go-squid"
+
+
+def test_suggest_endpoint():
+    search_index.add(Entry(DRAMA, "18452-goblin", "Goblin", year=2016, ranking=1209))
+
+    response = client.get("/search/suggest/Gob")
+    assert response.status_code == 200
+    assert response.json() == {
+        "prefix": "Gob",
+        "suggestions": [
+            {
+                "kind": "drama",
+                "slug": "18452-goblin",
+                "title": "Goblin",
+                "thumb": None,
+                "year": 2016,
+                "ranking": 1209,
+                "rating": None,
+            }
+        ],
+    }
+
+    assert client.get("/search/suggest/zz").json()["suggestions"] == []
+    assert client.get("/search/suggest/go?limit=0").status_code == 422
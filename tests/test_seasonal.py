@@ -0,0 +1,99 @@
+import asyncio
+import math
+from datetime import datetime, timezone
+
+from fastapi.testclient import TestClient
+
+from app import utils
+from app.lib.cache import get_cache
+from app.main import app
+
+client = TestClient(app)
+
+
+class FakeResponse:
+    def __init__(self, status_code, json=None):
+        self.status_code = status_code
+        self._json = json
+
+    def json(self):
+        if self._json is None:
+            raise ValueError("not json")
+        return self._json
+
+
+class FakeFetcher:
+    def __init__(self, fail=()):
+        self.fail = fail  # quarters answered with a 500
+        self.sent = []
+
+    async def post(self, url, data=None):
+        self.sent.append((data["year"], data["quarter"]))
+        if data["quarter"] in self.fail:
+            return FakeResponse(500)
+        return FakeResponse(200, [{"id": data["quarter"], "year": data["year"]}])
+
+
+def _fetcher(monkeypatch, **kwargs):
+    fetcher = FakeFetcher(**kwargs)
+    monkeypatch.setattr(utils, "get_fetcher", lambda: fetcher)
+    return fetcher
+
+
+def test_seasonal_ttl():
+    now = datetime(2024, 5, 1, tzinfo=timezone.utc)
+
+    assert utils.seasonal_ttl(2023, 4, now) == math.inf
+    assert utils.seasonal_ttl(2024, 1, now) == math.inf
+    assert utils.seasonal_ttl(2024, 2, now) == 3600
+    assert utils.seasonal_ttl(2024, 3, now) == 3600
+
+
+def test_seasonal_is_cached(monkeypatch):
+    fetcher = _fetcher(monkeypatch)
+
+    first = client.get("/seasonal/2019/1")
+    second = client.get("/seasonal/2019/1")
+
+    assert first.status_code == second.status_code == 200
+    assert first.json() == [{"id": 1, "year": 2019}]
+    assert second.headers["x-cache"] == "HIT"
+    assert fetcher.sent == [(2019, 1)]
+
+    # a past quarter never expires
+    assert asyncio.run(utils.expires_in("seasonal", "2019/1")) == math.inf
+    assert get_cache().peek("seasonal:2019/1").fresh()
+
+
+def test_seasonal_errors(monkeypatch):
+    _fetcher(monkeypatch, fail=(2,))
+
+    response = client.get("/seasonal/2019/2")
+    assert response.status_code == 500
+    assert response.json()["error"]
+
+    assert client.get("/seasonal/2019/5").status_code == 422
+
+
+def test_seasonal_year(monkeypatch):
+    fetcher = _fetcher(monkeypatch, fail=(3,))
+
+    response = client.get("/seasonal/2019")
+    assert response.status_code == 200
+
+    body = response.json()
+    assert body["year"] == 2019
+    assert body["quarters"]["1"] == [{"id": 1, "year": 2019}]
+    assert body["quarters"]["3"]["error"]
+    assert body["failedQuarters"] == [3]
+    assert sorted(fetcher.sent) == [(2019, q) for q in utils.QUARTERS]
+
+    # the quarters are cached one by one
+    client.get("/seasonal/2019")
+    assert len(fetcher.sent) == 5
+
+
+def test_seasonal_year_fails_if_every_quarter_does(monkeypatch):
+    _fetcher(monkeypatch, fail=utils.QUARTERS)
+
+    assert client.get("/seasonal/2019").status_code == 500
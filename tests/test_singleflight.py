@@ -0,0 +1,122 @@
+import asyncio
+
+from bs4 import BeautifulSoup
+from fastapi.testclient import TestClient
+
+from app import utils
+from app.handlers.parser import Parser
+from app.lib.singleflight import SingleFlight
+from app.main import app
+
+client = TestClient(app)
+
+
+def test_single_flight_shares_one_call():
+    flight = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    async def main():
+        return await asyncio.gather(*[flight.do("k", work) for _ in range(5)])
+
+    assert asyncio.run(main()) == [1] * 5
+    assert calls == 1
+    assert not flight.in_flight("k")
+
+
+def test_homepage_is_scraped_once(monkeypatch, homepage_html):
+    calls = 0
+
+    async def scrape(cls, query, t):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return cls(BeautifulSoup(homepage_html, "lxml"), query, 200, True)
+
+    monkeypatch.setattr(Parser, "scrape", classmethod(scrape))
+
+    async def main():
+        return await asyncio.gather(
+            *[utils.fetch_func(query="", t=t) for t in utils.homepage_types],
+            utils.fetch_homepage_all(),
+        )
+
+    results = asyncio.run(main())
+    assert calls == 1
+
+    code, trending = results[utils.homepage_types.index("trendingthisweek")]
+    assert code == 200
+    assert trending["data"]["trendingThisWeek"][0]["title"] == "Goblin"
+
+    code, home = results[-1]
+    assert code == 200
+    assert home["data"]["trendingThisWeek"] == trending["data"]["trendingThisWeek"]
+    assert home["data"]["topAiringShows"] == []
+
+
+def test_homepage_all_is_scraped_once_without_cache(monkeypatch, homepage_html):
+    calls = 0
+
+    async def scrape(cls, query, t):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return cls(BeautifulSoup(homepage_html, "lxml"), query, 200, True)
+
+    monkeypatch.setattr(Parser, "scrape", classmethod(scrape))
+    for t in utils.homepage_types:
+        monkeypatch.setitem(utils.config.CACHE_TTLS, t, 0)
+
+    code, home = asyncio.run(utils.fetch_homepage_all())
+    assert code == 200
+    assert home["data"]["trendingThisWeek"][0]["title"] == "Goblin"
+    assert calls == 1
+
+
+def test_home_cache_headers(monkeypatch, homepage_html):
+    async def scrape(cls, query, t):
+        return cls(BeautifulSoup(homepage_html, "lxml"), query, 200, True)
+
+    monkeypatch.setattr(Parser, "scrape", classmethod(scrape))
+
+    first = client.get("/api/mdl/home")
+    assert first.status_code == 200
+    assert (first.headers["x-cache"], first.headers["age"]) == ("MISS", "0")
+
+    second = client.get("/api/mdl/home")
+    assert second.headers["x-cache"] == "HIT"
+    assert "age" in second.headers
+    assert second.json()["scrape_date"] == first.json()["scrape_date"]
+
+    # one section missing from the cache makes the whole response a miss
+    utils.get_cache().delete(utils._cache_key("newsfeeds", ""))
+    assert client.get("/api/mdl/home").headers["x-cache"] == "MISS"
+
+
+def test_identical_fetches_are_coalesced(monkeypatch):
+    calls = 0
+
+    async def scrape(cls, query, t):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return cls(BeautifulSoup("<div></div>", "lxml"), query, 200, True)
+
+    monkeypatch.setattr(Parser, "scrape", classmethod(scrape))
+    before = dict(utils.upstream_flight.stats)
+
+    async def main():
+        return await asyncio.gather(
+            *[utils.fetch_func(query="dramalist/x", t="dramalist") for _ in range(10)]
+        )
+
+    results = asyncio.run(main())
+
+    assert calls == 1
+    assert all(r is results[0][1] for _, r in results)
+    assert utils.upstream_flight.stats["coalesced"] - before["coalesced"] == 9
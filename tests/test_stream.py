@@ -0,0 +1,61 @@
+from pathlib import Path
+
+import msgspec
+from bs4 import BeautifulSoup
+from fastapi.testclient import TestClient
+
+from app.handlers.parser import Parser
+from app.main import app
+
+client = TestClient(app)
+
+
+async def scrape_dramalist(cls, query, t):
+    html = (Path(__file__).parent / "fixture" / "dramalist.html").read_text()
+    return cls(BeautifulSoup(html, "lxml"), query, 200, True)
+
+
+def _lines(response):
+    return [msgspec.json.decode(line) for line in response.text.splitlines()]
+
+
+def test_stream_dramalist(monkeypatch):
+    monkeypatch.setattr(Parser, "scrape", classmethod(scrape_dramalist))
+
+    response = client.get("/dramalist/x?stream=true")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+
+    lines = _lines(response)
+    assert lines[0]["slug_query"] == "dramalist/x"
+    assert lines[1] == {
+        "list": "Currently Watching",
+        "item": {
+            "name": "Death's Game",
+            "id": "733445-i-will-die-soon",
+            "score": "0.0",
+            "episode_seen": "4",
+            "episode_total": "4",
+        },
+    }
+    assert len(lines) == 1 + 3 + 1
+    assert lines[-1]["stats"]["Dramas"] == "10"
+
+
+def test_stream_batch(scrape_drama):
+
+    response = client.post(
+        "/id/batch?stream=true",
+        json={"slugs": ["1-goblin", "missing"], "include": ["cast"]},
+    )
+    assert response.status_code == 200
+
+    lines = {(i["slug"], i["resource"]): i for i in _lines(response)}
+    assert set(lines) == {
+        ("1-goblin", "drama"),
+        ("1-goblin", "cast"),
+        ("missing", "drama"),
+        ("missing", "cast"),
+    }
+    assert lines["1-goblin", "drama"]["code"] == 200
+    assert lines["missing", "drama"]["code"] == 404
@@ -0,0 +1,56 @@
+from fastapi.testclient import TestClient
+
+from app.lib.profiling import ProfileMiddleware
+from app.lib.timing import Timings
+from app.main import app
+
+client = TestClient(app)
+
+
+def test_timings_header():
+    timings = Timings()
+    timings.add("fetch", 0.25)
+    timings.add("parse", 0.001)
+    timings.add("fetch", 0.25)
+
+    assert timings.header() == "fetch;dur=500.0, parse;dur=1.0"
+
+
+def test_server_timing(scrape_drama):
+
+    response = client.get("/id/1-goblin")
+    stages = [t.split(";")[0] for t in response.headers["server-timing"].split(", ")]
+    assert stages == ["cache", "parse", "extract", "encode"]
+
+    # served from the cache, nothing is scraped
+    response = client.get("/id/1-goblin")
+    stages = [t.split(";")[0] for t in response.headers["server-timing"].split(", ")]
+    assert stages == ["cache", "encode"]
+
+
+def test_profile_needs_token(scrape_drama):
+    response = client.get("/id/1-goblin?_profile=1")
+    assert response.json()["data"]["title"] == "Goblin"
+
+    profiled = TestClient(ProfileMiddleware(app, token="secret"))
+    response = profiled.get(
+        "/id/1-goblin?_profile=1", headers={"X-Profile-Token": "wrong"}
+    )
+    assert response.json()["data"]["title"] == "Goblin"
+
+
+def test_profile(tmp_path, scrape_drama):
+    profiled = TestClient(
+        ProfileMiddleware(app, token="secret", directory=str(tmp_path))
+    )
+
+    response = profiled.get(
+        "/id/1-goblin", headers={"X-Profile": "1", "X-Profile-Token": "secret"}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert response.headers["x-profiled-status"] == "200"
+    assert "server-timing" in response.headers
+    assert "function calls" in response.text
+    assert (tmp_path / response.headers["x-profile-file"]).exists()